@@ -0,0 +1,115 @@
+# alert_engine.py
+# MODULO NUEVO: Motor de alertas por umbral con estado.
+# Cada condición (CPU, RAM, disco por punto de montaje) pasa por los estados
+# ok -> pendiente -> disparada -> resuelta. Solo se avisa al cambiar de estado
+# (o cada `renotify_minutes` mientras sigue disparada), y todos los cambios de
+# una misma pasada se envían juntos en un único mensaje resumen.
+
+import logging
+import time
+
+import psutil
+
+DEFAULT_HYSTERESIS_PERCENT = 5
+DEFAULT_MIN_DURATION_SECONDS = 0
+DEFAULT_RENOTIFY_MINUTES = 60
+
+OK, PENDING, FIRING = "ok", "pending", "firing"
+
+
+class _AlertState:
+    def __init__(self):
+        self.state = OK
+        self.since = 0.0
+        self.last_notified = 0.0
+
+
+class AlertEngine:
+    def __init__(self):
+        self._states: dict[str, _AlertState] = {}
+
+    @staticmethod
+    def build_conditions(thresholds: dict, snapshot: dict) -> list[tuple[str, str, float, float]]:
+        """
+        Devuelve [(clave, etiqueta, valor, umbral)] a partir de `monitoring_thresholds`
+        y de la última muestra de metrics.py. Los discos se leen por punto de montaje.
+        """
+        conditions = [("cpu", "CPU", snapshot['cpu_percent'], thresholds.get('cpu_usage_percent', 90))]
+        if 'ram_usage_percent' in thresholds:
+            conditions.append(("ram", "RAM", snapshot['ram'].percent, thresholds['ram_usage_percent']))
+        if 'swap_usage_percent' in thresholds:
+            conditions.append(("swap", "Swap", snapshot['swap'].percent, thresholds['swap_usage_percent']))
+
+        disk_threshold = thresholds.get('disk_usage_percent', 95)
+        for mount in thresholds.get('disk_mounts', ['/']):
+            try:
+                percent = psutil.disk_usage(mount).percent
+            except OSError as e:
+                logging.error(f"No se pudo leer el uso del disco '{mount}': {e}")
+                continue
+            conditions.append((f"disk:{mount}", f"Disco ({mount})", percent, disk_threshold))
+        return conditions
+
+    def evaluate(self, conditions: list, thresholds: dict, now: float = None) -> list[tuple[str, str, float, float]]:
+        """
+        Actualiza el estado de cada condición y devuelve los avisos a enviar:
+        [(tipo, etiqueta, valor, umbral)] con tipo 'firing', 'reminder' o 'resolved'.
+        Una condición pendiente vuelve a ok en cuanto el valor deja de superar el
+        umbral, así que solo se dispara tras `min_duration_seconds` seguidos por
+        encima. Una disparada se resuelve solo al bajar de `umbral - hysteresis_percent`,
+        así que un valor que oscila alrededor del umbral no genera avisos repetidos.
+        """
+        now = time.time() if now is None else now
+        hysteresis = thresholds.get('hysteresis_percent', DEFAULT_HYSTERESIS_PERCENT)
+        min_duration = thresholds.get('min_duration_seconds', DEFAULT_MIN_DURATION_SECONDS)
+        renotify = thresholds.get('renotify_minutes', DEFAULT_RENOTIFY_MINUTES) * 60
+
+        events = []
+        for key, label, value, threshold in conditions:
+            alert = self._states.setdefault(key, _AlertState())
+            if value > threshold:
+                if alert.state == OK:
+                    alert.state, alert.since = PENDING, now
+                if alert.state == PENDING and now - alert.since >= min_duration:
+                    alert.state, alert.last_notified = FIRING, now
+                    events.append(("firing", label, value, threshold))
+                elif alert.state == FIRING and renotify > 0 and now - alert.last_notified >= renotify:
+                    alert.last_notified = now
+                    events.append(("reminder", label, value, threshold))
+            elif alert.state == PENDING:
+                alert.state = OK
+            elif alert.state == FIRING and value < threshold - hysteresis:
+                events.append(("resolved", label, value, threshold))
+                alert.state = OK
+            # Una alerta disparada dentro de la banda de histéresis sigue disparada.
+
+        # Condiciones que ya no se evalúan (p. ej. un punto de montaje quitado de
+        # `disk_mounts`): se olvida su estado para que no sigan recordándose.
+        current = {condition[0] for condition in conditions}
+        for key in [k for k in self._states if k not in current]:
+            del self._states[key]
+        return events
+
+
+def format_digest(events: list, _) -> str:
+    """Un único mensaje con todos los cambios de estado de una pasada."""
+    icons = {"firing": "🔥", "reminder": "⏰", "resolved": "✅"}
+    lines = [_("⚠️ **Alertas de recursos**")]
+    for kind, label, value, threshold in events:
+        if kind == "resolved":
+            lines.append(_("{icon} {label}: resuelta (actual: {value:.1f}%, umbral {threshold}%)").format(icon=icons[kind], label=label, value=value, threshold=threshold))
+        elif kind == "reminder":
+            lines.append(_("{icon} {label}: sigue por encima de {threshold}% (actual: {value:.1f}%)").format(icon=icons[kind], label=label, value=value, threshold=threshold))
+        else:
+            lines.append(_("{icon} {label}: uso > {threshold}% (actual: {value:.1f}%)").format(icon=icons[kind], label=label, value=value, threshold=threshold))
+    return "\n".join(lines)
+
+
+_engine = None
+
+
+def get_engine() -> AlertEngine:
+    global _engine
+    if _engine is None:
+        _engine = AlertEngine()
+    return _engine
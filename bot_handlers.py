@@ -9,22 +9,30 @@ import sys
 import time
 import datetime
 import asyncio
-import psutil
 from functools import wraps
 
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram import Update
 from telegram.helpers import escape_markdown
+from telegram.error import BadRequest, TelegramError
 
 # Módulos refactorizados
-from state import CONFIG, USERS_DATA, guardar_usuarios
+from state import CONFIG, USERS_DATA, guardar_usuarios, LOG_STATE_FILE
 from localization import setup_translation, get_system_translator
 from keyboards import * # Importamos todos los teclados
 import core_functions as core
 import system_utils as system
+from log_tailer import LogTailer, InotifyUnavailable
+from log_index import parse_time_arg
+from metrics import get_snapshot as get_metrics_snapshot
+from alert_engine import get_engine as get_alert_engine, format_digest as format_alert_digest
+from dispatcher import get_dispatcher
+from job_scheduler import get_scheduler, JobCancelled, PRIORITY_HIGH, PRIORITY_NORMAL
+from detached_runner import get_runner
+from live_output import LiveMessage, RollingWindow, get_live_settings
+from result_store import get_result_store, split_pages
+from port_probe import parse_ports, get_probe_settings
 
-# --- Lock para tareas pesadas ---
-HEAVY_TASK_LOCK = asyncio.Lock()
 AWAITING_LOCATION = 1 # Estado para conversación
 
 # --- Decoradores ---
@@ -140,7 +148,7 @@ async def language_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def fortune_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _ = setup_translation(context)
     thinking_message = await update.message.reply_text("🍀...")
-    fortune_text = await asyncio.to_thread(system.get_fortune_text_cmd, _)
+    fortune_text = await system.get_fortune_text_cmd(_)
     await thinking_message.edit_text(fortune_text, parse_mode='Markdown')
 
 
@@ -164,6 +172,25 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         )
         return
 
+    # --- Páginas de un resultado largo (formato: page:clave:número) ---
+    if data.startswith('page:'):
+        _prefix, key, page = data.split(':', 2)
+        entry = await get_result_store().get(key)
+        if entry is None or not page.isdigit():
+            await query.edit_message_reply_markup(reply_markup=None)
+            await query.message.reply_text(_("⌛ Este resultado ya no está disponible. Vuelve a ejecutar el comando."))
+            return
+        pages = entry["pages"]
+        page = min(int(page), len(pages) - 1)
+        try:
+            await _edit_page(query.edit_message_text, pages[page], entry["parse_mode"],
+                             pagination_keyboard(key, page, len(pages), entry["markup"]))
+        except BadRequest as e:
+            # Pulsar el número de página vuelve a pintar la misma página.
+            if "not modified" not in str(e).lower():
+                raise
+        return
+
     # --- 2. Manejo de menús y acciones sin parámetros ---
     menu_map = {
         'menu:main': (_("Menú Principal"), main_menu_keyboard),
@@ -205,7 +232,7 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
 
     if data == 'menu:fortune':
         await query.edit_message_text("🍀...", parse_mode='Markdown')
-        fortune_text = await asyncio.to_thread(system.get_fortune_text_cmd, _)
+        fortune_text = await system.get_fortune_text_cmd(_)
         await query.edit_message_text(fortune_text, parse_mode='Markdown', reply_markup=main_menu_keyboard(_))
         return
 
@@ -228,8 +255,8 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         }
         if action_name in monitor_map:
             await query.edit_message_text(_("Obteniendo {action_name}...").format(action_name=action_name.replace('_', ' ')))
-            reporte = await asyncio.to_thread(monitor_map[action_name], _)
-            await query.edit_message_text(reporte, parse_mode='Markdown', reply_markup=monitor_menu_keyboard(_))
+            reporte = await _call_maybe_async(monitor_map[action_name], _)
+            await _show_result(query.edit_message_text, reporte, _, reply_markup=monitor_menu_keyboard(_))
 
     # Lógica de Ejecución (Herramientas de Red y Scripts)
     elif action_type == 'run':
@@ -242,58 +269,46 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
 
             heavy_tasks = ['nmap', 'traceroute']
             is_heavy = action_name in heavy_tasks
-            if is_heavy and HEAVY_TASK_LOCK.locked():
-                await query.answer(_("⏳ Hay otra tarea pesada en ejecución. Por favor, espera."), show_alert=True)
-                return
 
             thinking_msg = _("⏳ Ejecutando `{action}` en `{param}`... (Puede tardar)").format(action=action_name, param=param) if is_heavy else _("⏳ Ejecutando `{action}` en `{param}`...").format(action=action_name, param=param)
             await query.edit_message_text(thinking_msg, parse_mode='Markdown')
 
             if is_heavy:
-                async with HEAVY_TASK_LOCK:
-                    result = await asyncio.to_thread(tool_map[action_name], param, _)
-            else:
-                result = await asyncio.to_thread(tool_map[action_name], param, _)
+                await _submit_job(
+                    update, context, "network", f"{action_name} {param}",
+                    _live_command(tool_map[action_name], param, f"⏳ {action_name} {param}", lambda text: query.edit_message_text(text), _), thinking_msg,
+                    lambda text: query.edit_message_text(text, parse_mode='Markdown'),
+                    lambda result: _show_result(query.edit_message_text, result, _, reply_markup=dynamic_host_keyboard(action_name, _)), _)
+                return
 
-            await query.edit_message_text(result, parse_mode='Markdown', reply_markup=dynamic_host_keyboard(action_name, _))
+            result = await tool_map[action_name](param, _)
+            await _show_result(query.edit_message_text, result, _, reply_markup=dynamic_host_keyboard(action_name, _))
 
         # su p.. madre.!
         # Sub-lógica para scripts, AHORA DENTRO de "elif action_type == 'run'"
         elif action_name in ['shell', 'python']:
             script_type = action_name
             script_name = param
-            if HEAVY_TASK_LOCK.locked():
-                await query.answer(_("⏳ Hay otra tarea pesada en ejecución. Por favor, espera."), show_alert=True)
-                return
-            async with HEAVY_TASK_LOCK:
-                await query.edit_message_text(
-                    _("⏳ Ejecutando script '{name}'...").format(name=script_name)
-                )
-                resultado = await asyncio.to_thread(system.run_script, script_type, script_name, _)
-
-            await query.edit_message_text(
-                resultado,
-                reply_markup=dynamic_script_keyboard(script_type, _)
-            )
+            await _submit_detached(update, context, "script", script_type, script_name, dynamic_script_keyboard(script_type, _), _)
 
     # Lógica para Administración
     elif action_type == 'admin' and action_name == 'check_cron':
         await query.edit_message_text(_("🗓️ Obteniendo tareas de Cron..."))
-        salida = await asyncio.to_thread(core.get_cron_tasks, _)
-        await query.edit_message_text(salida, parse_mode='Markdown', reply_markup=admin_menu_keyboard(_))
+        salida = await core.get_cron_tasks(_)
+        await _show_result(query.edit_message_text, salida, _, reply_markup=admin_menu_keyboard(_))
 
     # Lógica para Fail2Ban
     elif action_type == 'fail2ban':
         if action_name == 'status':
             await query.edit_message_text(_("🛡️ Obteniendo estado..."))
-            result = await asyncio.to_thread(core.fail2ban_status, _, param) # param es la jaula (o None)
-            await query.edit_message_text(result, parse_mode='Markdown', reply_markup=fail2ban_menu_keyboard(_))
+            result = await core.fail2ban_status(_, param) # param es la jaula (o None)
+            await _show_result(query.edit_message_text, result, _, reply_markup=fail2ban_menu_keyboard(_))
 
     # Lógica para Logs
     elif action_type == 'log' and action_name == 'view':
         await query.edit_message_text(_("📜 Obteniendo últimas 20 líneas de `{param}`...").format(param=param), parse_mode='Markdown')
-        result = await asyncio.to_thread(core.get_log_content, param, 20, _)
-        await query.edit_message_text(result, parse_mode='Markdown', reply_markup=dynamic_logs_keyboard(_))
+        result = await core.get_log_content(param, 20, _)
+        await _show_result(query.edit_message_text, result, _, reply_markup=dynamic_logs_keyboard(_))
 
     # Lógica para Servicios
     elif action_type == 'service':
@@ -303,22 +318,17 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
 
         if action_name == 'status':
             await query.edit_message_text(_("🔎 Verificando estado de `{param}`...").format(param=param))
-            result = await asyncio.to_thread(core.get_service_status, param, _)
+            result = await core.get_service_status(param, _)
         else:
             await query.edit_message_text(_("⏳ Ejecutando `{action}` en `{param}`...").format(action=action_name, param=param))
-            result = await asyncio.to_thread(core.manage_service, param, action_name, _)
+            result = await core.manage_service(param, action_name, _)
 
-        await query.edit_message_text(result, parse_mode='Markdown', reply_markup=dynamic_services_action_keyboard(action_name, _))
+        await _show_result(query.edit_message_text, result, _, reply_markup=dynamic_services_action_keyboard(action_name, _))
 
     # Lógica para Backups
     elif action_type == 'backup' and action_name == 'run':
-        if HEAVY_TASK_LOCK.locked():
-            await query.answer(_("⏳ Hay otra tarea pesada en ejecución. Por favor, espera."), show_alert=True)
-            return
-        async with HEAVY_TASK_LOCK:
-            await query.edit_message_text(_("⏳ Ejecutando backup '{script}'... (Puede tardar)").format(script=param), parse_mode='Markdown')
-            resultado = await asyncio.to_thread(system.run_script, "shell", param, _) # Asumimos que los backups son .sh
-        await query.edit_message_text(resultado, parse_mode='Markdown', reply_markup=dynamic_backup_script_keyboard(_))
+        # Asumimos que los backups son .sh
+        await _submit_detached(update, context, "backup", "shell", param, dynamic_backup_script_keyboard(_), _)
 ####
 @super_admin_only
 @rate_limit_and_deduplicate()
@@ -477,7 +487,7 @@ async def ask_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     question = " ".join(context.args)
     thinking_message = await update.message.reply_text(_("🤔 Pensando con Gemini Flash..."))
     result = await asyncio.to_thread(core.ask_gemini_model, question, model_name, _)
-    await thinking_message.edit_text(result, parse_mode='Markdown')
+    await _show_result(thinking_message.edit_text, result, _)
 
 @super_admin_only
 @rate_limit_and_deduplicate()
@@ -494,15 +504,146 @@ async def askpro_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     question = " ".join(context.args)
     thinking_message = await update.message.reply_text(_("🧠 Pensando con Gemini Pro... (puede tardar)"))
     result = await asyncio.to_thread(core.ask_gemini_model, question, model_name, _)
-    await thinking_message.edit_text(result, parse_mode='Markdown')
+    await _show_result(thinking_message.edit_text, result, _)
 # --- Resto de Comandos y Lógica ---
 
+async def _edit_page(edit, text: str, parse_mode, reply_markup) -> None:
+    try:
+        await edit(text, parse_mode=parse_mode, reply_markup=reply_markup)
+    except BadRequest as e:
+        if parse_mode is None or "parse" not in str(e).lower():
+            raise
+        # El corte de página (o la propia salida) ha dejado el Markdown desparejado.
+        await edit(text, reply_markup=reply_markup)
+
+async def _show_result(edit, text: str, _, parse_mode='Markdown', reply_markup=None) -> None:
+    """
+    Muestra un resultado con `edit(texto, parse_mode=..., reply_markup=...)`. Si no
+    cabe en un mensaje se guarda paginado y se muestra la primera página con botones
+    ◀️/▶️, que recorren el resto sin volver a ejecutar el comando.
+    """
+    pages = split_pages(text)
+    if len(pages) > 1:
+        extra = reply_markup.to_dict() if reply_markup else None
+        key = await get_result_store().put(pages, parse_mode, extra)
+        reply_markup = pagination_keyboard(key, 0, len(pages), extra)
+    await _edit_page(edit, pages[0], parse_mode, reply_markup)
+
+async def _call_maybe_async(func, *args):
+    """Espera directamente las corrutinas y ejecuta en un hilo las funciones bloqueantes."""
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args)
+    return await asyncio.to_thread(func, *args)
+
 async def _handle_async_command(update: Update, context: ContextTypes.DEFAULT_TYPE, func, thinking_msg: str, _):
     message_to_edit = await update.message.reply_text(thinking_msg)
-    result = await asyncio.to_thread(func, _)
-    await message_to_edit.edit_text(result, parse_mode='Markdown')
+    result = await _call_maybe_async(func, _)
+    await _show_result(message_to_edit.edit_text, result, _)
+
+def _live_command(func, target: str, title: str, edit, _):
+    """
+    Crea la corrutina de un comando de red con salida en directo: lo que imprime
+    se va mostrando con `edit(texto)` (texto plano) mientras se ejecuta.
+    """
+    async def work():
+        interval, window_bytes = get_live_settings()
+        window = RollingWindow(window_bytes)
+        live = LiveMessage(edit, lambda: window.total_bytes and f"{title} ({live.elapsed()})\n\n{window.text()}", interval)
+        live.start()
+        try:
+            return await func(target, _, on_output=window.feed)
+        finally:
+            await live.stop()
+    return work
+
+def _job_priority(user_id: int) -> int:
+    return PRIORITY_HIGH if user_id == USERS_DATA.get("super_admin_id") else PRIORITY_NORMAL
+
+async def _submit_detached(update: Update, context: ContextTypes.DEFAULT_TYPE, resource: str,
+                           script_type: str, script_name: str, keyboard, _):
+    """
+    Lanza un script o backup en segundo plano y responde al momento con el ID de la
+    tarea. La salida va a disco y el resultado se avisa al chat cuando termina.
+    """
+    query = update.callback_query
+    command, error = system.prepare_script(script_type, script_name, _)
+    if error:
+        await query.edit_message_text(error, reply_markup=keyboard)
+        return
+
+    scheduler = get_scheduler()
+    user_id, chat_id = update.effective_user.id, update.effective_chat.id
+    job_id = scheduler.new_id()
+
+    async def work():
+        # El script pudo cambiar mientras esperaba en la cola: se vuelve a comprobar.
+        command, error = system.prepare_script(script_type, script_name, _)
+        if error:
+            get_dispatcher().send(chat_id, error, merge=False)
+            return
+
+        # Salida en directo: se lee el final del fichero de salida a cada edición.
+        runner = get_runner()
+        interval, window_bytes = get_live_settings()
+        title = _("▶️ Tarea #{id} ({name}) en curso").format(id=job_id, name=script_name)
+        live = LiveMessage(
+            lambda text: query.edit_message_text(text, reply_markup=keyboard),
+            lambda: runner.output_size(job_id) and f"{title} ({live.elapsed()})\n\n{runner.read_output(job_id, window_bytes)[0]}",
+            interval)
+        live.start()
+        try:
+            record = await runner.run(job_id, script_name, command, user_id, chat_id)
+        except asyncio.CancelledError:
+            await live.stop(_("🛑 Tarea #{id} ({name}) cancelada. /job {id} muestra la salida parcial.").format(id=job_id, name=script_name))
+            raise
+        except OSError as e:
+            logging.error(f"No se pudo lanzar la tarea #{job_id} ({script_name}): {e}")
+            await live.stop(_("❌ No se pudo lanzar '{name}': {error}").format(name=script_name, error=e))
+            return
+        # El detalle queda en el mensaje editado; el aviso nuevo es para que suene la notificación.
+        await live.stop(core.get_job_notification_text(record, _))
+        get_dispatcher().send(chat_id, core.get_job_finished_text(record, _), merge=False)
+
+    job = scheduler.submit(resource, f"{resource} {script_name}", work, user_id, chat_id, _job_priority(user_id), job_id=job_id)
+    text = _("🚀 '{name}' lanzado en segundo plano como tarea #{id}. Te avisaré al terminar; /job {id} muestra la salida.").format(name=script_name, id=job_id)
+    if (position := scheduler.position(job)):
+        text = _("⏳ '{name}' en cola: {pos}º (tarea #{id}). Te avisaré al terminar; /cancel {id} la cancela.").format(name=script_name, pos=position, id=job_id)
+    await query.edit_message_text(text, reply_markup=keyboard)
+
+async def _submit_job(update: Update, context: ContextTypes.DEFAULT_TYPE, resource: str, description: str,
+                      work, running_text: str, edit, on_result, _):
+    """
+    Encola una tarea pesada en el planificador y vuelve enseguida.
+    `work()` crea la corrutina de la tarea, `edit(texto)` actualiza el mensaje de
+    progreso y `on_result(resultado)` muestra el resultado. El manejador no espera
+    a la tarea, así el chat sigue atendiendo otros comandos (por ejemplo /cancel).
+    """
+    scheduler = get_scheduler()
+    user_id = update.effective_user.id
+    priority = _job_priority(user_id)
+
+    async def run():
+        try:
+            await edit(running_text)
+        except TelegramError:
+            pass
+        return await work()
+
+    job = scheduler.submit(resource, description, run, user_id, update.effective_chat.id, priority)
+    if (position := scheduler.position(job)):
+        await edit(_("⏳ En cola: {pos}º (tarea #{id}). Usa `/cancel {id}` para cancelarla.").format(pos=position, id=job.id))
+
+    async def finish():
+        try:
+            result = await job.wait()
+        except JobCancelled:
+            await edit(_("🛑 Tarea #{id} cancelada.").format(id=job.id))
+            return
+        await on_result(result)
 
-async def _handle_async_network_command(update: Update, context: ContextTypes.DEFAULT_TYPE, func, usage: str, thinking_prefix: str, _):
+    context.application.create_task(finish(), update=update)
+
+async def _handle_async_network_command(update: Update, context: ContextTypes.DEFAULT_TYPE, func, usage: str, thinking_prefix: str, _, resource: str = None):
     if not context.args:
         await update.message.reply_text(_("Uso: {use}").format(use=usage))
         return
@@ -512,8 +653,16 @@ async def _handle_async_network_command(update: Update, context: ContextTypes.DE
         return
 
     message_to_edit = await update.message.reply_text(f"{thinking_prefix} `{target}`...")
-    result = await asyncio.to_thread(func, target, _)
-    await message_to_edit.edit_text(result, parse_mode='Markdown')
+    if resource:
+        await _submit_job(
+            update, context, resource, f"{func.__name__} {target}",
+            _live_command(func, target, f"{thinking_prefix} {target}", lambda text: message_to_edit.edit_text(text), _),
+            f"{thinking_prefix} `{target}`...",
+            lambda text: message_to_edit.edit_text(text, parse_mode='Markdown'),
+            lambda result: _show_result(message_to_edit.edit_text, result, _), _)
+        return
+    result = await _call_maybe_async(func, target, _)
+    await _show_result(message_to_edit.edit_text, result, _)
 
 @authorized_only
 @rate_limit_and_deduplicate()
@@ -543,7 +692,7 @@ async def analyze_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Obtenemos los datos del sistema en un hilo separado
-    source_data = await asyncio.to_thread(source_data_map[resource], _)
+    source_data = await _call_maybe_async(source_data_map[resource], _)
 
     await thinking_message.edit_text(_("🧠 Analizando datos con Gemini flash..."))
 
@@ -552,13 +701,13 @@ async def analyze_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Llamamos al modelo de IA en un hilo separado
     result = await asyncio.to_thread(core.ask_gemini_model, final_prompt, model_name, _)
 
-    await thinking_message.edit_text(result, parse_mode='Markdown')
+    await _show_result(thinking_message.edit_text, result, _)
 
 
 async def reminder_callback(context: ContextTypes.DEFAULT_TYPE) -> None:
     _ = setup_translation(context)
     job = context.job
-    await context.bot.send_message(chat_id=job.chat_id, text=_("🔔 **Recordatorio:**\n\n{data}").format(data=job.data))
+    get_dispatcher().send(job.chat_id, _("🔔 **Recordatorio:**\n\n{data}").format(data=job.data), merge=False)
 
 @authorized_only
 @rate_limit_and_deduplicate()
@@ -636,6 +785,75 @@ async def reminders_delete_command(update: Update, context: ContextTypes.DEFAULT
         
     await update.message.reply_text(_("✅ Recordatorio `{id}` eliminado.").format(id=job_name_to_delete))
 
+@authorized_only
+@rate_limit_and_deduplicate()
+async def jobs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    _ = setup_translation(context)
+    scheduler = get_scheduler()
+    jobs = scheduler.active_jobs()
+    if not jobs:
+        await update.message.reply_text(_("ℹ️ No hay tareas en ejecución ni en cola."))
+        return
+
+    message = [_("🧵 **Tareas pesadas:**\n")]
+    now = time.time()
+    for job in jobs:
+        description = escape_markdown(job.description)
+        if job.started is not None:
+            elapsed = str(datetime.timedelta(seconds=int(now - job.started)))
+            message.append(_("▶️ #{id} [{res}] {desc} — en ejecución ({t})").format(id=job.id, res=job.resource, desc=description, t=elapsed))
+        else:
+            message.append(_("⏳ #{id} [{res}] {desc} — en cola ({pos}º)").format(id=job.id, res=job.resource, desc=description, pos=scheduler.position(job)))
+    message.append(_("\nUsa `/cancel <id>` para cancelar una tarea."))
+    await update.message.reply_text("\n".join(message), parse_mode='Markdown')
+
+@authorized_only
+@rate_limit_and_deduplicate()
+async def job_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    _ = setup_translation(context)
+    if not context.args:
+        await update.message.reply_text(core.get_recent_jobs_text(_))
+        return
+    if not context.args[0].lstrip('#').isdigit():
+        await update.message.reply_text(_("Uso: `/job [id] [file]`"), parse_mode='Markdown')
+        return
+
+    job_id = int(context.args[0].lstrip('#'))
+    if len(context.args) > 1 and context.args[1].lower() == 'file':
+        output_path = get_runner().output_path(job_id)
+        if not os.path.exists(output_path):
+            await update.message.reply_text(_("❌ No hay salida guardada para la tarea #{id}.").format(id=job_id))
+            return
+        with open(output_path, 'rb') as f:
+            await context.bot.send_document(chat_id=update.effective_chat.id, document=f, filename=f"job_{job_id}.log")
+        return
+    await _show_result(update.message.reply_text, core.get_job_text(job_id, _), _, parse_mode=None)
+
+@authorized_only
+@rate_limit_and_deduplicate()
+async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    _ = setup_translation(context)
+    if not context.args or not context.args[0].lstrip('#').isdigit():
+        await update.message.reply_text(_("Uso: `/cancel <id>` (mira los IDs con /jobs)"), parse_mode='Markdown')
+        return
+
+    job_id = int(context.args[0].lstrip('#'))
+    scheduler = get_scheduler()
+    job = scheduler.get(job_id)
+    if job is None:
+        await update.message.reply_text(_("❌ No hay ninguna tarea activa con ID #{id}.").format(id=job_id))
+        return
+
+    user_id = update.effective_user.id
+    if job.user_id != user_id and user_id != USERS_DATA.get("super_admin_id"):
+        await update.message.reply_text(_("⛔ Solo puedes cancelar tus propias tareas."))
+        return
+
+    if scheduler.cancel(job_id):
+        await update.message.reply_text(_("🛑 Cancelando la tarea #{id}...").format(id=job_id))
+    else:
+        await update.message.reply_text(_("ℹ️ La tarea #{id} ya había terminado.").format(id=job_id))
+
 @super_admin_only
 @rate_limit_and_deduplicate()
 async def fail2ban_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -659,12 +877,12 @@ async def fail2ban_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     thinking_message = await update.message.reply_text(_("🛡️ Procesando comando Fail2Ban..."))
 
     if subcommand == 'status':
-        result = await asyncio.to_thread(core.fail2ban_status, _)
-        await thinking_message.edit_text(result, parse_mode='Markdown')
+        result = await core.fail2ban_status(_)
+        await _show_result(thinking_message.edit_text, result, _)
     elif subcommand == 'unban':
         ip_address = context.args[1]
-        result = await asyncio.to_thread(core.fail2ban_unban, ip_address, _)
-        await thinking_message.edit_text(result, parse_mode='Markdown')
+        result = await core.fail2ban_unban(ip_address, _)
+        await _show_result(thinking_message.edit_text, result, _)
     else:
         await thinking_message.edit_text(_("Comando no reconocido. Usa `status` o `unban`."))
 
@@ -685,7 +903,7 @@ async def receive_weather_location(update: Update, context: ContextTypes.DEFAULT
     thinking_message = await update.message.reply_text(f"🌦️ {_('Consultando el tiempo para')} `{location}`...")
     
     # Llama a la función de system_utils
-    weather_report = await asyncio.to_thread(system.get_weather_text_cmd, location, _)
+    weather_report = await system.get_weather_text_cmd(location, _)
 
     await thinking_message.edit_text(
             weather_report, 
@@ -716,8 +934,8 @@ async def docker_command_handler(update: Update, context: ContextTypes.DEFAULT_T
     container = context.args[1] if len(context.args) > 1 else None
     lines = int(context.args[2]) if len(context.args) > 2 and context.args[2].isdigit() else 20
     
-    result = await asyncio.to_thread(core.docker_logic, action, _, container, lines)
-    await thinking_message.edit_text(result, parse_mode='Markdown')
+    result = await core.docker_logic(action, _, container, lines)
+    await _show_result(thinking_message.edit_text, result, _)
 
 @authorized_only
 @rate_limit_and_deduplicate()
@@ -729,21 +947,34 @@ async def ping_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 @rate_limit_and_deduplicate()
 async def traceroute_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _ = setup_translation(context)
-    if HEAVY_TASK_LOCK.locked():
-        await update.message.reply_text(_("⏳ Hay otra tarea pesada en ejecución. Por favor, espera."))
-        return
-    async with HEAVY_TASK_LOCK:
-        await _handle_async_network_command(update, context, system.do_traceroute, "/traceroute <host>", _("🗺️ Ejecutando traceroute a"), _)
+    await _handle_async_network_command(update, context, system.do_traceroute, "/traceroute <host>", _("🗺️ Ejecutando traceroute a"), _, resource="network")
 
 @authorized_only
 @rate_limit_and_deduplicate()
 async def nmap_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _ = setup_translation(context)
-    if HEAVY_TASK_LOCK.locked():
-        await update.message.reply_text(_("⏳ Hay otra tarea pesada en ejecución. Por favor, espera."))
+    await _handle_async_network_command(update, context, system.do_nmap, "/nmap <host>", _("🔬 Ejecuturando Nmap a"), _, resource="network")
+
+@authorized_only
+@rate_limit_and_deduplicate()
+async def portcheck_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    _ = setup_translation(context)
+    if len(context.args) < 2:
+        await update.message.reply_text(_("Uso: /portcheck <host> <puertos...>\nEjemplo: `/portcheck example.com 22 80,443 8000-8010`"))
+        return
+    target = context.args[0]
+    if not is_valid_target(target):
+        await update.message.reply_text(_("❌ El objetivo '{target}' no es válido.").format(target=target))
+        return
+    _timeout, _concurrency, max_ports = get_probe_settings()
+    ports = parse_ports(context.args[1:], max_ports)
+    if ports is None:
+        await update.message.reply_text(_("❌ Puertos no válidos. Usa números o rangos entre 1 y 65535 (máximo {max} puertos).").format(max=max_ports))
         return
-    async with HEAVY_TASK_LOCK:
-        await _handle_async_network_command(update, context, system.do_nmap, "/nmap <host>", _("🔬 Ejecuturando Nmap a"), _)
+
+    message_to_edit = await update.message.reply_text(_("🔌 Comprobando {count} puertos de `{target}`...").format(count=len(ports), target=target), parse_mode='Markdown')
+    result = await core.get_portcheck_text(target, ports, _)
+    await _show_result(message_to_edit.edit_text, result, _)
 
 @authorized_only
 @rate_limit_and_deduplicate()
@@ -757,6 +988,17 @@ async def whois_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _ = setup_translation(context)
     await _handle_async_network_command(update, context, system.do_whois, "/whois <dominio>", _("👤 Realizando consulta WHOIS para"), _)
 
+@authorized_only
+@rate_limit_and_deduplicate()
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    _ = setup_translation(context)
+    if not context.args:
+        await update.message.reply_text(_("Uso: `/history <métrica> [ventana]`\nMétricas: `cpu`, `load`, `ram`, `swap`, `disk`. Ventana: `30m`, `6h`, `7d` (por defecto `1h`)."), parse_mode='Markdown')
+        return
+    metric = context.args[0].lower()
+    window = context.args[1] if len(context.args) > 1 else "1h"
+    await update.message.reply_text(core.get_history_text(metric, window, _), parse_mode='Markdown')
+
 @authorized_only
 @rate_limit_and_deduplicate()
 async def resources_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -775,6 +1017,16 @@ async def processes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _ = setup_translation(context)
     await _handle_async_command(update, context, system.get_processes_text, _("⚙️ Listando procesos..."), _)
 
+@authorized_only
+@rate_limit_and_deduplicate()
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    _ = setup_translation(context)
+    # `/status force` vuelve a consultar todos los certificados SSL en lugar de usar la caché.
+    force = bool(context.args) and context.args[0].lower() in ('force', '--force')
+    thinking_message = await update.message.reply_text(_("📋 Generando reporte de estado..."))
+    result = await core.get_status_report_text(_, force=force)
+    await _show_result(thinking_message.edit_text, result, _)
+
 @authorized_only
 @rate_limit_and_deduplicate()
 async def systeminfo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -786,33 +1038,81 @@ async def systeminfo_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def logs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _ = setup_translation(context)
     if not context.args:
-        await update.message.reply_text(_("Uso: `/logs <alias> [líneas]` o `/logs search <alias> <patrón>`"))
+        await update.message.reply_text(_("Uso: `/logs <alias> [líneas]`, `/logs search [--all] [--from <desde>] [--to <hasta>] <alias> <patrón>` o `/logs range <alias> <desde> [hasta]`"))
         return
 
-    if context.args[0] == 'search':
+    if context.args[0] == 'range':
         if len(context.args) < 3:
-            await update.message.reply_text(_("Uso: `/logs search <alias> <patrón>`"), parse_mode='Markdown'); return
-        
+            await update.message.reply_text(_("Uso: `/logs range <alias> <desde> [hasta]`\nFormatos: `HH:MM`, `AAAA-MM-DD`, `AAAA-MM-DDTHH:MM`, `now`"), parse_mode='Markdown'); return
         alias_log = context.args[1]
-        search_pattern = " ".join(context.args[2:])
+        start_ts = parse_time_arg(context.args[2])
+        end_ts = parse_time_arg(context.args[3], end=True) if len(context.args) > 3 else time.time()
+        if start_ts is None or end_ts is None or start_ts > end_ts:
+            await update.message.reply_text(_("❌ Rango de tiempo no válido."))
+            return
+        thinking_message = await update.message.reply_text("📜 Leyendo rango de logs...")
+        await _submit_job(
+            update, context, "logsearch", f"logs range {alias_log}", lambda: core.get_log_range(alias_log, start_ts, end_ts, None, _),
+            "📜 Leyendo rango de logs...",
+            lambda text: thinking_message.edit_text(text, parse_mode='Markdown'),
+            lambda result: _show_result(thinking_message.edit_text, result, _), _)
+        return
+    elif context.args[0] == 'search':
+        args = list(context.args[1:])
+        window = {}
+        all_generations = False
+        while args and args[0] in ('--from', '--to', '--all'):
+            if args[0] == '--all':
+                all_generations = True
+                del args[:1]
+                continue
+            if len(args) < 2:
+                break
+            window[args[0]] = args[1]
+            del args[:2]
+        if len(args) < 2:
+            await update.message.reply_text(_("Uso: `/logs search [--all] [--from <desde>] [--to <hasta>] <alias> <patrón>`"), parse_mode='Markdown'); return
+        if all_generations and window:
+            await update.message.reply_text(_("❌ `--all` no se puede combinar con `--from`/`--to`."), parse_mode='Markdown'); return
+        
+        alias_log = args[0]
+        search_pattern = " ".join(args[1:])
 
         if not is_safe_grep_pattern(search_pattern):
             await update.message.reply_text(_("❌ El patrón de búsqueda contiene caracteres no permitidos o potencialmente peligrosos."))
             return
 
-        if HEAVY_TASK_LOCK.locked():
-            await update.message.reply_text(_("⏳ Hay otra tarea pesada en ejecución. Por favor, espera."))
+        if window:
+            # Con ventana temporal se usa el índice: solo se lee el trozo del log que toca.
+            start_ts = parse_time_arg(window['--from']) if '--from' in window else 0.0
+            end_ts = parse_time_arg(window['--to'], end=True) if '--to' in window else time.time()
+            if start_ts is None or end_ts is None or start_ts > end_ts:
+                await update.message.reply_text(_("❌ Rango de tiempo no válido."))
+                return
+            thinking_message = await update.message.reply_text("📜 Buscando en logs...")
+            await _submit_job(
+                update, context, "logsearch", f"logs search {alias_log} '{search_pattern}'",
+                lambda: core.get_log_range(alias_log, start_ts, end_ts, search_pattern, _),
+                "📜 Buscando en logs...",
+                lambda text: thinking_message.edit_text(text, parse_mode='Markdown'),
+                lambda result: _show_result(thinking_message.edit_text, result, _), _)
             return
-        async with HEAVY_TASK_LOCK:
-            thinking_message = await update.message.reply_text("📜 Buscando en logs... (Puede tardar)")
-            result = await asyncio.to_thread(core.search_log, alias_log, search_pattern, _) 
+
+        thinking_message = await update.message.reply_text("📜 Buscando en logs... (Puede tardar)")
+        search = core.search_log_all if all_generations else core.search_log
+        await _submit_job(
+            update, context, "logsearch", f"logs search {alias_log} '{search_pattern}'", lambda: search(alias_log, search_pattern, _),
+            "📜 Buscando en logs... (Puede tardar)",
+            lambda text: thinking_message.edit_text(text, parse_mode='Markdown'),
+            lambda result: _show_result(thinking_message.edit_text, result, _), _)
+        return
     else:
         alias_log = context.args[0]
         num_lines = int(context.args[1]) if len(context.args) > 1 and context.args[1].isdigit() else 20
         thinking_message = await update.message.reply_text(f"📜 Obteniendo últimas {num_lines} líneas de `{alias_log}`...")
-        result = await asyncio.to_thread(core.get_log_content, alias_log, num_lines, _)
+        result = await core.get_log_content(alias_log, num_lines, _)
 
-    await thinking_message.edit_text(result, parse_mode='Markdown')
+    await _show_result(thinking_message.edit_text, result, _)
 
 # --- NUEVOS COMANDOS ---
 @authorized_only
@@ -823,8 +1123,8 @@ async def analizador_logs_command(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text(_("Uso: /analizar_logs <ruta_al_log> [opciones]\nUsa --help para más detalles."))
         return
     thinking_message = await update.message.reply_text("...")
-    result = await asyncio.to_thread(system.run_analizador_logs, context.args, _)
-    await thinking_message.edit_text(f"```\n{result}\n```", parse_mode='Markdown')
+    result = await system.run_analizador_logs(context.args, _)
+    await _show_result(thinking_message.edit_text, f"```\n{result}\n```", _)
 
 @authorized_only
 @rate_limit_and_deduplicate()
@@ -834,16 +1134,16 @@ async def muestra_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(_("Uso: /muestra <ruta_al_fichero> [opciones]"))
         return
     thinking_message = await update.message.reply_text("...")
-    result = await asyncio.to_thread(system.run_muestra, context.args, _)
-    await thinking_message.edit_text(f"```\n{result}\n```", parse_mode='Markdown')
+    result = await system.run_muestra(context.args, _)
+    await _show_result(thinking_message.edit_text, f"```\n{result}\n```", _)
 
 @authorized_only
 @rate_limit_and_deduplicate()
 async def muestrared_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _ = setup_translation(context)
     thinking_message = await update.message.reply_text("...")
-    result = await asyncio.to_thread(system.run_muestrared, context.args, _)
-    await thinking_message.edit_text(f"```\n{result}\n```", parse_mode='Markdown')
+    result = await system.run_muestrared(context.args, _)
+    await _show_result(thinking_message.edit_text, f"```\n{result}\n```", _)
 
 @authorized_only
 @rate_limit_and_deduplicate()
@@ -853,8 +1153,8 @@ async def redes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(_("Uso: /redes <comando> [opciones]\nComandos: interfaces, scan, traceroute, velocidad"))
         return
     thinking_message = await update.message.reply_text("...")
-    result = await asyncio.to_thread(system.run_redes, context.args, _)
-    await thinking_message.edit_text(f"```\n{result}\n```", parse_mode='Markdown')
+    result = await system.run_redes(context.args, _)
+    await _show_result(thinking_message.edit_text, f"```\n{result}\n```", _)
 
 
 def get_help_text(_):
@@ -871,11 +1171,14 @@ def get_help_text(_):
           "`/analyze <recurso> <pregunta>` - Pide a la IA que analice datos del sistema. Recursos: `status`, `resources`, `processes`, `disk`.\n\n"
           "*--- Monitorización ---*\n"
           "`/resources` - Reporte de CPU, RAM y carga.\n"
+          "`/history <métrica> [ventana]` - Histórico de CPU, carga, RAM, swap o disco.\n"
           "`/disk` - Uso de discos (`df -h`).\n"
           "`/processes` - Lista de procesos (`ps aux`).\n"
           "`/systeminfo` - Info del sistema.\n"
+          "`/status [force]` - Reporte de estado de los servidores (`force`: vuelve a consultar los certificados SSL).\n"
           "`/logs <alias> [líneas]` - Muestra las últimas líneas de un log.\n"
-          "`/logs search <alias> <patrón>` - Busca en un log.\n\n"
+          "`/logs search [--all] [--from <desde>] [--to <hasta>] <alias> <patrón>` - Busca en un log (`--all`: también en los rotados).\n"
+          "`/logs range <alias> <desde> [hasta]` - Líneas de un log entre dos horas.\n\n"
           "*--- Gestión y Admin ---*\n"
           "`/docker <ps|logs|restart> [cont]` - Gestiona Docker.\n"
           "`/get <imgs|files> <fichero>` - Descarga un archivo.\n"
@@ -884,6 +1187,7 @@ def get_help_text(_):
           "`/ping <objetivo>`\n"
           "`/traceroute <objetivo>`\n"
           "`/nmap <objetivo>`\n"
+          "`/portcheck <objetivo> <puertos...>` - Comprueba varios puertos TCP a la vez.\n"
           "`/dig <objetivo>`\n"
           "`/whois <objetivo>`\n\n"
           "*--- Herramientas Avanzadas---*\n"
@@ -895,6 +1199,10 @@ def get_help_text(_):
           "`/remind \"texto\" in <tiempo>` - Programa un recordatorio.\n"
           "`/reminders` - Lista tus recordatorios.\n"
           "`/delremind <ID>` - Borra un recordatorio.\n\n"
+          "*--- Tareas Pesadas ---*\n"
+          "`/jobs` - Tareas en ejecución y en cola.\n"
+          "`/cancel <id>` - Cancela una de tus tareas.\n"
+          "`/job [id] [file]` - Resultado y salida de un script o backup lanzado en segundo plano.\n\n"
           "*--- Seguridad (Solo Super Admin) ---*\n"
           "`/fail2ban status` - Estado de las jaulas de Fail2Ban.\n"
           "`/fail2ban unban <IP>` - Desbloquea una IP.\n\n"
@@ -927,17 +1235,56 @@ async def adduser_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(_("ℹ️ El usuario `{id}` ya estaba autorizado.").format(id=new_user_id))
 
 # --- Tareas Periódicas ---
+async def _send_log_alerts(bot, alerts: list):
+    # El dispatcher junta las alertas pendientes en mensajes de hasta 4096 caracteres
+    # y respeta los límites de Telegram; aquí solo se encolan.
+    if alerts and USERS_DATA.get("super_admin_id"):
+        dispatcher = get_dispatcher()
+        for alert in alerts:
+            dispatcher.send(USERS_DATA["super_admin_id"], alert, parse_mode='Markdown')
+
 async def periodic_log_check(context: ContextTypes.DEFAULT_TYPE):
     _ = get_system_translator()
     logging.info("Ejecutando comprobación de monitorización de logs...")
     alerts = await asyncio.to_thread(core.check_watched_logs, _)
-    if alerts and USERS_DATA.get("super_admin_id"):
-        for alert in alerts:
-            try:
-                await context.bot.send_message(chat_id=USERS_DATA["super_admin_id"], text=alert, parse_mode='Markdown')
-                await asyncio.sleep(1)
-            except Exception as e:
-                logging.error(f"No se pudo enviar la alerta de log al super_admin: {e}")
+    await _send_log_alerts(context.bot, alerts)
+
+# --- Seguimiento de logs con inotify ---
+LOG_TAILER = None
+
+async def start_log_tailer(application) -> bool:
+    """Arranca el seguimiento de logs por eventos. Devuelve False si inotify no está disponible."""
+    global LOG_TAILER
+    _ = get_system_translator()
+
+    async def on_hits(alias, hits):
+        await _send_log_alerts(application.bot, core.format_log_alerts(alias, hits, _))
+
+    tailer = LogTailer(core.get_watched_logs(), LOG_STATE_FILE, on_hits)
+    try:
+        tailer.start()
+    except InotifyUnavailable as e:
+        logging.warning(f"inotify no disponible ({e}); se usará la comprobación periódica de logs.")
+        return False
+    LOG_TAILER = tailer
+    return True
+
+async def stop_log_tailer(application):
+    if LOG_TAILER is not None:
+        await LOG_TAILER.stop()
+
+async def checkpoint_log_tailer(context: ContextTypes.DEFAULT_TYPE):
+    if LOG_TAILER is not None:
+        await LOG_TAILER.checkpoint()
+
+async def periodic_log_index_update(context: ContextTypes.DEFAULT_TYPE):
+    await core.update_log_indexes()
+
+async def periodic_metrics_history_save(context: ContextTypes.DEFAULT_TYPE):
+    await asyncio.to_thread(core.get_history().save)
+
+async def periodic_ssl_cache_refresh(context: ContextTypes.DEFAULT_TYPE):
+    await core.get_ssl_cache().refresh(core.ssl_endpoints())
 
 async def periodic_monitoring_check(context: ContextTypes.DEFAULT_TYPE):
     logging.info("Ejecutando comprobación de monitorización periódica de recursos...")
@@ -945,18 +1292,17 @@ async def periodic_monitoring_check(context: ContextTypes.DEFAULT_TYPE):
     super_admin_id = USERS_DATA.get("super_admin_id")
     if not super_admin_id or not thresholds: return
 
+    # Solo se avisa al cambiar de estado (o al recordar una alerta que sigue activa),
+    # y todos los cambios de esta pasada van en un único mensaje.
+    engine = get_alert_engine()
     try:
-        if (cpu := psutil.cpu_percent(interval=1)) > (cpu_t := thresholds.get('cpu_usage_percent', 90)):
-            msg = f"⚠️ ALERTA CPU: Uso > {cpu_t}% (actual: {cpu:.1f}%)"
-            await context.bot.send_message(super_admin_id, msg)
-            logging.warning(msg)
+        conditions = await asyncio.to_thread(engine.build_conditions, thresholds, get_metrics_snapshot())
+        events = engine.evaluate(conditions, thresholds)
     except Exception as e:
-        logging.error(f"Error en chequeo periódico de CPU: {e}")
-        
-    try:
-        if (disk := psutil.disk_usage('/')).percent > (disk_t := thresholds.get('disk_usage_percent', 95)):
-            msg = f"⚠️ ALERTA DISCO: Uso de (/) > {disk_t}% (actual: {disk.percent:.1f}%)"
-            await context.bot.send_message(super_admin_id, msg)
-            logging.warning(msg)
-    except Exception as e:
-        logging.error(f"Error en chequeo periódico de Disco: {e}")
+        logging.error(f"Error en chequeo periódico de recursos: {e}")
+        return
+
+    if events:
+        msg = format_alert_digest(events, get_system_translator())
+        logging.warning(msg)
+        get_dispatcher().send(super_admin_id, msg, parse_mode='Markdown')
@@ -3,6 +3,7 @@
 # VERSION: 2.5 
 # AUTHOR: Oscar Gimenez Blasco & Gemini para LANG, menus, el README.md y la p..a identacion en python.
 
+import asyncio
 import logging
 import sys
 import html
@@ -13,19 +14,32 @@ from telegram.ext import Application, CommandHandler, CallbackQueryHandler, Mess
 from telegram.constants import ParseMode
 
 # Importamos desde los nuevos módulos
-from state import SECRETS, CONFIG, USERS_DATA, PERSISTENCE_FILE
-from custom_persistence import JsonPersistence
+from state import SECRETS, CONFIG, USERS_DATA, PERSISTENCE_FILE, PERSISTENCE_DB_FILE
+from custom_persistence import JsonPersistence, SqlitePersistence
+from system_utils import install_child_watcher
+from log_search import shutdown_pool as shutdown_search_pool
+from metrics import get_sampler as get_metrics_sampler
+from metrics_history import get_history as get_metrics_history
+from dispatcher import get_dispatcher
+from error_reporter import get_reporter as get_error_reporter
+from check_scheduler import get_check_scheduler
+from core_functions import build_server_checks
+from update_processor import PerChatUpdateProcessor, DEFAULT_CONCURRENT_UPDATES, DEFAULT_MAX_PENDING_UPDATES
 from bot_handlers import (
     start_command, help_command, button_callback_handler,
-    ping_command, traceroute_command, nmap_command, dig_command, whois_command,
+    ping_command, traceroute_command, nmap_command, portcheck_command, dig_command, whois_command,
     resources_command, disk_command, processes_command, systeminfo_command,
     logs_command, docker_command_handler, analyze_command,
     adduser_command, deluser_command, listusers_command,
     handle_file_upload, get_file_command,
     periodic_monitoring_check, periodic_log_check,
+    start_log_tailer, stop_log_tailer, checkpoint_log_tailer, periodic_log_index_update,
+    periodic_metrics_history_save, history_command,
+    periodic_ssl_cache_refresh, status_command,
     fortune_command,
     ask_command, askpro_command,
     remind_command, reminders_list_command, reminders_delete_command,
+    jobs_command, cancel_command, job_command,
     language_command,
     start_weather_conversation, receive_weather_location, cancel_conversation, AWAITING_LOCATION,
     fail2ban_command,
@@ -46,7 +60,27 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Manejador de errores global. Notifica al super admin."""
+    """
+    Manejador de errores global. Notifica al super admin.
+    Las excepciones repetidas (misma huella) no se vuelven a notificar con la
+    traza: dentro de la ventana solo se cuentan y luego se envía un resumen.
+    """
+    reporter = get_error_reporter()
+    is_new, repeated, entry = reporter.record(context.error)
+    super_admin_id = USERS_DATA.get("super_admin_id")
+    dispatcher = get_dispatcher()
+
+    if super_admin_id and isinstance(update, Update) and update.effective_chat \
+            and reporter.should_notify_chat(entry, update.effective_chat.id):
+        dispatcher.send(update.effective_chat.id, "🤖 Vaya, algo ha salido mal. He notificado al administrador.", merge=False)
+
+    if not is_new:
+        # Repetición: sin formatear la traza.
+        logger.warning(f"Excepción repetida ({entry.total} en total): {entry.summary}")
+        if repeated and super_admin_id:
+            dispatcher.send(super_admin_id, _format_error_summary(entry.summary, repeated, entry.total), parse_mode=ParseMode.HTML)
+        return
+
     logger.error("Exception while handling an update:", exc_info=context.error)
     tb_list = traceback.format_exception(None, context.error, context.error.__traceback__)
     tb_string = "".join(tb_list)
@@ -56,17 +90,112 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
     if len(message) > 4096:
         message = message[:4000] + "\n... (mensaje truncado)</pre>"
 
+    if super_admin_id:
+        dispatcher.send(super_admin_id, message, parse_mode=ParseMode.HTML)
+
+
+def _format_error_summary(summary: str, repeated: int, total: int) -> str:
+    window_minutes = get_error_reporter().window / 60
+    return (f"🔁 <b>{repeated} ocurrencias más</b> en los últimos {window_minutes:g} min "
+            f"({total} en total):\n<code>{html.escape(summary)}</code>")
+
+
+async def flush_error_summaries(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Envía el resumen de las tormentas de errores que ya han terminado."""
     super_admin_id = USERS_DATA.get("super_admin_id")
+    summaries = get_error_reporter().pop_summaries()
     if super_admin_id:
-        if isinstance(update, Update) and update.effective_chat:
-            await context.bot.send_message(chat_id=update.effective_chat.id, text="🤖 Vaya, algo ha salido mal. He notificado al administrador.")
-        await context.bot.send_message(chat_id=super_admin_id, text=message, parse_mode=ParseMode.HTML)
+        for summary, repeated, total in summaries:
+            get_dispatcher().send(super_admin_id, _format_error_summary(summary, repeated, total), parse_mode=ParseMode.HTML)
+
+
+def build_persistence():
+    """Crea el backend de persistencia indicado en `persistence.backend` ("json" o "sqlite")."""
+    persistence_config = CONFIG.get("persistence", {})
+    backend = persistence_config.get("backend", "json")
+    if backend == "sqlite":
+        db_file = persistence_config.get("sqlite_file", PERSISTENCE_DB_FILE)
+        logger.info(f"Usando persistencia SQLite en '{db_file}'.")
+        # Si la base de datos está vacía se importa el fichero JSON existente una sola vez.
+        return SqlitePersistence(filepath=db_file, migrate_from=PERSISTENCE_FILE)
+    if backend != "json":
+        logger.warning(f"Backend de persistencia desconocido '{backend}', se usará JSON.")
+    return JsonPersistence(filepath=PERSISTENCE_FILE)
+
+
+async def post_init(application: Application) -> None:
+    """Arranca los subsistemas que necesitan el bucle de eventos en marcha."""
+    job_queue = application.job_queue
+
+    # Cola de mensajes salientes: alertas, errores y recordatorios pasan por ella
+    get_dispatcher().start(application.bot)
+    error_window = get_error_reporter().window
+    job_queue.run_repeating(flush_error_summaries, interval=error_window, first=error_window)
+
+    # Muestreador de métricas: /resources y las alertas de umbral leen su última muestra
+    sampler = get_metrics_sampler()
+    sampler.listeners.append(get_metrics_history().record)
+    sampler.start()
+    snapshot_interval = CONFIG.get("metrics", {}).get("history_snapshot_seconds", 300)
+    job_queue.run_repeating(periodic_metrics_history_save, interval=snapshot_interval, first=snapshot_interval)
+
+    # Monitorización de logs: por eventos inotify o, si no es posible, por sondeo
+    log_config = CONFIG.get("log_monitoring", {})
+    if log_config.get("enabled", False):
+        if log_config.get("mode", "inotify") == "inotify" and await start_log_tailer(application):
+            checkpoint_interval = log_config.get("checkpoint_interval_seconds", 60)
+            job_queue.run_repeating(checkpoint_log_tailer, interval=checkpoint_interval, first=checkpoint_interval)
+            logger.info("Monitorización de logs por eventos (inotify) activada.")
+        elif (interval := log_config.get("check_interval_seconds", 0)) > 0:
+            job_queue.run_repeating(periodic_log_check, interval=interval, first=15)
+            logger.info(f"Tarea de monitorización de logs configurada cada {interval} segundos.")
+
+    # Índice temporal de los logs permitidos para `/logs range` y `/logs search --from/--to`
+    index_config = CONFIG.get("log_index", {})
+    if index_config.get("enabled", True):
+        index_interval = index_config.get("interval_seconds", 300)
+        job_queue.run_repeating(periodic_log_index_update, interval=index_interval, first=30)
+        logger.info(f"Indexado de logs configurado cada {index_interval} segundos.")
+
+    # Planificador de chequeos de servidores: el reporte de estado lee su tabla de
+    # resultados. Sus chequeos SSL ya mantienen la caché de certificados al día.
+    if CONFIG.get("check_scheduler", {}).get("enabled", True):
+        get_check_scheduler().start([check for _index, check in build_server_checks()])
+    else:
+        # Caché de certificados SSL: solo se consultan los que han caducado en ella
+        ssl_interval = CONFIG.get("ssl_cache", {}).get("refresh_interval_seconds", 3600)
+        job_queue.run_repeating(periodic_ssl_cache_refresh, interval=ssl_interval, first=20)
+
+
+async def post_stop(application: Application) -> None:
+    """Detiene los subsistemas y guarda su estado antes de salir."""
+    await get_metrics_sampler().stop()
+    await get_check_scheduler().stop()
+    await asyncio.to_thread(get_metrics_history().save)
+    await stop_log_tailer(application)
+    shutdown_search_pool()
+    await get_dispatcher().stop()
 
 
 def main(token: str) -> None:
     """Inicia el bot, registra los manejadores y comienza a escuchar."""
-    persistence = JsonPersistence(filepath=PERSISTENCE_FILE)
-    application = Application.builder().token(token).persistence(persistence).build()
+    # Los comandos se ejecutan con asyncio.create_subprocess_exec: sin un hilo por proceso hijo.
+    install_child_watcher()
+    persistence = build_persistence()
+    builder = (
+        Application.builder()
+        .token(token)
+        .persistence(persistence)
+        .post_init(post_init)
+        .post_stop(post_stop)
+    )
+    # Updates de chats distintos en paralelo; dentro de un mismo chat, en orden.
+    concurrent_updates = int(CONFIG.get("concurrent_updates", DEFAULT_CONCURRENT_UPDATES))
+    if concurrent_updates > 1:
+        max_pending = int(CONFIG.get("max_pending_updates", DEFAULT_MAX_PENDING_UPDATES))
+        builder = builder.concurrent_updates(PerChatUpdateProcessor(concurrent_updates, max_pending))
+        logger.info(f"Procesado concurrente de updates activado ({concurrent_updates} a la vez, orden por chat).")
+    application = builder.build()
     application.add_error_handler(error_handler)
 
     # --- REGISTRO DE MANEJADORES ---
@@ -81,13 +210,21 @@ def main(token: str) -> None:
     application.add_handler(CommandHandler("reminders", reminders_list_command))
     application.add_handler(CommandHandler("delremind", reminders_delete_command))
 
+    # Tareas pesadas
+    application.add_handler(CommandHandler("jobs", jobs_command))
+    application.add_handler(CommandHandler("job", job_command))
+    # Solo con argumentos: el /cancel a secas es el de la conversación del tiempo.
+    application.add_handler(CommandHandler("cancel", cancel_command, has_args=True))
+
     # Comandos de IA
     application.add_handler(CommandHandler("ask", ask_command))
     application.add_handler(CommandHandler("askpro", askpro_command))
     application.add_handler(CommandHandler("analyze", analyze_command))
 
     # Comandos de monitorización
+    application.add_handler(CommandHandler("status", status_command))
     application.add_handler(CommandHandler("resources", resources_command))
+    application.add_handler(CommandHandler("history", history_command))
     application.add_handler(CommandHandler("disk", disk_command))
     application.add_handler(CommandHandler("processes", processes_command))
     application.add_handler(CommandHandler("systeminfo", systeminfo_command))
@@ -97,6 +234,7 @@ def main(token: str) -> None:
     application.add_handler(CommandHandler("ping", ping_command))
     application.add_handler(CommandHandler("traceroute", traceroute_command))
     application.add_handler(CommandHandler("nmap", nmap_command))
+    application.add_handler(CommandHandler("portcheck", portcheck_command))
     application.add_handler(CommandHandler("dig", dig_command))
     application.add_handler(CommandHandler("whois", whois_command))
 
@@ -141,12 +279,6 @@ def main(token: str) -> None:
         job_queue.run_repeating(periodic_monitoring_check, interval=interval, first=10)
         logger.info(f"Tarea de monitorización de umbrales configurada cada {interval/60} minutos.")
 
-    # Tarea de monitorización de logs
-    log_config = CONFIG.get("log_monitoring", {})
-    if log_config.get("enabled", False) and (interval := log_config.get("check_interval_seconds", 0)) > 0:
-        job_queue.run_repeating(periodic_log_check, interval=interval, first=15)
-        logger.info(f"Tarea de monitorización de logs configurada cada {interval} segundos.")
-
     logger.info("El bot se está iniciando...")
     application.run_polling()
 
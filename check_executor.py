@@ -0,0 +1,69 @@
+# check_executor.py
+# MODULO NUEVO: Ejecutor asíncrono de chequeos (HTTP, disco, servicios) en paralelo.
+# Ping, puertos y SSL tienen sus propios motores (icmp_ping, port_probe, ssl_cache).
+# Lanza todos los chequeos a la vez con un límite de concurrencia y un timeout por chequeo.
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from state import CONFIG
+
+DEFAULT_MAX_CONCURRENCY = 20
+DEFAULT_CHECK_TIMEOUT = 10
+
+# Pool propio para los chequeos bloqueantes: así un reporte grande no agota
+# el pool por defecto que usan los manejadores con asyncio.to_thread.
+_executor = None
+_executor_size = 0
+
+
+def _get_executor(size: int) -> ThreadPoolExecutor:
+    global _executor, _executor_size
+    if _executor is None or _executor_size != size:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="check")
+        _executor_size = size
+    return _executor
+
+
+def get_limits() -> tuple[int, float]:
+    """Devuelve (concurrencia máxima, timeout por chequeo) desde la configuración."""
+    report_config = CONFIG.get("status_report", {})
+    max_concurrency = max(1, int(report_config.get("max_concurrent_checks", DEFAULT_MAX_CONCURRENCY)))
+    timeout = float(report_config.get("check_timeout_seconds", DEFAULT_CHECK_TIMEOUT))
+    return max_concurrency, timeout
+
+
+async def _run_one(semaphore, executor, check, timeout):
+    func, args, fallback_text = check
+    async with semaphore:
+        try:
+            if asyncio.iscoroutinefunction(func):
+                return await asyncio.wait_for(func(*args), timeout)
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(loop.run_in_executor(executor, func, *args), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Timeout ({timeout}s) en el chequeo {func.__name__}{args[:-1]}")
+            return fallback_text
+        except Exception as e:
+            logging.error(f"Error inesperado en el chequeo {func.__name__}{args[:-1]}: {e}")
+            return fallback_text
+
+
+async def run_checks(checks: list, max_concurrency: int = None, timeout: float = None) -> list:
+    """
+    Ejecuta todos los chequeos a la vez y devuelve sus resultados en el mismo orden.
+    Cada chequeo es una tupla (func, args, texto_si_falla). `func` puede ser una
+    función bloqueante (se ejecuta en el pool de chequeos) o una corrutina.
+    """
+    if not checks:
+        return []
+    default_concurrency, default_timeout = get_limits()
+    max_concurrency = max_concurrency or default_concurrency
+    timeout = timeout or default_timeout
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    executor = _get_executor(max_concurrency)
+    return await asyncio.gather(*(_run_one(semaphore, executor, check, timeout) for check in checks))
@@ -0,0 +1,246 @@
+# check_scheduler.py
+# MODULO NUEVO: Planificador de chequeos de servidores (ping, puertos, SSL, HTTP,
+# disco, servicios) con un intervalo y un timeout propios para cada chequeo.
+# Los arranques se reparten con jitter para que los chequeos no se disparen todos
+# a la vez, una ejecución que aún no ha terminado no se solapa con la siguiente
+# (se salta), y el último resultado de cada chequeo queda en una tabla compartida
+# que el reporte de estado lee al instante.
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+
+DEFAULT_JITTER_FRACTION = 0.1
+DEFAULT_MAX_CONCURRENCY = 20
+# Chequeos por lote: los lotes grandes se parten y cada trozo lleva su propio jitter.
+DEFAULT_BATCH_SIZE = 10
+# Por tipo de chequeo; se pueden cambiar en `check_scheduler` y por servidor en `intervalos`.
+# El chequeo SSL solo lee la caché de certificados (y la renueva si ha caducado en
+# ella), así que puede mirar a menudo sin repetir handshakes.
+DEFAULT_INTERVALS = {"ping": 60, "port": 60, "ssl": 15 * 60, "http": 120, "disk": 300, "service": 60}
+DEFAULT_TIMEOUTS = {"ping": 5, "port": 5, "ssl": 15, "http": 10, "disk": 10, "service": 10}
+
+
+class ScheduledCheck:
+    """
+    Un chequeo planificado. `run()` es una corrutina que devuelve el resultado en
+    bruto; `render(resultado, _)` lo convierte en la línea del reporte, así el texto
+    sale en el idioma de quien lo pide y no en el del momento del chequeo.
+    Si se da `batch(chequeos) -> {check_id: resultado}`, los chequeos del mismo tipo
+    con el mismo intervalo y timeout se ejecutan en lotes de hasta `batch_size` en una
+    sola llamada cada uno (p. ej. varios pings desde un único socket ICMP) en lugar
+    de uno a uno.
+    """
+
+    def __init__(self, check_id: str, kind: str, label: str, run, render, interval: float, timeout: float,
+                 target=None, batch=None):
+        self.id = check_id
+        self.kind = kind
+        self.label = label
+        # Host o (host, puerto): lo usa el reporte bajo demanda para agrupar pings y puertos.
+        self.target = target
+        self.run = run
+        self.render = render
+        self.interval = interval
+        self.timeout = timeout
+        self.batch = batch
+
+    def __repr__(self) -> str:
+        return f"ScheduledCheck({self.id!r})"
+
+    @property
+    def batch_key(self):
+        """Grupo de los chequeos que se pueden ejecutar juntos, o None si no tiene `batch`."""
+        if self.batch is None:
+            return None
+        return f"batch:{self.kind}:{self.interval}:{self.timeout}"
+
+
+class CheckScheduler:
+    def __init__(self, jitter: float = DEFAULT_JITTER_FRACTION, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.batch_size = max(1, batch_size)
+        self.checks: dict[str, ScheduledCheck] = {}
+        # check_id -> {'result', 'error', 'checked', 'duration'}. Se reemplaza la
+        # entrada entera, así los lectores nunca ven un resultado a medias.
+        self.latest: dict[str, dict] = {}
+        self.skipped = 0
+        # Lo que se planifica son unidades: un chequeo suelto o un lote de chequeos.
+        self._units: dict[str, list[ScheduledCheck]] = {}
+        self._unit_of: dict[str, str] = {}  # check_id -> unit_id
+        self._queue = []  # (instante, unit_id)
+        # Próximo instante vigente de cada unidad. Las entradas del heap que no
+        # coinciden con él (unidad quitada y vuelta a añadir) se descartan al salir.
+        self._due: dict[str, float] = {}
+        self._running: dict[str, asyncio.Task] = {}
+        self._semaphore = None
+        self._wakeup = None
+        self._task = None
+
+    def _next_run(self, interval: float, after: float) -> float:
+        spread = interval * self.jitter
+        return after + interval + random.uniform(-spread, spread)
+
+    def configure(self, checks: list[ScheduledCheck]) -> None:
+        """
+        Fija la lista de chequeos. Los nuevos arrancan en un instante al azar dentro
+        de su primer intervalo, los que siguen conservan su turno y los que
+        desaparecen dejan de ejecutarse.
+        """
+        now = time.monotonic()
+        self.checks = {check.id: check for check in checks}
+        groups = {}
+        for check in self.checks.values():
+            groups.setdefault(check.batch_key or check.id, []).append(check)
+        self._units, self._unit_of = {}, {}
+        for key, group in groups.items():
+            if group[0].batch is None:
+                self._units[key] = group
+            else:
+                # Lotes de como mucho `batch_size`, cada uno con su propio turno y jitter.
+                group.sort(key=lambda check: check.id)
+                for n in range(0, len(group), self.batch_size):
+                    self._units[f"{key}:{n // self.batch_size}"] = group[n:n + self.batch_size]
+        for unit_id, unit in self._units.items():
+            for check in unit:
+                self._unit_of[check.id] = unit_id
+        for table, valid in ((self.latest, self.checks), (self._due, self._units)):
+            for key in [k for k in table if k not in valid]:
+                del table[key]
+        for unit_id, unit in self._units.items():
+            if unit_id not in self._due:
+                self._schedule(unit_id, now + random.uniform(0, unit[0].interval))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _schedule(self, unit_id: str, due: float) -> None:
+        self._due[unit_id] = due
+        heapq.heappush(self._queue, (due, unit_id))
+
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self, checks: list[ScheduledCheck]) -> None:
+        if self._task is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._wakeup = asyncio.Event()
+            self.configure(checks)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logging.info(f"Planificador de chequeos activo con {len(self.checks)} chequeos.")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            for task in list(self._running.values()):
+                task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            due, unit_id = self._queue[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._queue)
+            unit = self._units.get(unit_id)
+            if unit is None or self._due.get(unit_id) != due:
+                continue
+            if unit_id in self._running:
+                # La ejecución anterior sigue en marcha: no se apila otra encima.
+                self.skipped += 1
+                logging.debug(f"Chequeo '{unit_id}' aún en curso; se salta esta ejecución.")
+            else:
+                self._launch(unit_id)
+            # Si el bucle se ha retrasado, la siguiente se cuenta desde ahora y no
+            # se encadenan ejecuciones atrasadas.
+            interval = unit[0].interval
+            self._schedule(unit_id, self._next_run(interval, max(due, time.monotonic() - interval)))
+
+    def _launch(self, unit_id: str) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._execute(unit_id, list(self._units[unit_id])))
+        self._running[unit_id] = task
+        task.add_done_callback(lambda t: self._running.pop(unit_id, None) if self._running.get(unit_id) is t else None)
+        return task
+
+    async def _execute(self, unit_id: str, unit: list[ScheduledCheck]) -> None:
+        first = unit[0]
+        async with self._semaphore:
+            start = time.monotonic()
+            results, error = {}, None
+            try:
+                if first.batch is not None:
+                    results = await asyncio.wait_for(first.batch(unit), first.timeout)
+                else:
+                    results = {first.id: await asyncio.wait_for(first.run(), first.timeout)}
+            except asyncio.TimeoutError:
+                error = "Timeout"
+                logging.warning(f"Timeout ({first.timeout}s) en el chequeo planificado '{unit_id}'.")
+            except Exception as e:
+                error = str(e)[:200] or type(e).__name__
+                logging.error(f"Error en el chequeo planificado '{unit_id}': {e}")
+            checked, duration = time.time(), time.monotonic() - start
+            for check in unit:
+                if check.id not in self.checks:
+                    continue
+                missing = error is None and check.id not in results
+                self.latest[check.id] = {
+                    "result": results.get(check.id),
+                    "error": "Sin resultado" if missing else error,
+                    "checked": checked,
+                    "duration": duration,
+                }
+
+    async def ensure(self, check_ids: list[str]) -> None:
+        """
+        Espera a que los chequeos indicados tengan al menos un resultado: los que
+        nunca se han ejecutado se lanzan ya (o se espera a la ejecución en curso).
+        """
+        unit_ids = {self._unit_of[check_id] for check_id in check_ids
+                    if check_id not in self.latest and check_id in self._unit_of}
+        tasks = [self._running.get(unit_id) or self._launch(unit_id) for unit_id in unit_ids if unit_id in self._units]
+        if tasks:
+            # shield: si el reporte se cancela, el chequeo termina igualmente.
+            await asyncio.gather(*(asyncio.shield(task) for task in tasks), return_exceptions=True)
+
+
+def get_check_settings(kind: str, overrides: dict = None) -> tuple[float, float]:
+    """(intervalo, timeout) para un tipo de chequeo; `overrides` son los `intervalos` del servidor."""
+    from state import CONFIG
+    scheduler_config = CONFIG.get("check_scheduler", {})
+    interval = (overrides or {}).get(kind, scheduler_config.get("intervals_seconds", {}).get(kind, DEFAULT_INTERVALS[kind]))
+    timeout = scheduler_config.get("timeouts_seconds", {}).get(kind, DEFAULT_TIMEOUTS[kind])
+    return max(1.0, float(interval)), float(timeout)
+
+
+_scheduler = None
+
+
+def get_check_scheduler() -> CheckScheduler:
+    global _scheduler
+    if _scheduler is None:
+        from state import CONFIG
+        scheduler_config = CONFIG.get("check_scheduler", {})
+        _scheduler = CheckScheduler(
+            float(scheduler_config.get("jitter_fraction", DEFAULT_JITTER_FRACTION)),
+            max(1, int(scheduler_config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY))),
+            int(scheduler_config.get("batch_size", DEFAULT_BATCH_SIZE)),
+        )
+    return _scheduler
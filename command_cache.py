@@ -0,0 +1,105 @@
+# command_cache.py
+# MODULO NUEVO: Caché con caducidad para comandos de solo lectura (df, uname,
+# crontab, docker ps, fail2ban status, systemctl status).
+# Se guarda la salida en bruto del comando, no el texto ya traducido, así que
+# sirve para todos los idiomas. Las peticiones idénticas que llegan mientras el
+# comando aún se está ejecutando esperan a esa misma ejecución (single-flight),
+# y las acciones que cambian el estado (reiniciar un servicio, desbanear una IP...)
+# invalidan las entradas afectadas.
+
+import asyncio
+import logging
+import time
+
+# Segundos que vale cada resultado. None = no caduca (datos que no cambian
+# mientras el bot está en marcha); 0 = sin caché.
+DEFAULT_TTLS = {
+    "disk": 15,
+    "system_info": None,
+    "cron": 60,
+    "docker_ps": 10,
+    "fail2ban_status": 15,
+    "service_status": 10,
+}
+MAX_ENTRIES = 256
+
+
+class CommandCache:
+    def __init__(self, ttls: dict = None):
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self._entries: dict[tuple, tuple[float, object]] = {}
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        # Se incrementa al invalidar: un resultado que llega después de una
+        # invalidación ya no es fiable y no se guarda.
+        self._generations: dict[str, int] = {}
+
+    def ttl(self, name: str):
+        ttl = self.ttls.get(name, 0)
+        return None if ttl is None or ttl < 0 else ttl
+
+    async def get_or_run(self, name: str, key, factory, cacheable=None):
+        """
+        Devuelve el resultado guardado de (name, key) si sigue vigente. Si no, lo
+        obtiene con `factory()`, compartiendo la ejecución con las peticiones
+        idénticas que lleguen mientras tanto. Si se da `cacheable(resultado)` y
+        devuelve False, el resultado se entrega pero no se guarda.
+        """
+        ttl = self.ttl(name)
+        if ttl == 0:
+            return await factory()
+
+        cache_key = (name, key)
+        entry = self._entries.get(cache_key)
+        if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+            return entry[1]
+
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(factory())
+            self._inflight[cache_key] = task
+            generation = self._generations.get(name, 0)
+            task.add_done_callback(lambda t: self._store(cache_key, t, ttl, generation, cacheable))
+        else:
+            logging.debug(f"Caché de comandos: se reutiliza la ejecución en curso de {cache_key}.")
+        # shield: si quien lanzó el comando se cancela, los demás siguen esperándolo.
+        return await asyncio.shield(task)
+
+    def _store(self, cache_key: tuple, task: asyncio.Task, ttl, generation: int, cacheable=None) -> None:
+        if self._inflight.get(cache_key) is task:
+            del self._inflight[cache_key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if cacheable is not None and not cacheable(task.result()):
+            return
+        if self._generations.get(cache_key[0], 0) != generation:
+            return
+        if len(self._entries) >= MAX_ENTRIES:
+            self._purge_expired()
+        if len(self._entries) < MAX_ENTRIES:
+            self._entries[cache_key] = (None if ttl is None else time.monotonic() + ttl, task.result())
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        for cache_key in [k for k, (expires, _value) in self._entries.items() if expires is not None and expires <= now]:
+            del self._entries[cache_key]
+
+    def invalidate(self, name: str, key=None) -> None:
+        """Olvida los resultados de `name` (solo el de `key` si se indica)."""
+        self._generations[name] = self._generations.get(name, 0) + 1
+        for cache_key in [k for k in self._entries if k[0] == name and (key is None or k[1] == key)]:
+            del self._entries[cache_key]
+        for cache_key in [k for k in self._inflight if k[0] == name and (key is None or k[1] == key)]:
+            # La ejecución en curso termina para quien ya la espera, pero no se reutiliza.
+            del self._inflight[cache_key]
+
+
+_cache = None
+
+
+def get_cache() -> CommandCache:
+    global _cache
+    if _cache is None:
+        from state import CONFIG
+        _cache = CommandCache(CONFIG.get("command_cache", {}).get("ttl_seconds", {}))
+    return _cache
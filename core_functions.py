@@ -2,74 +2,197 @@
 # MODIFICADO: Contiene la lógica composición de reportes y llamadas a APIs.
 
 import json
-import socket
 import platform
 import datetime
 import logging
 import os
-import ssl
 import psutil
 import re
 import google.generativeai as genai
-import time
-import subprocess
+import asyncio
+import urllib.error
+import urllib.request
 
 # Los módulos de estado y utilidades de sistema se importan ahora
-from state import CONFIG, USERS_DATA, guardar_usuarios, LOG_STATE_FILE, SECRETS
-from system_utils import get_log_lines, search_log_in_file, fail2ban_status_cmd, fail2ban_unban_cmd, _run_command
-
-# --- Chequeos individuales (ping, puerto, SSL) ---
-
-def check_ping(host: str, _):
-    param = '-n 1' if platform.system().lower() == 'windows' else '-c 1'
-    try:
-        result = subprocess.run(['ping', param, host], capture_output=True, text=True, timeout=5)
-        return "✅ Ping: **Accesible**" if result.returncode == 0 else "❌ Ping: **INACCESIBLE**"
-    except subprocess.TimeoutExpired:
-        return "❌ Ping: **Timeout**"
-
-def check_port(host: str, port_name: str, port_num: int, _):
-    try:
-        with socket.create_connection((host, port_num), timeout=3):
-            return f"✅ Puerto {port_name} ({port_num}): **Abierto**"
-    except (socket.timeout, ConnectionRefusedError, OSError):
+from state import CONFIG, USERS_DATA, guardar_usuarios, LOG_STATE_FILE, LOG_INDEX_FILE, SECRETS
+from system_utils import get_log_lines, search_log_in_file, fail2ban_status_cmd, fail2ban_unban_cmd, _run_command_async, _get_output_budget, run_cached
+from check_executor import run_checks
+from command_cache import get_cache as get_command_cache
+from ssl_cache import get_ssl_cache, configured_endpoints as ssl_endpoints
+from icmp_ping import ping_many, get_ping_settings
+from check_scheduler import ScheduledCheck, get_check_scheduler, get_check_settings
+from port_probe import probe_many, get_probe_settings, OPEN as PORT_OPEN, CLOSED as PORT_CLOSED, TIMEOUT as PORT_TIMEOUT
+from log_matcher import get_matcher, scan_file
+from log_index import LogIndexStore, NoTimestamps, DEFAULT_STRIDE_BYTES, DEFAULT_MAX_WINDOW_BYTES
+from log_search import search_generations
+from metrics import get_snapshot as get_metrics_snapshot
+from metrics_history import METRICS as HISTORY_METRICS, get_history, parse_window, sparkline
+from detached_runner import get_runner, RUNNING as JOB_RUNNING, FINISHED as JOB_FINISHED, CANCELLED as JOB_CANCELLED
+
+# --- Chequeos individuales (ping, puerto, SSL, HTTP, disco, servicio) ---
+
+def format_ping_result(result: dict, _):
+    # `result` es el resumen de icmp_ping.ping_many para el host.
+    if not result["received"]:
+        return "❌ Ping: **INACCESIBLE**"
+    if result["avg"] is None:
+        return "✅ Ping: **Accesible**"
+    if result["loss"]:
+        return f"⚠️ Ping: **Accesible** ({result['avg']:.0f} ms, {result['loss']:.0f}% pérdida)"
+    return f"✅ Ping: **Accesible** ({result['avg']:.0f} ms)"
+
+def format_port_result(port_name: str, port_num: int, result: tuple, _):
+    # `result` es el (estado, rtt_ms, detalle) de port_probe.probe_many.
+    state, rtt_ms, detail = result
+    if state == PORT_OPEN:
+        return f"✅ Puerto {port_name} ({port_num}): **Abierto** ({rtt_ms:.0f} ms)"
+    if state == PORT_CLOSED:
         return f"❌ Puerto {port_name} ({port_num}): **Cerrado**"
+    if state == PORT_TIMEOUT:
+        return f"❌ Puerto {port_name} ({port_num}): **Timeout**"
+    return f"❌ Puerto {port_name} ({port_num}): **Error** ({detail})"
 
 def check_ssl_expiry(host: str, port: int, days_warning: int, _):
-    context = ssl.create_default_context()
-    try:
-        with socket.create_connection((host, port), timeout=5) as sock:
-            with context.wrap_socket(sock, server_hostname=host) as ssock:
-                cert = ssock.getpeercert()
-                expiry_date = datetime.datetime.strptime(cert['notAfter'], '%b %d %H:%M:%S %Y %Z')
-                days_left = (expiry_date - datetime.datetime.now()).days
-                if days_left > days_warning:
-                    return f"✅ Cert. SSL: Expira en **{days_left} días**"
-                return f"🔥 Cert. SSL: Expira en **{days_left} días** (Aviso a los {days_warning})"
-    except Exception as e:
-        logging.warning(f"Error SSL para {host}: {e}")
+    # Sin handshake: la caducidad se lee de la caché de certificados (ssl_cache.py).
+    entry = get_ssl_cache().get(host, port)
+    if not entry or entry.get("not_after") is None:
         return "❌ Cert. SSL: **No se pudo verificar**"
+    days_left = int((entry["not_after"] - datetime.datetime.now().timestamp()) // 86400)
+    stale_note = " _(última consulta fallida)_" if entry.get("error") else ""
+    if days_left > days_warning:
+        return f"✅ Cert. SSL: Expira en **{days_left} días**{stale_note}"
+    return f"🔥 Cert. SSL: Expira en **{days_left} días** (Aviso a los {days_warning}){stale_note}"
+
+def fetch_http_status(url: str, timeout: float) -> tuple[int, float]:
+    """(código HTTP, ms hasta la respuesta). Los 4xx/5xx también cuentan como respuesta."""
+    start = datetime.datetime.now()
+    request = urllib.request.Request(url, method="GET", headers={"User-Agent": "monitor-bot"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, (datetime.datetime.now() - start).total_seconds() * 1000
+
+def format_http_result(name: str, result: tuple, _):
+    status, elapsed_ms = result
+    if status < 400:
+        return f"✅ HTTP {name}: **{status}** ({elapsed_ms:.0f} ms)"
+    return f"❌ HTTP {name}: **{status}** ({elapsed_ms:.0f} ms)"
+
+def format_disk_result(path: str, threshold: float, percent: float, _):
+    if percent < threshold:
+        return f"✅ Disco '{path}': **{percent}%** usado"
+    return f"🔥 Disco '{path}': **{percent}%** usado (Umbral: {threshold}%)"
+
+async def get_service_state(unit: str) -> str:
+    # `systemctl is-active` devuelve código distinto de 0 si no está activo, pero
+    # imprime el estado igualmente.
+    _success, output = await _run_command_async(['systemctl', 'is-active', unit], 10)
+    return output.splitlines()[-1].strip() if output else "unknown"
+
+def format_service_result(unit: str, state: str, _):
+    if state == "active":
+        return f"✅ Servicio {unit}: **activo**"
+    return f"❌ Servicio {unit}: **{state}**"
+
+def _is_local_host(host: str) -> bool:
+    return host in ("127.0.0.1", "localhost", "::1", platform.node())
+
+def build_server_checks() -> list[tuple[int, ScheduledCheck]]:
+    """
+    (posición del servidor en `servidores`, chequeo) para todo lo configurado en
+    `servidores[].chequeos`, en el orden del reporte. Disco y servicios solo se
+    comprueban en la máquina local.
+    """
+    server_checks = []
+    for indice_servidor, servidor in enumerate(CONFIG.get("servidores", [])):
+        host = servidor.get("host")
+        if not host: continue
+        chequeos = servidor.get("chequeos", {})
+        intervalos = servidor.get("intervalos", {})
+
+        def add(kind, detail, label, run, render, target=None, batch=None):
+            interval, timeout = get_check_settings(kind, intervalos)
+            # Los nombres pueden repetirse (o faltar): el id usa la posición y el host.
+            check_id = f"{indice_servidor}:{host}:{kind}:{detail}"
+            check = ScheduledCheck(check_id, kind, label, run, render, interval, timeout, target, batch)
+            server_checks.append((indice_servidor, check))
+
+        if chequeos.get("ping"):
+            ping_timeout, ping_count = get_ping_settings()
+            add("ping", host, "Ping",
+                lambda host=host: _ping_one(host, ping_count, ping_timeout),
+                lambda result, _: format_ping_result(result, _), host,
+                lambda checks: _ping_batch(checks, ping_count, ping_timeout))
+        for nombre_puerto, num_puerto in (chequeos.get("puertos") or {}).items():
+            probe_timeout, _concurrency, _max_ports = get_probe_settings()
+            add("port", num_puerto, f"Puerto {nombre_puerto} ({num_puerto})",
+                lambda pair=(host, num_puerto): _probe_one(pair, probe_timeout),
+                lambda result, _, n=nombre_puerto, p=num_puerto: format_port_result(n, p, result, _), (host, num_puerto))
+        if "certificado_ssl" in chequeos:
+            params = chequeos["certificado_ssl"] or {}
+            port, days = params.get("puerto", 443), params.get("dias_aviso", 30)
+            # El chequeo lee la caché y solo consulta el certificado si su entrada ha
+            # caducado en ella (`ssl_cache.max_age_hours`); el texto sale siempre de la caché.
+            add("ssl", port, "Cert. SSL",
+                lambda endpoint=(host, port): get_ssl_cache().refresh([endpoint]),
+                lambda _result, _, h=host, p=port, d=days: check_ssl_expiry(h, p, d, _), (host, port))
+        for nombre_http, url in (chequeos.get("http") or {}).items():
+            _interval, http_timeout = get_check_settings("http", intervalos)
+            add("http", nombre_http, f"HTTP {nombre_http}",
+                lambda url=url, t=http_timeout: asyncio.to_thread(fetch_http_status, url, t),
+                lambda result, _, n=nombre_http: format_http_result(n, result, _))
+        if _is_local_host(host):
+            for path, disk_params in (chequeos.get("uso_disco") or {}).items():
+                add("disk", path, f"Disco '{path}'",
+                    lambda path=path: asyncio.to_thread(lambda: psutil.disk_usage(path).percent),
+                    lambda result, _, p=path, t=disk_params.get("umbral", 90): format_disk_result(p, t, result, _))
+            for unit in chequeos.get("servicios") or []:
+                add("service", unit, f"Servicio {unit}",
+                    lambda unit=unit: get_service_state(unit),
+                    lambda result, _, u=unit: format_service_result(u, result, _))
+    return server_checks
+
+async def _ping_one(host: str, count: int, timeout: float) -> dict:
+    return (await ping_many([host], count, timeout))[host]
+
+async def _ping_batch(checks: list, count: int, timeout: float) -> dict:
+    # Todos los pings que tocan a la vez salen del mismo socket ICMP.
+    results = await ping_many([check.target for check in checks], count, timeout)
+    return {check.id: results[check.target] for check in checks}
+
+async def _probe_one(pair: tuple, timeout: float) -> tuple:
+    return (await probe_many([pair], timeout))[pair]
+
+async def _run_and_render(check: ScheduledCheck, _):
+    return check.render(await check.run(), _)
 
 # --- Composición de Reportes y Textos ---
 
 def get_resources_text(_):
     try:
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # Lectura instantánea de la última muestra del muestreador en segundo plano.
+        snapshot = get_metrics_snapshot()
+        cpu_percent = snapshot['cpu_percent']
         load_avg_text = ""
-        if hasattr(psutil, 'getloadavg'):
-            cpu_load = psutil.getloadavg()
+        if (cpu_load := snapshot['load_avg']) is not None:
             load_avg_text = _("Carga media (1, 5, 15 min): `{load1:.2f}`, `{load5:.2f}`, `{load15:.2f}`\n").format(load1=cpu_load[0], load5=cpu_load[1], load15=cpu_load[2])
+        per_core_text = _("Por núcleo: `{cores}`\n").format(cores=" ".join(f"{c:.0f}%" for c in snapshot['cpu_per_core']))
         
-        ram = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        ram = snapshot['ram']
+        swap = snapshot['swap']
+        disk = snapshot['disk']
         
         return (
             _("💻 **Reporte de Recursos del Sistema**\n\n") +
             _("--- **CPU** ---\n") +
             _("Uso actual: `{cpu_percent}%`\n").format(cpu_percent=cpu_percent) +
+            per_core_text +
             load_avg_text +
             _("--- **Memoria (RAM)** ---\n") +
-            _("Uso: `{ram_used:.2f} GB` de `{ram_total:.2f} GB` (*{ram_percent}%*)\n\n").format(ram_used=ram.used / (1024**3), ram_total=ram.total / (1024**3), ram_percent=ram.percent) +
+            _("Uso: `{ram_used:.2f} GB` de `{ram_total:.2f} GB` (*{ram_percent}%*)\n").format(ram_used=ram.used / (1024**3), ram_total=ram.total / (1024**3), ram_percent=ram.percent) +
+            _("Swap: `{swap_used:.2f} GB` de `{swap_total:.2f} GB` (*{swap_percent}%*)\n\n").format(swap_used=swap.used / (1024**3), swap_total=swap.total / (1024**3), swap_percent=swap.percent) +
             _("--- **Disco Principal (/)** ---\n") +
             _("Uso: `{disk_used:.2f} GB` de `{disk_total:.2f} GB` (*{disk_percent}%*)").format(disk_used=disk.used / (1024**3), disk_total=disk.total / (1024**3), disk_percent=disk.percent)
         )
@@ -77,28 +200,97 @@ def get_resources_text(_):
         logging.error(f"Error inesperado en get_resources_text con psutil: {e}")
         return _("❌ **Error inesperado al obtener recursos:** {error}").format(error=e)
 
-def get_status_report_text(_):
-    reporte_data = {}
-    for servidor in CONFIG.get("servidores", []):
-        nombre_servidor = servidor.get("nombre", "Servidor sin nombre")
-        host = servidor.get("host")
-        if not host: continue
-        
-        reporte_data[nombre_servidor] = []
-        chequeos = servidor.get("chequeos", {})
-        if chequeos.get("ping"):
-            reporte_data[nombre_servidor].append(check_ping(host, _))
-        if "puertos" in chequeos:
-            for nombre_puerto, num_puerto in chequeos["puertos"].items():
-                reporte_data[nombre_servidor].append(check_port(host, nombre_puerto, num_puerto, _))
-        if "certificado_ssl" in chequeos:
-            params = chequeos["certificado_ssl"]
-            reporte_data[nombre_servidor].append(check_ssl_expiry(host, params.get("puerto", 443), params.get("dias_aviso", 30), _))
+def get_history_text(metric: str, window_text: str, _):
+    if metric not in HISTORY_METRICS:
+        return _("❌ Métrica no válida. Usa: {metrics}").format(metrics=", ".join(f"`{m}`" for m in HISTORY_METRICS))
+    window = parse_window(window_text)
+    if window is None:
+        return _("❌ Ventana no válida. Ejemplos: `30m`, `6h`, `7d`.")
+
+    resolution, points = get_history().series(metric, window)
+    samples = [p for p in points if p is not None]
+    if not samples:
+        return _("📈 Aún no hay datos de `{metric}` para las últimas {window}.").format(metric=metric, window=window_text)
+
+    unit = HISTORY_METRICS[metric][1]
+    # Los porcentajes se dibujan en escala fija 0-100 para que se puedan comparar.
+    low, high = (0.0, 100.0) if unit == '%' else (None, None)
+    line = sparkline(points, low=low, high=high)
+    low_value = min(p[0] for p in samples)
+    avg_value = sum(p[1] for p in samples) / len(samples)
+    high_value = max(p[2] for p in samples)
+    return (
+        _("📈 **Histórico de `{metric}` (últimas {window}, {resolution}s por punto)**\n").format(metric=metric, window=window_text, resolution=resolution) +
+        f"```\n{line}\n" +
+        _("mín {low:.1f}{unit} · media {avg:.1f}{unit} · máx {high:.1f}{unit}").format(low=low_value, avg=avg_value, high=high_value, unit=unit) +
+        "\n```"
+    )
+
+async def _render_scheduled(server_checks: list, _) -> list[str]:
+    # Lectura de la tabla del planificador; solo se espera a los chequeos que aún
+    # no tienen ningún resultado (recién arrancado el bot).
+    scheduler = get_check_scheduler()
+    await scheduler.ensure([check.id for _indice, check in server_checks])
+    lines = []
+    for _indice, check in server_checks:
+        entry = scheduler.latest.get(check.id)
+        if entry is None:
+            lines.append(f"⏳ {check.label}: **Pendiente**")
+        elif entry["error"]:
+            lines.append(f"❌ {check.label}: **{entry['error']}**")
+        else:
+            lines.append(check.render(entry["result"], _))
+    return lines
+
+async def _render_on_demand(server_checks: list, force: bool, _) -> list[str]:
+    # Los certificados salen de la caché; solo se consultan los que faltan o han
+    # caducado en ella (todos si se fuerza el reporte).
+    await get_ssl_cache().refresh(ssl_endpoints(), force=force)
+
+    # Todo se lanza a la vez: los puertos de todos los servidores van juntos al
+    # motor asíncrono de port_probe, los pings a un único socket ICMP (icmp_ping)
+    # y el resto (HTTP, disco, servicios) al ejecutor de chequeos.
+    checks = [check for _indice, check in server_checks]
+    others = [check for check in checks if check.kind in ("http", "disk", "service")]
+    probe_timeout, probe_concurrency, _max_ports = get_probe_settings()
+    ping_timeout, ping_count = get_ping_settings()
+    resultados, puertos, pings = await asyncio.gather(
+        run_checks([(_run_and_render, (check, _), f"❌ {check.label}: **Timeout**") for check in others]),
+        probe_many([check.target for check in checks if check.kind == "port"], probe_timeout, probe_concurrency),
+        ping_many([check.target for check in checks if check.kind == "ping"], ping_count, ping_timeout),
+    )
+    otros = dict(zip((check.id for check in others), resultados))
+
+    def render(check):
+        if check.kind == "ping":
+            return check.render(pings[check.target], _)
+        if check.kind == "port":
+            return check.render(puertos[check.target], _)
+        if check.kind == "ssl":
+            return check.render(None, _)
+        return otros[check.id]
+
+    return [render(check) for check in checks]
+
+async def get_status_report_text(_, force: bool = False):
+    # Con el planificador de chequeos en marcha el reporte lee sus últimos
+    # resultados al instante; si no (o si se fuerza), se comprueba todo ahora.
+    server_checks = build_server_checks()
+    if get_check_scheduler().is_running() and not force:
+        lineas = await _render_scheduled(server_checks, _)
+    else:
+        lineas = await _render_on_demand(server_checks, force, _)
+
+    # Agrupado por posición: dos servidores con el mismo nombre no se mezclan.
+    reporte_data = {indice: (servidor.get("nombre", "Servidor sin nombre"), [])
+                    for indice, servidor in enumerate(CONFIG.get("servidores", [])) if servidor.get("host")}
+    for (indice_servidor, _check), linea in zip(server_checks, lineas):
+        reporte_data[indice_servidor][1].append(linea)
 
     nombre_maquina_local = platform.node()
     encabezado = _("📋 **Reporte de Estado (desde {hostname})**\n").format(hostname=nombre_maquina_local)
     lineas_reporte = [encabezado]
-    for servidor, checks in reporte_data.items():
+    for servidor, checks in reporte_data.values():
         lineas_reporte.append(f"\n--- **{servidor}** ---")
         lineas_reporte.extend(checks)
     
@@ -106,14 +298,28 @@ def get_status_report_text(_):
     lineas_reporte.append(fecha)
     return "\n".join(lineas_reporte)
 
-def get_system_info_text(_) -> str:
+async def get_portcheck_text(host: str, ports: list, _) -> str:
+    timeout, max_concurrency, _max_ports = get_probe_settings()
+    results = await probe_many([(host, port) for port in ports], timeout, max_concurrency)
+    labels = {PORT_OPEN: _("abierto"), PORT_CLOSED: _("cerrado"), PORT_TIMEOUT: _("timeout")}
+    lines = []
+    for port in ports:
+        state, rtt_ms, detail = results[(host, port)]
+        rtt = f"{rtt_ms:.1f} ms" if rtt_ms is not None else ""
+        lines.append(f"{port:>5}  {labels.get(state, detail or state):<10} {rtt}".rstrip())
+    open_count = sum(1 for state, _rtt, _detail in results.values() if state == PORT_OPEN)
+    return _("🔌 **Puertos de `{host}`** ({open}/{total} abiertos):\n```\n{output}\n```").format(
+        host=host, open=open_count, total=len(ports), output="\n".join(lines))
+
+async def get_system_info_text(_) -> str:
     try:
-        uname_output = subprocess.run(['uname', '-a'], capture_output=True, text=True, timeout=5, check=True).stdout
-        lsb_output = ""
-        try:
-            lsb_output = subprocess.run(['lsb_release', '-a'], capture_output=True, text=True, timeout=5, check=True).stdout
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            pass # No es un error crítico si lsb_release no está
+        success, uname_output = await run_cached("system_info", ['uname', '-a'], 5)
+        if not success:
+            return _("❌ Error inesperado al obtener info del sistema: {error}").format(error=uname_output)
+        # No es un error crítico si lsb_release no está
+        lsb_ok, lsb_output = await run_cached("system_info", ['lsb_release', '-a'], 5)
+        if not lsb_ok:
+            lsb_output = ""
         
         response = _("ℹ️ **Información del Sistema**:\n```\n{output}\n```\n").format(output=uname_output)
         if lsb_output and "No LSB modules are available" not in lsb_output:
@@ -124,21 +330,21 @@ def get_system_info_text(_) -> str:
     except Exception as e:
         return _("❌ Error inesperado al obtener info del sistema: {error}").format(error=e)
 
-def get_cron_tasks(_) -> str:
+async def get_cron_tasks(_) -> str:
     try:
-        proc = subprocess.run('crontab -l', shell=True, capture_output=True, text=True, timeout=10)
-        if proc.stderr and "no crontab for" in proc.stderr:
+        success, output = await run_cached("cron", ['crontab', '-l'], 10)
+        if not success and "no crontab for" in output:
             return _("ℹ️ No hay tareas de cron configuradas para el usuario actual.")
-        elif proc.returncode != 0:
-            return _("❌ **Error al leer crontab:**\n`{error}`").format(error=proc.stderr)
-        return _("🗓️ **Tareas de Cron (`crontab -l`):**\n\n```\n{output}\n```").format(output=proc.stdout or '(Vacío)')
+        elif not success:
+            return _("❌ **Error al leer crontab:**\n`{error}`").format(error=output)
+        return _("🗓️ **Tareas de Cron (`crontab -l`):**\n\n```\n{output}\n```").format(output=output or '(Vacío)')
     except Exception as e:
         return _("❌ **Error inesperado** al consultar cron: {error}").format(error=e)
 
-def get_service_status(service_name: str, _):
+async def get_service_status(service_name: str, _):
     try:
-        proc = subprocess.run(['systemctl', 'status', service_name], capture_output=True, text=True, timeout=10)
-        output = proc.stdout + proc.stderr
+        # systemctl status devuelve != 0 para servicios parados; lo que importa es la salida.
+        _success, output = await run_cached("service_status", ['systemctl', 'status', service_name], 10)
         status_icon, status_text = ("✅", "Activo") if "active (running)" in output else \
                                    ("❌", "Inactivo") if "inactive (dead)" in output else \
                                    ("🔥", "Ha fallado") if "failed" in output else \
@@ -153,23 +359,23 @@ def get_service_status(service_name: str, _):
 
 # --- Lógica de Comandos ---
 
-def get_log_content(log_alias: str, num_lines: int, _) -> str:
+async def get_log_content(log_alias: str, num_lines: int, _) -> str:
     log_path = CONFIG.get("allowed_logs", {}).get(log_alias)
     if not log_path:
         return _("❌ El log '{alias}' no está permitido.").format(alias=log_alias)
     
-    success, output = get_log_lines(log_path, num_lines)
+    success, output = await get_log_lines(log_path, num_lines)
     if success:
         return _("📜 **Últimas {num_lines} líneas de `{alias}`:**\n```\n{output}\n```").format(num_lines=num_lines, alias=log_alias, output=output or _("(El log está vacío)"))
     return _("❌ Error al leer el log {alias}:\n```\n{output}\n```").format(alias=log_alias, output=output)
 
-def search_log(log_alias: str, pattern: str, _) -> str:
+async def search_log(log_alias: str, pattern: str, _) -> str:
     # CORREGIDO: Bug Crítico. La variable log_path no estaba definida.
     log_path = CONFIG.get("allowed_logs", {}).get(log_alias)
     if not log_path:
         return _("❌ El log '{alias}' no está permitido.").format(alias=log_alias)
 
-    success, output = search_log_in_file(log_path, pattern)
+    success, output = await search_log_in_file(log_path, pattern)
     if not success:
         return _("❌ Error al buscar en {alias}: {error}").format(alias=log_alias, error=output)
     
@@ -177,22 +383,156 @@ def search_log(log_alias: str, pattern: str, _) -> str:
         return _("🔍 No se encontraron coincidencias para '{pattern}' en `{alias}`.").format(pattern=pattern, alias=log_alias)
 
     return _("🔍 **Resultados para '{pattern}' en `{alias}`:**\n```\n{output}\n```").format(pattern=pattern, alias=log_alias, output=output)
-    
-def manage_service(service_name: str, action: str, _) -> str:
+
+async def search_log_all(log_alias: str, pattern: str, _) -> str:
+    """Busca en el log y en todas sus generaciones rotadas (.1, .2.gz, ...) en paralelo."""
+    log_path = CONFIG.get("allowed_logs", {}).get(log_alias)
+    if not log_path:
+        return _("❌ El log '{alias}' no está permitido.").format(alias=log_alias)
+
+    max_workers = CONFIG.get("log_search", {}).get("max_workers")
+    try:
+        output, matched, searched = await search_generations(log_path, pattern, _get_output_budget(), max_workers)
+    except Exception as e:
+        logging.error(f"Error en la búsqueda en generaciones de '{log_alias}': {e}")
+        return _("❌ Error al buscar en {alias}: {error}").format(alias=log_alias, error=e)
+
+    if not matched:
+        return _("🔍 No se encontraron coincidencias para '{pattern}' en `{alias}` ({n} ficheros).").format(pattern=pattern, alias=log_alias, n=searched)
+    return _("🔍 **Resultados para '{pattern}' en `{alias}` ({matched} en {n} ficheros):**\n```\n{output}\n```").format(pattern=pattern, alias=log_alias, matched=matched, n=searched, output=output)
+
+# --- Índice temporal de logs ---
+_LOG_INDEX_STORE = None
+
+def get_log_index_store() -> LogIndexStore:
+    global _LOG_INDEX_STORE
+    if _LOG_INDEX_STORE is None:
+        stride = int(CONFIG.get("log_index", {}).get("stride_bytes", DEFAULT_STRIDE_BYTES))
+        _LOG_INDEX_STORE = LogIndexStore(LOG_INDEX_FILE, stride)
+    return _LOG_INDEX_STORE
+
+async def update_log_indexes():
+    """Extiende los índices temporales de todos los logs permitidos."""
+    store = get_log_index_store()
+    await asyncio.to_thread(store.update_all, CONFIG.get("allowed_logs", {}))
+
+async def get_log_range(log_alias: str, start_ts: float, end_ts: float, pattern: str, _) -> str:
+    """Líneas de un log entre dos marcas de tiempo, leyendo solo el trozo que indica el índice."""
+    log_path = CONFIG.get("allowed_logs", {}).get(log_alias)
+    if not log_path:
+        return _("❌ El log '{alias}' no está permitido.").format(alias=log_alias)
+
+    index = get_log_index_store().get(log_alias, log_path)
+    regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+    max_window = int(CONFIG.get("log_index", {}).get("max_window_bytes", DEFAULT_MAX_WINDOW_BYTES))
+    try:
+        output, matched, bytes_read, size, partial = await asyncio.to_thread(
+            index.read_window, start_ts, end_ts, regex, _get_output_budget(), max_window)
+    except NoTimestamps:
+        return _("❌ No se ha reconocido ninguna marca de tiempo en `{alias}`; usa `/logs search` sin `--from`/`--to`.").format(alias=log_alias)
+    except FileNotFoundError:
+        return _("❌ Error al leer el log {alias}:\n```\n{output}\n```").format(alias=log_alias, output=f"No existe '{log_path}'.")
+    except OSError as e:
+        return _("❌ Error al leer el log {alias}:\n```\n{output}\n```").format(alias=log_alias, output=e)
+    logging.info(f"Consulta por rango en '{log_alias}': {bytes_read} de {size} bytes leídos, {matched} líneas.")
+
+    window = "{} → {}".format(
+        datetime.datetime.fromtimestamp(start_ts).strftime('%Y-%m-%d %H:%M:%S'),
+        datetime.datetime.fromtimestamp(end_ts).strftime('%Y-%m-%d %H:%M:%S'))
+    note = ""
+    if partial:
+        note = "\n" + _("⚠️ Resultado parcial: solo se han leído los primeros {mb} MB del rango; acótalo más.").format(mb=bytes_read // (1024 * 1024))
+    if not matched:
+        return _("🔍 No hay líneas en `{alias}` entre {window}.").format(alias=log_alias, window=window) + note
+    if pattern:
+        return _("🔍 **Resultados para '{pattern}' en `{alias}` ({window}):**\n```\n{output}\n```").format(pattern=pattern, alias=log_alias, window=window, output=output) + note
+    return _("📜 **Líneas de `{alias}` ({window}):**\n```\n{output}\n```").format(alias=log_alias, window=window, output=output) + note
+
+# --- Tareas en segundo plano (scripts y backups) ---
+
+NOTIFICATION_OUTPUT_BYTES = 1500
+
+def _format_job_status(record: dict, _) -> str:
+    name, job_id = record["name"], record["id"]
+    if record["status"] == JOB_RUNNING:
+        elapsed = datetime.timedelta(seconds=int(datetime.datetime.now().timestamp() - record["started"]))
+        return _("▶️ Tarea #{id} ({name}) en ejecución desde hace {t}.").format(id=job_id, name=name, t=elapsed)
+    if record["status"] == JOB_CANCELLED:
+        return _("🛑 Tarea #{id} ({name}) cancelada.").format(id=job_id, name=name)
+    if record["status"] == JOB_FINISHED:
+        if record["exit_code"] == 0:
+            return _("✅ Tarea #{id} ({name}) terminada correctamente.").format(id=job_id, name=name)
+        return _("❌ Tarea #{id} ({name}) terminada con código {code}.").format(id=job_id, name=name, code=record["exit_code"])
+    return _("❓ Tarea #{id} ({name}): se perdió su seguimiento al reiniciarse el bot.").format(id=job_id, name=name)
+
+def _format_job_usage(record: dict, _) -> str:
+    if record.get("duration") is None:
+        return ""
+    usage = record.get("rusage") or {}
+    return _("Duración: {t} · CPU: {user:.1f}s usuario + {sys:.1f}s sistema · Memoria máx.: {rss:.1f} MB").format(
+        t=datetime.timedelta(seconds=int(record["duration"])),
+        user=usage.get("user_seconds", 0), sys=usage.get("system_seconds", 0),
+        rss=usage.get("max_rss_kb", 0) / 1024,
+    )
+
+def _format_job_output(job_id: int, max_bytes: int, _) -> str:
+    output, size = get_runner().read_output(job_id, max_bytes)
+    if not size:
+        return _("(Sin salida)")
+    if size > max_bytes:
+        header = _("--- ÚLTIMA PARTE DE LA SALIDA ({size} bytes en total) ---").format(size=size)
+    else:
+        header = _("--- INICIO DE LA SALIDA ---")
+    return f"{header}\n{output.strip()}\n" + _("--- FIN DE LA SALIDA ---")
+
+def get_job_notification_text(record: dict, _) -> str:
+    """Aviso que se manda al chat al terminar una tarea: estado, consumo y el final de la salida."""
+    parts = [_format_job_status(record, _), _format_job_usage(record, _),
+             _format_job_output(record["id"], NOTIFICATION_OUTPUT_BYTES, _),
+             _("Usa /job {id} para ver la salida.").format(id=record["id"])]
+    return "\n\n".join(part for part in parts if part)
+
+def get_job_finished_text(record: dict, _) -> str:
+    """Aviso corto de fin de tarea (el detalle está en el mensaje de la propia tarea)."""
+    return _format_job_status(record, _) + "\n" + _("Usa /job {id} para ver la salida.").format(id=record["id"])
+
+def get_job_text(job_id: int, _) -> str:
+    # Texto plano: la salida de los scripts puede romper el formato Markdown.
+    record = get_runner().load(job_id)
+    if record is None:
+        return _("❌ No hay ninguna tarea guardada con ID #{id}.").format(id=job_id)
+    max_bytes = _get_output_budget()
+    parts = [_format_job_status(record, _), _format_job_usage(record, _), _format_job_output(job_id, max_bytes, _)]
+    if get_runner().output_size(job_id) > max_bytes:
+        parts.append(_("Usa /job {id} file para descargar la salida completa.").format(id=job_id))
+    return "\n\n".join(part for part in parts if part)
+
+def get_recent_jobs_text(_) -> str:
+    records = get_runner().recent()
+    if not records:
+        return _("ℹ️ No hay tareas en segundo plano guardadas.")
+    lines = [_("🗂️ Últimas tareas en segundo plano:"), ""]
+    lines.extend(_format_job_status(record, _) for record in records)
+    lines.append("")
+    lines.append(_("Usa /job <id> para ver la salida de una tarea."))
+    return "\n".join(lines)
+
+async def manage_service(service_name: str, action: str, _) -> str:
     allowed_services = CONFIG.get("servicios_permitidos", [])
     if service_name not in allowed_services:
         return _("❌ El servicio '{service_name}' no está en la lista de servicios permitidos.").format(service_name=service_name)
     
     command = ['sudo', 'systemctl', action, service_name]
     # Usamos la función genérica de system_utils
-    success, output = _run_command(command, 30)
+    success, output = await _run_command_async(command, 30)
+    get_command_cache().invalidate("service_status", ('systemctl', 'status', service_name))
 
     if not success:
         return _("❌ Error al ejecutar la acción '{action}' en '{service_name}':\n```\n{output}\n```").format(action=action, service_name=service_name, output=output)
 
     # Esperamos un momento y obtenemos el estado final
-    time.sleep(2)
-    final_status = get_service_status(service_name, _)
+    await asyncio.sleep(2)
+    final_status = await get_service_status(service_name, _)
     
     action_map_past = {'start': "iniciado", 'stop': "parado", 'restart': "reiniciado"}
     success_msg = _("✅ **Servicio `{service_name}` {action_past_tense} con éxito.**").format(service_name=service_name, action_past_tense=_(action_map_past.get(action)))
@@ -230,12 +570,12 @@ def parse_time_to_seconds(time_str: str) -> int:
         elif unit == 's': delta_args['seconds'] += int(value)
     return int(datetime.timedelta(**delta_args).total_seconds())
 
-def docker_logic(action: str, _, container_name: str = None, num_lines: int = 20) -> str:
+async def docker_logic(action: str, _, container_name: str = None, num_lines: int = 20) -> str:
     """Lógica para gestionar los comandos de Docker."""
     docker_allowed = CONFIG.get("docker_containers_allowed", [])
 
     if action == 'ps':
-        success, output = _run_command(['docker', 'ps', '--format', 'table {{.ID}}\t{{.Names}}\t{{.Status}}\t{{.Ports}}'], 20)
+        success, output = await run_cached("docker_ps", ['docker', 'ps', '--format', 'table {{.ID}}\t{{.Names}}\t{{.Status}}\t{{.Ports}}'], 20)
         if success:
             return _("🐳 **Contenedores Docker Activos:**\n```\n{output}\n```").format(output=output)
         return _("❌ Error al listar contenedores:\n```\n{output}\n```").format(output=output)
@@ -247,36 +587,38 @@ def docker_logic(action: str, _, container_name: str = None, num_lines: int = 20
         return _("❌ El contenedor '{container_name}' no está permitido.").format(container_name=container_name)
 
     if action == 'logs':
-        success, output = _run_command(['docker', 'logs', '--tail', str(num_lines), container_name], 60)
+        success, output = await _run_command_async(['docker', 'logs', '--tail', str(num_lines), container_name], 60)
         if success:
             return _("📜 **Logs de `{container_name}` (últimas {num_lines} líneas):**\n```\n{output}\n```").format(container_name=container_name, num_lines=num_lines, output=output)
         return _("❌ Error al obtener logs de {container_name}:\n```\n{output}\n```").format(container_name=container_name, output=output)
     
     elif action == 'restart':
-        success, output = _run_command(['sudo', 'docker', 'restart', container_name], 30)
+        success, output = await _run_command_async(['sudo', 'docker', 'restart', container_name], 30)
+        get_command_cache().invalidate("docker_ps")
         if success:
             return _("🔄 **Contenedor `{container_name}` Reiniciado:**\n```\n{output}\n```").format(container_name=container_name, output=output or "Comando ejecutado.")
         return _("❌ Error al reiniciar {container_name}:\n```\n{output}\n```").format(container_name=container_name, output=output)
         
     return _("❌ Acción de Docker no reconocida.")
 
-def fail2ban_status(_, jail=None):
-    success, output = fail2ban_status_cmd(jail)
+async def fail2ban_status(_, jail=None):
+    success, output = await fail2ban_status_cmd(jail)
     if success:
         clean_output = output.replace("`-", "").replace("|-", "").strip()
         return _("🛡️ **Estado de Fail2Ban**:\n```\n{output}\n```").format(output=clean_output)
     return _("❌ Error al obtener estado de Fail2Ban: `{error}`").format(error=output)
 
-def fail2ban_unban(ip: str, _):
+async def fail2ban_unban(ip: str, _):
     jails = CONFIG.get('fail2ban_jails', [])
     if not jails:
         return _("⚠️ No hay jaulas de Fail2Ban definidas en la configuración.")
     
     results = []
     for jail in jails:
-        success, output = fail2ban_unban_cmd(jail, ip)
+        success, output = await fail2ban_unban_cmd(jail, ip)
         if success and "unbanned" in output:
             results.append(_("✅ IP `{ip}` desbloqueada de la jaula `{jail}`.").format(ip=ip, jail=jail))
+    get_command_cache().invalidate("fail2ban_status")
     
     if not results:
         return _("ℹ️ La IP `{ip}` no parece estar baneada en ninguna de las jaulas configuradas.").format(ip=ip)
@@ -296,19 +638,32 @@ def _save_log_state(state):
     except Exception as e:
         logging.error(f"CRITICAL: No se pudo guardar el estado de monitorización de logs: {e}")
 
+def get_watched_logs() -> dict:
+    """Devuelve {alias: (ruta, (patrones...))} con los logs vigilados válidos."""
+    log_paths = CONFIG.get('allowed_logs', {})
+    watched = {}
+    for watched_log in CONFIG.get('log_monitoring', {}).get('watched_logs', []):
+        alias, patterns = watched_log.get('alias'), watched_log.get('patterns', [])
+        log_path = log_paths.get(alias)
+        if not log_path or not patterns: continue
+        watched[alias] = (log_path, tuple(patterns))
+    return watched
+
+def format_log_alerts(alias: str, hits: list, _) -> list:
+    return [
+        _("🚨 **Alerta de Log en `{alias}`** (patrón `{pattern}`):\n\n```\n{line}\n```").format(alias=alias, pattern=pattern, line=line.strip())
+        for line, pattern in hits
+    ]
+
 def check_watched_logs(_):
+    """Comprobación por sondeo, para cuando inotify no está disponible o `log_monitoring.mode` es "polling"."""
     log_config = CONFIG.get('log_monitoring', {})
     if not log_config.get('enabled', False): return []
 
-    log_paths = CONFIG.get('allowed_logs', {})
     state = _load_log_state()
     alerts = []
 
-    for watched_log in log_config.get('watched_logs', []):
-        alias, patterns = watched_log.get('alias'), watched_log.get('patterns', [])
-        log_path = log_paths.get(alias)
-        if not log_path or not patterns: continue
-
+    for alias, (log_path, patterns) in get_watched_logs().items():
         if alias not in state: state[alias] = {'last_pos': 0, 'inode': 0}
 
         try:
@@ -317,14 +672,9 @@ def check_watched_logs(_):
                 state[alias]['last_pos'] = 0
             state[alias]['inode'] = stat_info.st_ino
 
-            with open(log_path, 'r', errors='ignore') as f:
-                f.seek(state[alias]['last_pos'])
-                for line in f:
-                    for pattern in patterns:
-                        if re.search(pattern, line, re.IGNORECASE):
-                            alerts.append(_("🚨 **Alerta de Log en `{alias}`**:\n\n```\n{line}\n```").format(alias=alias, line=line.strip()))
-                            break
-                state[alias]['last_pos'] = f.tell()
+            with open(log_path, 'rb') as f:
+                hits, state[alias]['last_pos'] = scan_file(f, state[alias]['last_pos'], get_matcher(patterns))
+            alerts.extend(format_log_alerts(alias, hits, _))
         except FileNotFoundError:
             logging.warning(f"Log no encontrado para monitorización: {log_path}")
         except Exception as e:
@@ -1,149 +1,513 @@
 # custom_persistence.py
+import asyncio
 import json
 import logging
-from collections import defaultdict
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
-from typing import Any, DefaultDict, Dict, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 from telegram.ext import BasePersistence
 
+from system_utils import atomic_write_text
+
 # Configura un logger específico para esta clase
 logger = logging.getLogger(__name__)
+
+_SECTIONS = ("bot_data", "callback_data", "conversations")
+
+
+def _encode(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _conversation_key_to_str(key: Tuple) -> str:
+    return ",".join(map(str, key))
+
+
+def _conversation_key_from_str(str_key: str) -> Tuple:
+    return tuple(int(part) if part.lstrip("-").isdigit() else part for part in str_key.split(","))
+
+
 class JsonPersistence(BasePersistence):
-    def __init__(self, filepath: str):
+    """
+    Persistencia en un fichero JSON con seguimiento de cambios por clave.
+
+    - No hay copias profundas en el camino caliente: la Application ya entrega
+      copias propias en cada update_*, así que se guardan tal cual.
+    - Cada usuario/chat se serializa por separado y se cachea su fragmento JSON;
+      al volcar solo se re-serializa lo que ha cambiado.
+    - El volcado se hace fuera del bucle de eventos y con escritura atómica.
+    """
+
+    def __init__(self, filepath: str, flush_delay: float = 1.0):
         # Versión compatible que no pasa los argumentos de store_*
         super().__init__()
         self.filepath = filepath
-        self.user_data: Optional[DefaultDict[int, Dict]] = None
-        self.chat_data: Optional[DefaultDict[int, Dict]] = None
+        self.flush_delay = flush_delay
+        self.user_data: Optional[Dict[int, Dict]] = None
+        self.chat_data: Optional[Dict[int, Dict]] = None
         self.bot_data: Optional[Dict] = None
-        self.callback_data: Optional[Dict] = None
-        self.on_flush = False
+        self.callback_data: Optional[Any] = None
+        self.conversations: Optional[Dict[str, Dict[Tuple, object]]] = None
+
+        # Fragmentos JSON ya serializados del último volcado
+        self._user_fragments: Dict[int, str] = {}
+        self._chat_fragments: Dict[int, str] = {}
+        self._section_fragments: Dict[str, str] = {"bot_data": "{}", "callback_data": "null", "conversations": "{}"}
+
+        # Claves modificadas desde el último volcado
+        self._dirty_users: set = set()
+        self._dirty_chats: set = set()
+        self._dirty_sections: set = set()
+
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
 
-    def _load_data(self) -> Tuple[DefaultDict[int, Dict], DefaultDict[int, Dict], Dict, Dict]:
-        """Carga los datos desde el fichero JSON."""
+    # --- Carga ---
+
+    def _load_data(self) -> None:
+        """Carga los datos desde el fichero JSON y cachea sus fragmentos serializados."""
         try:
             with open(self.filepath, "r") as f:
                 data = json.load(f)
-                user_data = defaultdict(dict, {int(k): v for k, v in data.get("user_data", {}).items()})
-                chat_data = defaultdict(dict, {int(k): v for k, v in data.get("chat_data", {}).items()})
-                bot_data = data.get("bot_data", {})
-                callback_data = data.get("callback_data", {})
-                return user_data, chat_data, bot_data, callback_data
         except (FileNotFoundError, json.JSONDecodeError):
             logger.warning(f"No se pudo cargar el fichero de persistencia o está vacío: {self.filepath}")
-            return defaultdict(dict), defaultdict(dict), {}, {}
+            data = {}
 
-    def _save_data(self) -> None:
-        """Guarda los datos en el fichero JSON."""
-        if self.on_flush:
-            return
+        self.user_data = {int(k): v for k, v in data.get("user_data", {}).items()}
+        self.chat_data = {int(k): v for k, v in data.get("chat_data", {}).items()}
+        self.bot_data = data.get("bot_data", {})
+        self.callback_data = data.get("callback_data")
 
-        self.on_flush = True
-        try:
-            data_to_save = {
-                "user_data": deepcopy(self.user_data),
-                "chat_data": deepcopy(self.chat_data),
-                "bot_data": deepcopy(self.bot_data),
-                "callback_data": deepcopy(self.callback_data),
-            }
-            with open(self.filepath, "w") as f:
-                json.dump(data_to_save, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error al guardar los datos de persistencia: {e}", exc_info=True)
-        finally:
-            self.on_flush = False
+        # Formato antiguo: las conversaciones se guardaban dentro de bot_data
+        raw_conversations = data.get("conversations", {})
+        legacy_conversations = self.bot_data.pop("conversations", None)
+        if legacy_conversations:
+            raw_conversations = {**legacy_conversations, **raw_conversations}
+        self.conversations = {
+            name: {_conversation_key_from_str(k): state for k, state in states.items()}
+            for name, states in raw_conversations.items()
+        }
+
+        self._user_fragments = {k: _encode(v) for k, v in self.user_data.items()}
+        self._chat_fragments = {k: _encode(v) for k, v in self.chat_data.items()}
+        self._section_fragments = {
+            "bot_data": _encode(self.bot_data),
+            "callback_data": _encode(self.callback_data),
+            "conversations": _encode(raw_conversations),
+        }
+
+    def _ensure_loaded(self) -> None:
+        if self.user_data is None:
+            self._load_data()
+
+    # --- Volcado a disco ---
+
+    def _schedule_flush(self) -> None:
+        """Agrupa todos los cambios de un ciclo de persistencia en un único volcado."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        # Si flush() cancela esta tarea a mitad de escritura, la escritura termina igual.
+        await asyncio.shield(self._write_dirty())
+
+    async def _write_dirty(self) -> None:
+        async with self._flush_lock:
+            if not (self._dirty_users or self._dirty_chats or self._dirty_sections):
+                return
+
+            # Se toma la foto de lo modificado en el bucle; la serialización y la
+            # escritura se hacen en un hilo. Los objetos de usuario/chat/bot son
+            # copias propias, así que nadie los modifica mientras se serializan.
+            users = {uid: self.user_data.get(uid) for uid in self._dirty_users}
+            chats = {cid: self.chat_data.get(cid) for cid in self._dirty_chats}
+            sections = {}
+            for section in self._dirty_sections:
+                if section == "conversations":
+                    sections[section] = {
+                        name: {_conversation_key_to_str(k): state for k, state in states.items()}
+                        for name, states in self.conversations.items()
+                    }
+                else:
+                    sections[section] = getattr(self, section)
+            self._dirty_users, self._dirty_chats, self._dirty_sections = set(), set(), set()
+
+            try:
+                await asyncio.to_thread(self._encode_and_write, users, chats, sections)
+            except Exception as e:
+                logger.error(f"Error al guardar los datos de persistencia: {e}", exc_info=True)
+                # Se reintentará en el siguiente volcado
+                self._dirty_users.update(users)
+                self._dirty_chats.update(chats)
+                self._dirty_sections.update(sections)
+
+    def _encode_and_write(self, users: Dict, chats: Dict, sections: Dict) -> None:
+        for fragments, changes in ((self._user_fragments, users), (self._chat_fragments, chats)):
+            for key, value in changes.items():
+                if value is None:
+                    fragments.pop(key, None)
+                else:
+                    fragments[key] = _encode(value)
+        for section, value in sections.items():
+            self._section_fragments[section] = _encode(value)
+
+        def _join(fragments: Dict[int, str]) -> str:
+            return "{" + ",".join(f'"{key}":{fragment}' for key, fragment in fragments.items()) + "}"
+
+        document = (
+            '{"user_data":' + _join(self._user_fragments)
+            + ',"chat_data":' + _join(self._chat_fragments)
+            + "".join(f',"{section}":{self._section_fragments[section]}' for section in _SECTIONS)
+            + "}"
+        )
+        atomic_write_text(self.filepath, document)
+
+    # --- Lectura (solo se llaman al arrancar la Application) ---
 
     async def get_bot_data(self) -> Dict[Any, Any]:
         """Devuelve los datos del bot."""
-        if self.bot_data is None:
-            self.user_data, self.chat_data, self.bot_data, self.callback_data = self._load_data()
+        self._ensure_loaded()
         return deepcopy(self.bot_data)
 
-    async def get_chat_data(self) -> DefaultDict[int, Dict[Any, Any]]:
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
         """Devuelve los datos del chat."""
-        if self.chat_data is None:
-            self.user_data, self.chat_data, self.bot_data, self.callback_data = self._load_data()
+        self._ensure_loaded()
         return deepcopy(self.chat_data)
 
-    async def get_user_data(self) -> DefaultDict[int, Dict[Any, Any]]:
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
         """Devuelve los datos del usuario."""
-        if self.user_data is None:
-            self.user_data, self.chat_data, self.bot_data, self.callback_data = self._load_data()
+        self._ensure_loaded()
         return deepcopy(self.user_data)
 
-    async def get_callback_data(self) -> Optional[Dict]:
+    async def get_callback_data(self) -> Optional[Any]:
         """Devuelve los datos de callback."""
-        if self.callback_data is None:
-            self.user_data, self.chat_data, self.bot_data, self.callback_data = self._load_data()
+        self._ensure_loaded()
         return deepcopy(self.callback_data)
 
+    async def get_conversations(self, name: str) -> Dict:
+        """Obtiene una conversación."""
+        self._ensure_loaded()
+        return dict(self.conversations.get(name, {}))
+
+    # --- Actualización (camino caliente) ---
+
     async def update_bot_data(self, data: Dict) -> None:
         """Actualiza los datos del bot en memoria."""
-        if self.bot_data is None:
-            self.bot_data = {}
-        self.bot_data.update(deepcopy(data))
+        self._ensure_loaded()
+        if self.bot_data == data:
+            return
+        self.bot_data = data
+        self._dirty_sections.add("bot_data")
+        self._schedule_flush()
 
     async def update_chat_data(self, chat_id: int, data: Dict) -> None:
         """Actualiza los datos de un chat en memoria."""
-        if self.chat_data is None:
-            self.chat_data = defaultdict(dict)
-        self.chat_data[chat_id].update(deepcopy(data))
+        self._ensure_loaded()
+        if self.chat_data.get(chat_id) == data:
+            return
+        self.chat_data[chat_id] = data
+        self._dirty_chats.add(chat_id)
+        self._schedule_flush()
 
     async def update_user_data(self, user_id: int, data: Dict) -> None:
         """Actualiza los datos de un usuario en memoria."""
-        if self.user_data is None:
-            self.user_data = defaultdict(dict)
-        self.user_data[user_id].update(deepcopy(data))
+        self._ensure_loaded()
+        if self.user_data.get(user_id) == data:
+            return
+        self.user_data[user_id] = data
+        self._dirty_users.add(user_id)
+        self._schedule_flush()
 
-    async def update_callback_data(self, data: Dict) -> None:
+    async def update_callback_data(self, data: Any) -> None:
         """Actualiza los datos de callback en memoria."""
-        self.callback_data = deepcopy(data)
+        self._ensure_loaded()
+        if self.callback_data == data:
+            return
+        self.callback_data = data
+        self._dirty_sections.add("callback_data")
+        self._schedule_flush()
+
+    async def update_conversation(
+        self, name: str, key: Tuple[int, ...], new_state: Optional[object]
+    ) -> None:
+        """Actualiza una conversación."""
+        self._ensure_loaded()
+        states = self.conversations.setdefault(name, {})
+        if states.get(key) == new_state:
+            return
+        if new_state is not None:
+            states[key] = new_state
+        else:
+            del states[key]
+        self._dirty_sections.add("conversations")
+        self._schedule_flush()
 
     async def drop_chat_data(self, chat_id: int) -> None:
         """Elimina los datos de un chat."""
         if self.chat_data is not None and chat_id in self.chat_data:
             del self.chat_data[chat_id]
+            self._dirty_chats.add(chat_id)
+            self._schedule_flush()
 
     async def drop_user_data(self, user_id: int) -> None:
         """Elimina los datos de un usuario."""
         if self.user_data is not None and user_id in self.user_data:
             del self.user_data[user_id]
+            self._dirty_users.add(user_id)
+            self._schedule_flush()
 
     async def flush(self) -> None:
-        """Guarda todos los datos de memoria al fichero JSON."""
-        self._save_data()
+        """Guarda en el fichero JSON los cambios pendientes (se llama al parar el bot)."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self._write_dirty()
+
+    # Los datos de la Application son la fuente de verdad: no hay nada que refrescar
+    # y compartir sus diccionarios rompería la detección de cambios.
 
     async def refresh_bot_data(self, bot_data: Dict) -> None:
-        """Refresca los datos del bot desde la aplicación."""
-        self.bot_data = bot_data
+        """No hace nada."""
 
     async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
-        """Refresca los datos de un chat desde la aplicación."""
-        self.chat_data[chat_id] = chat_data
+        """No hace nada."""
 
     async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
-        """Refresca los datos de un usuario desde la aplicación."""
-        self.user_data[user_id] = user_data
+        """No hace nada."""
+
+
+class SqlitePersistence(BasePersistence):
+    """
+    Persistencia en un fichero SQLite en modo WAL.
+
+    Cada usuario, chat y estado de conversación es una fila: update_user_data,
+    update_chat_data y update_conversation se traducen en un único upsert de
+    esa fila en lugar de reescribir todo el documento. Las escrituras se
+    encadenan en un único hilo dedicado, así se respeta su orden y el bucle de
+    eventos nunca espera al disco.
+    """
+
+    def __init__(self, filepath: str, migrate_from: Optional[str] = None):
+        super().__init__()
+        self.filepath = filepath
+        self.migrate_from = migrate_from
+        self.user_data: Optional[Dict[int, Dict]] = None
+        self.chat_data: Optional[Dict[int, Dict]] = None
+        self.bot_data: Optional[Dict] = None
+        self.callback_data: Optional[Any] = None
+        self.conversations: Optional[Dict[str, Dict[Tuple, object]]] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-persistence")
+
+    # --- Conexión y esquema ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.filepath, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS chat_data (chat_id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS store (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS conversations (
+                    name TEXT NOT NULL, conv_key TEXT NOT NULL, state TEXT NOT NULL,
+                    PRIMARY KEY (name, conv_key)
+                );
+                """
+            )
+        return self._conn
+
+    async def _run(self, func, *args):
+        """Ejecuta una operación de base de datos en el hilo dedicado."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _execute(self, sql: str, params: tuple = ()) -> None:
+        try:
+            self._connect().execute(sql, params)
+        except sqlite3.Error as e:
+            logger.error(f"Error de SQLite al guardar la persistencia: {e}", exc_info=True)
+
+    def _upsert_user(self, user_id: int, data: Dict) -> None:
+        self._execute(
+            "INSERT INTO user_data (user_id, data) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+            (user_id, _encode(data)),
+        )
+
+    def _upsert_chat(self, chat_id: int, data: Dict) -> None:
+        self._execute(
+            "INSERT INTO chat_data (chat_id, data) VALUES (?, ?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET data = excluded.data",
+            (chat_id, _encode(data)),
+        )
+
+    def _upsert_store(self, name: str, data: Any) -> None:
+        self._execute(
+            "INSERT INTO store (name, data) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+            (name, _encode(data)),
+        )
+
+    def _upsert_conversation(self, name: str, str_key: str, state: object) -> None:
+        self._execute(
+            "INSERT INTO conversations (name, conv_key, state) VALUES (?, ?, ?) "
+            "ON CONFLICT(name, conv_key) DO UPDATE SET state = excluded.state",
+            (name, str_key, _encode(state)),
+        )
+
+    # --- Carga y migración ---
+
+    def _is_empty(self, conn: sqlite3.Connection) -> bool:
+        for table in ("user_data", "chat_data", "store", "conversations"):
+            if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return False
+        return True
+
+    def _migrate_from_json(self, conn: sqlite3.Connection) -> None:
+        """Importa una sola vez el fichero JSON de JsonPersistence en una base de datos vacía."""
+        if not self.migrate_from or not os.path.exists(self.migrate_from) or not self._is_empty(conn):
+            return
+        legacy = JsonPersistence(self.migrate_from)
+        legacy._load_data()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT INTO user_data (user_id, data) VALUES (?, ?)",
+                             [(k, _encode(v)) for k, v in legacy.user_data.items()])
+            conn.executemany("INSERT INTO chat_data (chat_id, data) VALUES (?, ?)",
+                             [(k, _encode(v)) for k, v in legacy.chat_data.items()])
+            conn.execute("INSERT INTO store (name, data) VALUES ('bot_data', ?)", (_encode(legacy.bot_data),))
+            conn.execute("INSERT INTO store (name, data) VALUES ('callback_data', ?)", (_encode(legacy.callback_data),))
+            conn.executemany(
+                "INSERT INTO conversations (name, conv_key, state) VALUES (?, ?, ?)",
+                [(name, _conversation_key_to_str(k), _encode(state))
+                 for name, states in legacy.conversations.items() for k, state in states.items()],
+            )
+            conn.execute("INSERT INTO store (name, data) VALUES ('migrated_from', ?)", (_encode(self.migrate_from),))
+        logger.info(f"Persistencia migrada de '{self.migrate_from}' a '{self.filepath}': "
+                    f"{len(legacy.user_data)} usuarios, {len(legacy.chat_data)} chats.")
+
+    def _load_data(self) -> None:
+        conn = self._connect()
+        self._migrate_from_json(conn)
+        self.user_data = {k: json.loads(v) for k, v in conn.execute("SELECT user_id, data FROM user_data")}
+        self.chat_data = {k: json.loads(v) for k, v in conn.execute("SELECT chat_id, data FROM chat_data")}
+        store = {k: json.loads(v) for k, v in conn.execute("SELECT name, data FROM store")}
+        self.bot_data = store.get("bot_data", {})
+        self.callback_data = store.get("callback_data")
+        self.conversations = {}
+        for name, str_key, state in conn.execute("SELECT name, conv_key, state FROM conversations"):
+            self.conversations.setdefault(name, {})[_conversation_key_from_str(str_key)] = json.loads(state)
+
+    async def _ensure_loaded(self) -> None:
+        if self.user_data is None:
+            await self._run(self._load_data)
+
+    # --- Lectura (solo se llaman al arrancar la Application) ---
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        """Devuelve los datos del bot."""
+        await self._ensure_loaded()
+        return deepcopy(self.bot_data)
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        """Devuelve los datos del chat."""
+        await self._ensure_loaded()
+        return deepcopy(self.chat_data)
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        """Devuelve los datos del usuario."""
+        await self._ensure_loaded()
+        return deepcopy(self.user_data)
+
+    async def get_callback_data(self) -> Optional[Any]:
+        """Devuelve los datos de callback."""
+        await self._ensure_loaded()
+        return deepcopy(self.callback_data)
 
     async def get_conversations(self, name: str) -> Dict:
         """Obtiene una conversación."""
-        if self.bot_data is None:
-            await self.get_bot_data()
-        return self.bot_data.get("conversations", {}).get(name, {})
+        await self._ensure_loaded()
+        return dict(self.conversations.get(name, {}))
+
+    # --- Actualización: un upsert por clave modificada ---
+
+    async def update_bot_data(self, data: Dict) -> None:
+        """Actualiza los datos del bot."""
+        await self._ensure_loaded()
+        if self.bot_data == data:
+            return
+        self.bot_data = data
+        await self._run(self._upsert_store, "bot_data", data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        """Actualiza los datos de un chat."""
+        await self._ensure_loaded()
+        if self.chat_data.get(chat_id) == data:
+            return
+        self.chat_data[chat_id] = data
+        await self._run(self._upsert_chat, chat_id, data)
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        """Actualiza los datos de un usuario."""
+        await self._ensure_loaded()
+        if self.user_data.get(user_id) == data:
+            return
+        self.user_data[user_id] = data
+        await self._run(self._upsert_user, user_id, data)
+
+    async def update_callback_data(self, data: Any) -> None:
+        """Actualiza los datos de callback."""
+        await self._ensure_loaded()
+        if self.callback_data == data:
+            return
+        self.callback_data = data
+        await self._run(self._upsert_store, "callback_data", data)
 
     async def update_conversation(
         self, name: str, key: Tuple[int, ...], new_state: Optional[object]
     ) -> None:
         """Actualiza una conversación."""
-        if "conversations" not in self.bot_data:
-            self.bot_data["conversations"] = {}
-        if name not in self.bot_data["conversations"]:
-            self.bot_data["conversations"][name] = {}
-        
-        str_key = ",".join(map(str, key))
-
+        await self._ensure_loaded()
+        states = self.conversations.setdefault(name, {})
+        if states.get(key) == new_state:
+            return
+        str_key = _conversation_key_to_str(key)
         if new_state is not None:
-            self.bot_data["conversations"][name][str_key] = new_state
-        elif str_key in self.bot_data["conversations"][name]:
-            del self.bot_data["conversations"][name][str_key]
+            states[key] = new_state
+            await self._run(self._upsert_conversation, name, str_key, new_state)
+        else:
+            del states[key]
+            await self._run(self._execute, "DELETE FROM conversations WHERE name = ? AND conv_key = ?", (name, str_key))
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        """Elimina los datos de un chat."""
+        if self.chat_data is not None and self.chat_data.pop(chat_id, None) is not None:
+            await self._run(self._execute, "DELETE FROM chat_data WHERE chat_id = ?", (chat_id,))
+
+    async def drop_user_data(self, user_id: int) -> None:
+        """Elimina los datos de un usuario."""
+        if self.user_data is not None and self.user_data.pop(user_id, None) is not None:
+            await self._run(self._execute, "DELETE FROM user_data WHERE user_id = ?", (user_id,))
+
+    async def flush(self) -> None:
+        """Vuelca el WAL a la base de datos y cierra la conexión (se llama al parar el bot)."""
+        def _close():
+            if self._conn is not None:
+                self._execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._conn.close()
+                self._conn = None
+        await self._run(_close)
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        """No hace nada."""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        """No hace nada."""
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        """No hace nada."""
@@ -0,0 +1,197 @@
+# detached_runner.py
+# MODULO NUEVO: Ejecución en segundo plano de scripts y backups.
+# La salida (stdout y stderr) se vuelca a un fichero en disco en lugar de a memoria,
+# y al terminar se guarda un registro JSON con el código de salida, la duración y
+# el consumo de recursos (rusage) del proceso. El chat no espera a la tarea: se
+# consulta después con /job <id>, incluso tras reiniciar el bot.
+
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import time
+
+from system_utils import atomic_write_text, _kill_process_group
+
+DEFAULT_KEEP = 50
+
+RUNNING, FINISHED, CANCELLED, LOST = "running", "finished", "cancelled", "lost"
+
+
+class DetachedRunner:
+    def __init__(self, spool_dir: str, keep: int = DEFAULT_KEEP):
+        self.spool_dir = spool_dir
+        self.keep = keep
+        os.makedirs(spool_dir, exist_ok=True)
+        self._mark_lost()
+
+    # --- Ficheros del spool ---
+
+    def output_path(self, job_id: int) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.log")
+
+    def _record_path(self, job_id: int) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.json")
+
+    def _job_ids(self) -> list[int]:
+        ids = []
+        for name in os.listdir(self.spool_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == ".json" and stem.isdigit():
+                ids.append(int(stem))
+        return sorted(ids)
+
+    def next_id(self) -> int:
+        """Primer ID libre, para que los IDs no se repitan entre reinicios."""
+        ids = self._job_ids()
+        return ids[-1] + 1 if ids else 1
+
+    def load(self, job_id: int):
+        try:
+            with open(self._record_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"No se pudo leer el registro de la tarea #{job_id}: {e}")
+            return None
+
+    def recent(self, limit: int = 10) -> list[dict]:
+        """Registros de las últimas tareas, de la más reciente a la más antigua."""
+        records = (self.load(job_id) for job_id in reversed(self._job_ids()[-limit:]))
+        return [record for record in records if record]
+
+    def _save(self, record: dict) -> None:
+        atomic_write_text(self._record_path(record["id"]), json.dumps(record, indent=2))
+
+    def _mark_lost(self) -> None:
+        """Las tareas que seguían en marcha al parar el bot ya no se pueden esperar."""
+        for job_id in self._job_ids():
+            record = self.load(job_id)
+            if record and record.get("status") == RUNNING:
+                record["status"] = LOST
+                self._save(record)
+
+    def _prune(self) -> None:
+        for job_id in self._job_ids()[:-self.keep]:
+            for path in (self._record_path(job_id), self.output_path(job_id)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def output_size(self, job_id: int) -> int:
+        try:
+            return os.path.getsize(self.output_path(job_id))
+        except FileNotFoundError:
+            return 0
+
+    def read_output(self, job_id: int, max_bytes: int) -> tuple[str, int]:
+        """Devuelve (últimos `max_bytes` de la salida empezando en una línea completa, tamaño total)."""
+        try:
+            with open(self.output_path(job_id), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                start = max(0, size - max_bytes)
+                f.seek(start)
+                data = f.read(max_bytes)
+        except FileNotFoundError:
+            return "", 0
+        if start > 0 and (cut := data.find(b"\n")) != -1:
+            data = data[cut + 1:]
+        return data.decode(errors="replace"), size
+
+    # --- Ejecución ---
+
+    async def run(self, job_id: int, name: str, command: list, user_id: int = None, chat_id: int = None) -> dict:
+        """
+        Lanza `command` en su propia sesión con la salida volcada a disco y espera a
+        que termine sin límite de tiempo. Devuelve el registro final. Si la tarea que
+        espera se cancela, se mata el grupo de procesos y se guarda como cancelada.
+        """
+        record = {
+            "id": job_id, "name": name, "command": command, "user_id": user_id, "chat_id": chat_id,
+            "status": RUNNING, "pid": None, "started": time.time(), "finished": None,
+            "duration": None, "exit_code": None, "rusage": None,
+        }
+        # fork/exec y escrituras a disco fuera del bucle de eventos.
+        launch = asyncio.ensure_future(asyncio.to_thread(self._launch, record, command))
+        cancelled = False
+        try:
+            proc = await asyncio.shield(launch)
+        except asyncio.CancelledError:
+            # El proceso se lanza igualmente: se espera a tenerlo para poder matarlo.
+            proc = await launch
+            cancelled = True
+
+        waiter = asyncio.ensure_future(_wait_child(proc.pid))
+        try:
+            if cancelled:
+                raise asyncio.CancelledError()
+            _pid, status, rusage = await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            _kill_process_group(proc)
+            _pid, status, rusage = await waiter
+            await asyncio.to_thread(self._finish, record, proc, status, rusage, CANCELLED)
+            raise
+        await asyncio.to_thread(self._finish, record, proc, status, rusage, FINISHED)
+        return record
+
+    def _launch(self, record: dict, command: list) -> subprocess.Popen:
+        with open(self.output_path(record["id"]), "wb") as output:
+            proc = subprocess.Popen(
+                command, stdin=subprocess.DEVNULL, stdout=output, stderr=subprocess.STDOUT,
+                start_new_session=True, close_fds=True,
+            )
+        record["pid"] = proc.pid
+        self._save(record)
+        self._prune()
+        logging.info(f"Tarea #{record['id']} ({record['name']}) lanzada en segundo plano con PID {proc.pid}.")
+        return proc
+
+    def _finish(self, record: dict, proc, status: int, rusage, outcome: str) -> None:
+        # Ya recogido con wait4: se avisa a Popen para que no lo vuelva a esperar.
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        record.update(
+            status=outcome, finished=time.time(), exit_code=proc.returncode,
+            rusage={"user_seconds": rusage.ru_utime, "system_seconds": rusage.ru_stime, "max_rss_kb": rusage.ru_maxrss},
+        )
+        record["duration"] = record["finished"] - record["started"]
+        self._save(record)
+        logging.info(f"Tarea #{record['id']} ({record['name']}) terminada: {outcome}, código {proc.returncode}, {record['duration']:.1f}s.")
+
+
+async def _wait_child(pid: int):
+    """
+    Espera a que el hijo termine y lo recoge con os.wait4 para obtener su rusage.
+    Con pidfd se espera desde el propio bucle de eventos; si no, en un hilo.
+    """
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return await asyncio.to_thread(os.wait4, pid, 0)
+
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+    loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+    return os.wait4(pid, 0)
+
+
+_runner = None
+
+
+def get_runner() -> DetachedRunner:
+    global _runner
+    if _runner is None:
+        from state import CONFIG, JOB_SPOOL_DIR
+        detached_config = CONFIG.get("detached_jobs", {})
+        _runner = DetachedRunner(
+            os.path.expanduser(detached_config.get("spool_dir", JOB_SPOOL_DIR)),
+            int(detached_config.get("keep", DEFAULT_KEEP)),
+        )
+    return _runner
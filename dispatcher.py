@@ -0,0 +1,206 @@
+# dispatcher.py
+# MODULO NUEVO: Cola central de mensajes salientes (alertas, errores, recordatorios).
+# Aplica cubos de tokens por chat y global ajustados a los límites de Telegram,
+# junta en un solo mensaje (hasta 4096 caracteres) lo que se acumula para un
+# mismo chat y reintenta con espera ante RetryAfter o errores de red. Los textos
+# más largos se parten en varios mensajes en lugar de cortarse.
+
+import asyncio
+import datetime
+import logging
+import time
+from collections import deque
+
+from telegram.error import BadRequest, RetryAfter, NetworkError, TimedOut, TelegramError
+
+from result_store import split_pages
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_ATTEMPTS = 5
+DEFAULT_GLOBAL_PER_SECOND = 30
+DEFAULT_CHAT_PER_SECOND = 1
+DEFAULT_GROUP_PER_MINUTE = 20
+SEPARATOR = "\n\n"
+
+
+class TokenBucket:
+    """Cubo de tokens: `rate` tokens por segundo con una ráfaga máxima de `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Outgoing:
+    def __init__(self, text: str, parse_mode, merge: bool, parts: list = None):
+        self.text = text
+        self.parse_mode = parse_mode
+        self.merge = merge
+        # Mensajes originales de un lote juntado, para poder enviarlos por separado.
+        self.parts = parts
+        self.attempts = 0
+
+
+class MessageDispatcher:
+    """
+    Cada chat tiene su propia cola y un consumidor que solo existe mientras haya
+    mensajes pendientes, así el orden dentro de un chat se respeta y los chats
+    no se bloquean entre sí. El cubo global se comparte entre todos.
+    """
+
+    def __init__(self, global_per_second: float = DEFAULT_GLOBAL_PER_SECOND,
+                 chat_per_second: float = DEFAULT_CHAT_PER_SECOND,
+                 group_per_minute: float = DEFAULT_GROUP_PER_MINUTE):
+        self.bot = None
+        self.chat_per_second = chat_per_second
+        self.group_per_minute = group_per_minute
+        self._global = TokenBucket(global_per_second, global_per_second)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._queues: dict[int, deque] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+
+    def start(self, bot) -> None:
+        self.bot = bot
+        for chat_id in list(self._queues):
+            self._ensure_worker(chat_id)
+
+    def send(self, chat_id: int, text: str, parse_mode=None, merge: bool = True) -> None:
+        """
+        Encola un mensaje y vuelve al momento. Con `merge=True` puede juntarse con
+        otros mensajes pendientes del mismo chat que usen el mismo parse_mode.
+        Un texto de más de 4096 caracteres se envía en varios mensajes.
+        """
+        queue = self._queues.setdefault(chat_id, deque())
+        if len(text) > MAX_MESSAGE_LENGTH:
+            queue.extend(_Outgoing(page, parse_mode, merge=False) for page in split_pages(text, MAX_MESSAGE_LENGTH))
+        else:
+            queue.append(_Outgoing(text, parse_mode, merge))
+        if self.bot is not None:
+            self._ensure_worker(chat_id)
+
+    def pending(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Espera a que se vacíen las colas (como mucho `timeout` segundos) y cancela el resto."""
+        workers = [w for w in self._workers.values() if not w.done()]
+        if workers:
+            _done, still_running = await asyncio.wait(workers, timeout=timeout)
+            for worker in still_running:
+                worker.cancel()
+            if still_running:
+                logging.warning(f"Se descartan {self.pending()} mensajes salientes pendientes al parar el bot.")
+
+    # --- Envío ---
+
+    def _ensure_worker(self, chat_id: int) -> None:
+        worker = self._workers.get(chat_id)
+        if worker is None or worker.done():
+            self._workers[chat_id] = asyncio.get_running_loop().create_task(self._drain(chat_id))
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Los grupos (id negativo) tienen un límite por minuto más estricto.
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_per_minute / 60, 1)
+            else:
+                bucket = TokenBucket(self.chat_per_second, 1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _take_batch(self, queue: deque) -> _Outgoing:
+        """Saca el primer mensaje y le une los siguientes compatibles mientras quepan."""
+        first = queue.popleft()
+        if not first.merge:
+            return first
+        parts = [first.text]
+        length = len(first.text)
+        while queue:
+            candidate = queue[0]
+            if not candidate.merge or candidate.parse_mode != first.parse_mode:
+                break
+            if length + len(SEPARATOR) + len(candidate.text) > MAX_MESSAGE_LENGTH:
+                break
+            queue.popleft()
+            parts.append(candidate.text)
+            length += len(SEPARATOR) + len(candidate.text)
+        if len(parts) > 1:
+            return _Outgoing(SEPARATOR.join(parts), first.parse_mode, merge=False, parts=parts)
+        return first
+
+    async def _drain(self, chat_id: int) -> None:
+        queue = self._queues[chat_id]
+        bucket = self._chat_bucket(chat_id)
+        while queue:
+            # Mientras se espera a los tokens se siguen acumulando mensajes para juntarlos.
+            await bucket.acquire()
+            await self._global.acquire()
+            message = self._take_batch(queue)
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=message.text, parse_mode=message.parse_mode)
+            except RetryAfter as e:
+                delay = e.retry_after.total_seconds() if isinstance(e.retry_after, datetime.timedelta) else e.retry_after
+                logging.warning(f"Límite de Telegram alcanzado en el chat {chat_id}: se reintenta en {delay}s.")
+                self._requeue(queue, message)
+                await asyncio.sleep(delay)
+            except BadRequest as e:
+                # BadRequest hereda de NetworkError, pero reintentarlo tal cual no va a servir.
+                if message.parts:
+                    # Un mensaje mal formado no debe llevarse por delante a los demás del lote.
+                    logging.warning(f"Telegram ha rechazado un lote para el chat {chat_id} ({e}); se envían sus mensajes por separado.")
+                    for part in reversed(message.parts):
+                        queue.appendleft(_Outgoing(part, message.parse_mode, merge=False))
+                elif message.parse_mode and "parse" in str(e).lower():
+                    logging.warning(f"Formato no válido en un mensaje para el chat {chat_id} ({e}); se reenvía como texto plano.")
+                    queue.appendleft(_Outgoing(message.text, None, merge=False))
+                else:
+                    logging.error(f"Telegram ha rechazado un mensaje para el chat {chat_id}: {e}")
+            except (TimedOut, NetworkError) as e:
+                message.attempts += 1
+                if message.attempts >= MAX_ATTEMPTS:
+                    logging.error(f"Se descarta un mensaje para el chat {chat_id} tras {message.attempts} intentos: {e}")
+                    continue
+                self._requeue(queue, message)
+                await asyncio.sleep(min(2 ** message.attempts, 30))
+            except TelegramError as e:
+                # Forbidden, ChatMigrated...: reintentar no va a servir.
+                logging.error(f"No se pudo enviar un mensaje al chat {chat_id}: {e}")
+        self._queues.pop(chat_id, None)
+
+    @staticmethod
+    def _requeue(queue: deque, message: _Outgoing) -> None:
+        # Ya juntado: no se vuelve a mezclar para no pasarse de 4096 caracteres.
+        message.merge = False
+        queue.appendleft(message)
+
+
+_dispatcher = None
+
+
+def get_dispatcher() -> MessageDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        from state import CONFIG
+        dispatcher_config = CONFIG.get("dispatcher", {})
+        _dispatcher = MessageDispatcher(
+            float(dispatcher_config.get("global_per_second", DEFAULT_GLOBAL_PER_SECOND)),
+            float(dispatcher_config.get("chat_per_second", DEFAULT_CHAT_PER_SECOND)),
+            float(dispatcher_config.get("group_per_minute", DEFAULT_GROUP_PER_MINUTE)),
+        )
+    return _dispatcher
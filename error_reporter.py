@@ -0,0 +1,106 @@
+# error_reporter.py
+# MODULO NUEVO: Agrupación de excepciones repetidas para el manejador de errores global.
+# Cada excepción se identifica por su tipo y los últimos marcos de la pila. Solo la
+# primera aparición de cada huella se notifica con la traza completa; las repeticiones
+# dentro de la misma ventana solo se cuentan y se resumen después en una línea.
+
+import time
+from collections import OrderedDict
+
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_MAX_FINGERPRINTS = 256
+FINGERPRINT_FRAMES = 5
+MAX_NOTIFIED_CHATS = 100
+
+
+def fingerprint(error: BaseException) -> tuple:
+    """
+    Tipo de la excepción y (fichero, línea, función) de los últimos marcos.
+    Se recorre el traceback a mano: no se lee el código fuente ni se formatea nada.
+    """
+    frames = []
+    tb = error.__traceback__
+    while tb is not None:
+        code = tb.tb_frame.f_code
+        frames.append((code.co_filename, tb.tb_lineno, code.co_name))
+        tb = tb.tb_next
+    return (type(error).__module__, type(error).__qualname__, tuple(frames[-FINGERPRINT_FRAMES:]))
+
+
+class _ErrorEntry:
+    def __init__(self, summary: str, now: float):
+        self.summary = summary
+        self.window_start = now
+        self.total = 1
+        self.suppressed = 0
+        self.notified_chats = set()
+
+
+class ErrorReporter:
+    def __init__(self, window: float = DEFAULT_WINDOW_SECONDS, max_fingerprints: int = DEFAULT_MAX_FINGERPRINTS):
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._entries: OrderedDict[tuple, _ErrorEntry] = OrderedDict()
+
+    def record(self, error: BaseException, now: float = None) -> tuple[bool, int, _ErrorEntry]:
+        """
+        Registra una aparición. Devuelve (es_nueva, repeticiones_sin_avisar, entrada):
+        - es_nueva: primera vez que se ve esta huella (se avisa con la traza completa).
+        - repeticiones_sin_avisar > 0: ha vencido la ventana y hay que enviar un resumen.
+        Si ninguna de las dos, la aparición solo se cuenta.
+        """
+        now = time.time() if now is None else now
+        key = fingerprint(error)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _ErrorEntry(f"{type(error).__name__}: {error}"[:300], now)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_fingerprints:
+                self._entries.popitem(last=False)
+            return True, 0, entry
+
+        self._entries.move_to_end(key)
+        entry.total += 1
+        if now - entry.window_start >= self.window:
+            repeated = entry.suppressed + 1
+            entry.window_start, entry.suppressed = now, 0
+            entry.notified_chats.clear()
+            return False, repeated, entry
+        entry.suppressed += 1
+        return False, 0, entry
+
+    def should_notify_chat(self, entry: _ErrorEntry, chat_id: int) -> bool:
+        """Cada chat recibe como mucho un aviso por huella y ventana."""
+        if chat_id in entry.notified_chats or len(entry.notified_chats) >= MAX_NOTIFIED_CHATS:
+            return False
+        entry.notified_chats.add(chat_id)
+        return True
+
+    def pop_summaries(self, now: float = None) -> list[tuple[str, int, int]]:
+        """
+        Resúmenes de las huellas con repeticiones sin avisar cuya ventana ha vencido:
+        [(resumen, repeticiones, total)]. Así una tormenta que termina también se resume.
+        """
+        now = time.time() if now is None else now
+        summaries = []
+        for entry in self._entries.values():
+            if entry.suppressed and now - entry.window_start >= self.window:
+                summaries.append((entry.summary, entry.suppressed, entry.total))
+                entry.window_start, entry.suppressed = now, 0
+                entry.notified_chats.clear()
+        return summaries
+
+
+_reporter = None
+
+
+def get_reporter() -> ErrorReporter:
+    global _reporter
+    if _reporter is None:
+        from state import CONFIG
+        report_config = CONFIG.get("error_reporting", {})
+        _reporter = ErrorReporter(
+            float(report_config.get("window_seconds", DEFAULT_WINDOW_SECONDS)),
+            int(report_config.get("max_fingerprints", DEFAULT_MAX_FINGERPRINTS)),
+        )
+    return _reporter
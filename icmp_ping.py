@@ -0,0 +1,198 @@
+# icmp_ping.py
+# MODULO NUEVO: Ping ICMP dentro del proceso, sin lanzar `ping` por cada host.
+# Usa los sockets ICMP "sin privilegios" de Linux (SOCK_DGRAM + IPPROTO_ICMP,
+# permitidos a los grupos de net.ipv4.ping_group_range): un solo socket envía los
+# echo request a todos los hosts y las respuestas se asignan por número de
+# secuencia (el identificador lo fija el kernel y solo nos entrega las nuestras).
+# Si el socket no está permitido, o el host solo tiene IPv6, se recurre al
+# comando `ping` de siempre.
+
+import asyncio
+import logging
+import platform
+import re
+import socket
+import struct
+import time
+
+from system_utils import _run_command_async
+
+DEFAULT_TIMEOUT_SECONDS = 2
+DEFAULT_INTERVAL_SECONDS = 0.2
+DEFAULT_REPORT_COUNT = 1
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+_ICMP_HEADER = struct.Struct("!BBHHH")
+_PAYLOAD = b"bot-ping" * 4
+
+
+class ICMPUnavailable(Exception):
+    """El sistema no permite sockets ICMP sin privilegios a este proceso."""
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _echo_request(sequence: int) -> bytes:
+    # El identificador va a 0: en los sockets DGRAM lo sustituye el kernel.
+    header = _ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, 0, sequence)
+    checksum = _checksum(header + _PAYLOAD)
+    return _ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, checksum, 0, sequence) + _PAYLOAD
+
+
+def _open_socket() -> socket.socket:
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    except OSError as e:
+        # EACCES: el grupo no está en ping_group_range; EPROTONOSUPPORT: no es Linux.
+        raise ICMPUnavailable(str(e)) from e
+    sock.setblocking(False)
+    return sock
+
+
+def _summary(sent: int, rtts: list, error: str = None) -> dict:
+    """{'sent', 'received', 'loss', 'min', 'avg', 'max', 'rtts', 'error'}; RTT en ms."""
+    received = len(rtts)
+    return {
+        "sent": sent,
+        "received": received,
+        "loss": 100.0 * (sent - received) / sent if sent else 100.0,
+        "min": min(rtts) if rtts else None,
+        "avg": sum(rtts) / received if rtts else None,
+        "max": max(rtts) if rtts else None,
+        "rtts": rtts,
+        "error": error,
+    }
+
+
+async def _resolve_ipv4(host: str, timeout: float):
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, None, family=socket.AF_INET), timeout)
+    except (asyncio.TimeoutError, OSError):
+        return None
+    return infos[0][4][0]
+
+
+async def _ping_socket(addresses: dict, count: int, timeout: float, interval: float) -> dict:
+    """Ping por el socket ICMP. `addresses` es {host: ipv4}."""
+    loop = asyncio.get_running_loop()
+    sock = _open_socket()
+    pending = {}  # secuencia -> (host, dirección, instante de envío)
+    rtts = {host: [] for host in addresses}
+    sent = dict.fromkeys(addresses, 0)
+    all_sent = False
+    done = loop.create_future()
+
+    def on_readable():
+        while True:
+            try:
+                data, (source, _port) = sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logging.debug(f"Error leyendo del socket ICMP: {e}")
+                return
+            if len(data) < _ICMP_HEADER.size:
+                continue
+            kind, _code, _checksum, _ident, sequence = _ICMP_HEADER.unpack_from(data)
+            probe = pending.get(sequence)
+            if kind != ICMP_ECHO_REPLY or probe is None or probe[1] != source:
+                continue
+            del pending[sequence]
+            rtts[probe[0]].append((time.monotonic() - probe[2]) * 1000)
+            if all_sent and not pending and not done.done():
+                done.set_result(None)
+
+    loop.add_reader(sock.fileno(), on_readable)
+    try:
+        sequence = 0
+        for attempt in range(count):
+            if attempt:
+                await asyncio.sleep(interval)
+            for host, address in addresses.items():
+                sequence = (sequence + 1) & 0xFFFF
+                pending[sequence] = (host, address, time.monotonic())
+                try:
+                    sock.sendto(_echo_request(sequence), (address, 0))
+                    sent[host] += 1
+                except OSError as e:
+                    # Sin ruta, red caída...: cuenta como enviado y perdido.
+                    del pending[sequence]
+                    sent[host] += 1
+                    logging.debug(f"No se pudo enviar el ping a {host}: {e}")
+        all_sent = True
+        if pending:
+            try:
+                await asyncio.wait_for(done, timeout)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        loop.remove_reader(sock.fileno())
+        sock.close()
+    return {host: _summary(sent[host], rtts[host]) for host in addresses}
+
+
+_RTT_RE = re.compile(r"=\s*([\d.]+)/([\d.]+)/([\d.]+)")
+_COUNTS_RE = re.compile(r"(\d+) packets transmitted, (\d+) (?:packets )?received")
+
+
+async def _ping_subprocess(host: str, count: int, timeout: float) -> dict:
+    """Ping con el comando del sistema; se usa cuando el socket ICMP no está permitido."""
+    if platform.system().lower() == 'windows':
+        command = ['ping', '-n', str(count), host]
+    else:
+        command = ['ping', '-c', str(count), '-W', str(max(1, round(timeout))), host]
+    success, output = await _run_command_async(command, timeout * count + 5)
+    counts = _COUNTS_RE.search(output)
+    if not counts:
+        return _summary(count, [], error=None if success else output.strip()[:200])
+    sent, received = int(counts.group(1)), int(counts.group(2))
+    result = _summary(sent, [])
+    result["received"] = received
+    result["loss"] = 100.0 * (sent - received) / sent if sent else 100.0
+    rtt = _RTT_RE.search(output)
+    if rtt:
+        result["min"], result["avg"], result["max"] = (float(v) for v in rtt.groups())
+    return result
+
+
+async def ping_many(hosts: list[str], count: int = DEFAULT_REPORT_COUNT, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                    interval: float = DEFAULT_INTERVAL_SECONDS) -> dict:
+    """
+    Hace `count` pings a cada host (todos a la vez) y devuelve {host: resumen} con
+    enviados, recibidos, % de pérdida y RTT mínimo/medio/máximo en ms.
+    """
+    hosts = list(dict.fromkeys(hosts))
+    resolved = await asyncio.gather(*(_resolve_ipv4(h, timeout) for h in hosts))
+    addresses = {host: address for host, address in zip(hosts, resolved) if address}
+    fallback = [host for host in hosts if host not in addresses]
+
+    results = {}
+    if addresses:
+        try:
+            results.update(await _ping_socket(addresses, count, timeout, interval))
+        except ICMPUnavailable as e:
+            logging.debug(f"Socket ICMP no disponible ({e}); se usa el comando ping.")
+            fallback = hosts
+    if fallback:
+        summaries = await asyncio.gather(*(_ping_subprocess(h, count, timeout) for h in fallback))
+        results.update(zip(fallback, summaries))
+    return results
+
+
+def get_ping_settings() -> tuple[float, int]:
+    """(timeout, pings por host en el reporte de estado) desde `icmp_ping` en la configuración."""
+    from state import CONFIG
+    ping_config = CONFIG.get("icmp_ping", {})
+    return (
+        float(ping_config.get("timeout_seconds", DEFAULT_TIMEOUT_SECONDS)),
+        int(ping_config.get("report_count", DEFAULT_REPORT_COUNT)),
+    )
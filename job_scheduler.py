@@ -0,0 +1,189 @@
+# job_scheduler.py
+# MODULO NUEVO: Planificador de tareas pesadas por clases de recurso.
+# Sustituye al antiguo HEAVY_TASK_LOCK global: cada clase (escaneos de red,
+# búsquedas en logs, scripts, backups) tiene su propio límite de concurrencia y
+# su propia cola FIFO, con prioridad para el super admin. Las tareas en cola o en
+# ejecución se pueden listar y cancelar; cancelar una tarea en ejecución cancela
+# su corrutina, y _run_command_async mata entonces el grupo de procesos.
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+# Límites por defecto: clase -> tareas simultáneas
+DEFAULT_CLASSES = {
+    "network": 2,
+    "logsearch": 2,
+    "script": 1,
+    "backup": 1,
+}
+DEFAULT_CLASS_LIMIT = 1
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_HISTORY = 20
+
+
+class JobCancelled(Exception):
+    """La tarea se canceló antes de terminar."""
+
+
+class Job:
+    def __init__(self, job_id: int, resource: str, description: str, coro_factory,
+                 user_id: int, chat_id: int, priority: int):
+        self.id = job_id
+        self.resource = resource
+        self.description = description
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.priority = priority
+        self.status = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.task = None
+        self._coro_factory = coro_factory
+        loop = asyncio.get_running_loop()
+        self._started_future = loop.create_future()
+        self._done_future = loop.create_future()
+
+    async def wait_started(self) -> None:
+        """Espera a que la tarea salga de la cola. Lanza JobCancelled si se cancela antes."""
+        await asyncio.shield(self._started_future)
+
+    async def wait(self):
+        """Espera al resultado de la tarea. Lanza JobCancelled si se cancela."""
+        return await asyncio.shield(self._done_future)
+
+    def _resolve_cancelled(self) -> None:
+        for future in (self._started_future, self._done_future):
+            if not future.done():
+                future.set_exception(JobCancelled())
+                # Nadie tiene por qué estar esperando: se marca como recuperada.
+                future.exception()
+
+
+class JobScheduler:
+    def __init__(self, limits: dict = None, first_id: int = 1):
+        self.limits = dict(DEFAULT_CLASSES)
+        self.limits.update(limits or {})
+        self._ids = itertools.count(first_id)
+        self._seq = itertools.count()
+        self._queues: dict[str, list] = {}
+        self._running: dict[str, set] = {}
+        self._jobs: dict[int, Job] = {}
+        self._finished: list[Job] = []
+
+    def limit(self, resource: str) -> int:
+        return max(1, int(self.limits.get(resource, DEFAULT_CLASS_LIMIT)))
+
+    def new_id(self) -> int:
+        """Reserva un ID para una tarea que necesita conocerlo antes de encolarse."""
+        return next(self._ids)
+
+    def submit(self, resource: str, description: str, coro_factory, user_id: int = None,
+               chat_id: int = None, priority: int = PRIORITY_NORMAL, job_id: int = None) -> Job:
+        """
+        Encola una tarea. `coro_factory()` crea la corrutina cuando le llega el
+        turno, así nada se ejecuta mientras la tarea está en cola.
+        """
+        job = Job(job_id if job_id is not None else next(self._ids), resource, description, coro_factory, user_id, chat_id, priority)
+        self._jobs[job.id] = job
+        heapq.heappush(self._queues.setdefault(resource, []), (priority, next(self._seq), job))
+        self._dispatch(resource)
+        return job
+
+    def position(self, job: Job) -> int:
+        """Posición (1 = la siguiente) de una tarea en la cola de su clase, o 0 si no está en cola."""
+        if job.status != QUEUED:
+            return 0
+        queued = sorted(entry for entry in self._queues.get(job.resource, []) if entry[2].status == QUEUED)
+        for i, (_priority, _seq, queued_job) in enumerate(queued, start=1):
+            if queued_job is job:
+                return i
+        return 0
+
+    def get(self, job_id: int):
+        return self._jobs.get(job_id)
+
+    def active_jobs(self) -> list[Job]:
+        """Tareas en ejecución y en cola, ordenadas por clase y turno."""
+        jobs = []
+        for resource in sorted(set(self._running) | set(self._queues)):
+            jobs.extend(sorted(self._running.get(resource, ()), key=lambda j: j.started))
+            jobs.extend(entry[2] for entry in sorted(self._queues.get(resource, [])) if entry[2].status == QUEUED)
+        return jobs
+
+    def recent_jobs(self) -> list[Job]:
+        return list(self._finished)
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancela una tarea en cola o en ejecución. Devuelve False si ya había terminado."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        if job.status == QUEUED:
+            # Se deja en el heap y se descarta al llegar su turno.
+            self._finish(job, CANCELLED)
+            job._resolve_cancelled()
+            return True
+        if job.status == RUNNING and job.task is not None:
+            job.task.cancel()
+            return True
+        return False
+
+    # --- Ejecución ---
+
+    def _dispatch(self, resource: str) -> None:
+        queue = self._queues.get(resource, [])
+        running = self._running.setdefault(resource, set())
+        while queue and len(running) < self.limit(resource):
+            _priority, _seq, job = heapq.heappop(queue)
+            if job.status != QUEUED:
+                continue
+            job.status = RUNNING
+            job.started = time.time()
+            running.add(job)
+            job.task = asyncio.get_running_loop().create_task(job._coro_factory())
+            job.task.add_done_callback(lambda task, job=job: self._on_done(job, task))
+            job._started_future.set_result(None)
+            logging.info(f"Tarea #{job.id} ({job.resource}) iniciada: {job.description}")
+
+    def _on_done(self, job: Job, task: asyncio.Task) -> None:
+        self._running[job.resource].discard(job)
+        if task.cancelled():
+            self._finish(job, CANCELLED)
+            job._resolve_cancelled()
+        elif (error := task.exception()) is not None:
+            self._finish(job, FAILED)
+            job._done_future.set_exception(error)
+        else:
+            self._finish(job, DONE)
+            job._done_future.set_result(task.result())
+        logging.info(f"Tarea #{job.id} ({job.resource}) terminada: {job.status}")
+        self._dispatch(job.resource)
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished = time.time()
+        job._coro_factory = None
+        self._jobs.pop(job.id, None)
+        self._finished.append(job)
+        del self._finished[:-FINISHED_HISTORY]
+
+
+_scheduler = None
+
+
+def get_scheduler() -> JobScheduler:
+    global _scheduler
+    if _scheduler is None:
+        from state import CONFIG
+        from detached_runner import get_runner
+        # Los IDs continúan tras los de las tareas guardadas en disco, así /job <id> no se repite.
+        _scheduler = JobScheduler(CONFIG.get("job_scheduler", {}).get("classes", {}), get_runner().next_id())
+    return _scheduler
@@ -118,6 +118,19 @@ def dynamic_keyboard_from_config(config_key: str, action_prefix: str, back_butto
     keyboard.append([InlineKeyboardButton(f"⬅️ {back_button_text}", callback_data=back_button_cb)])
     return InlineKeyboardMarkup(keyboard)
 
+def pagination_keyboard(key: str, page: int, total: int, extra: dict = None):
+    """Botones ◀️/▶️ de un resultado paginado, encima del teclado original si lo había."""
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️", callback_data=f"page:{key}:{page - 1}"))
+    nav.append(InlineKeyboardButton(f"{page + 1}/{total}", callback_data=f"page:{key}:{page}"))
+    if page < total - 1:
+        nav.append(InlineKeyboardButton("▶️", callback_data=f"page:{key}:{page + 1}"))
+    rows = [nav]
+    if extra:
+        rows.extend(InlineKeyboardMarkup.de_json(extra, None).inline_keyboard)
+    return InlineKeyboardMarkup(rows)
+
 def dynamic_backup_script_keyboard(_):
     return dynamic_keyboard_from_config("backup_scripts", "backup:run", "menu:backups", _("Volver a Backups"), _)
 
@@ -0,0 +1,121 @@
+# live_output.py
+# MODULO NUEVO: Salida en directo de comandos largos (nmap, traceroute, scripts, backups).
+# La salida se va mostrando en el mensaje de "Ejecutando..." mientras llega, sin
+# esperar a que el proceso termine. Las ediciones se agrupan (como mucho una cada
+# `edit_interval_seconds`) y solo se conserva la última ventana de la salida.
+
+import asyncio
+import datetime
+import logging
+import time
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+DEFAULT_EDIT_INTERVAL_SECONDS = 3
+DEFAULT_WINDOW_BYTES = 3000
+FINAL_EDIT_ATTEMPTS = 3
+
+
+class RollingWindow:
+    """Últimos `max_bytes` de un flujo de salida. Lo anterior se descarta al llegar."""
+
+    def __init__(self, max_bytes: int = DEFAULT_WINDOW_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        self._buffer += chunk
+        # Se recorta solo al doblar el tamaño para no mover memoria en cada bloque.
+        if len(self._buffer) > 2 * self.max_bytes:
+            del self._buffer[:-self.max_bytes]
+
+    def text(self) -> str:
+        data = bytes(self._buffer[-self.max_bytes:])
+        if self.total_bytes > len(data) and (cut := data.find(b"\n")) != -1:
+            data = data[cut + 1:]
+        return data.decode(errors="replace")
+
+
+class LiveMessage:
+    """
+    Edita un mensaje de Telegram con lo que devuelva `render()` (None si aún no hay
+    nada que mostrar). Solo se edita si el texto ha cambiado, y como mucho una vez
+    cada `interval` segundos, así que los límites de edición de Telegram se respetan
+    aunque el comando escupa miles de líneas por segundo.
+    """
+
+    def __init__(self, edit, render, interval: float = DEFAULT_EDIT_INTERVAL_SECONDS):
+        self.edit = edit
+        self.render = render
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last_text = None
+        self._stopped = asyncio.Event()
+        self._task = None
+
+    def elapsed(self) -> str:
+        return str(datetime.timedelta(seconds=int(time.monotonic() - self.started)))
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self, final_text: str = None) -> None:
+        """Termina las ediciones periódicas (sin cortar una a medias) y, si se da, hace la última."""
+        self._stopped.set()
+        if self._task is not None:
+            await self._task
+        if final_text is not None:
+            await self._edit(final_text, final=True)
+
+    async def _loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            text = self.render()
+            if text and text != self._last_text:
+                await self._edit(text)
+
+    async def _edit(self, text: str, final: bool = False) -> None:
+        # Las ediciones intermedias se pueden saltar; la final (que lleva el aviso
+        # de fin de la tarea) se reintenta tras la espera que pide Telegram.
+        for _attempt in range(FINAL_EDIT_ATTEMPTS if final else 1):
+            try:
+                await self.edit(text)
+                self._last_text = text
+                return
+            except RetryAfter as e:
+                delay = e.retry_after.total_seconds() if isinstance(e.retry_after, datetime.timedelta) else e.retry_after
+                if final:
+                    logging.warning(f"Límite de ediciones de Telegram alcanzado: el mensaje final se reintenta en {delay}s.")
+                    await asyncio.sleep(delay)
+                    continue
+                # Se salta esta edición; la siguiente llevará el texto actualizado.
+                logging.warning(f"Límite de ediciones de Telegram alcanzado: se pausa la salida en directo {delay}s.")
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                return
+            except BadRequest as e:
+                # "Message is not modified" o el mensaje ya no existe: no hay nada que reintentar.
+                logging.debug(f"Edición de salida en directo descartada: {e}")
+                return
+            except TelegramError as e:
+                logging.warning(f"No se pudo actualizar la salida en directo: {e}")
+                return
+        logging.error("No se pudo enviar el mensaje final de la salida en directo tras varios intentos.")
+
+
+def get_live_settings() -> tuple[float, int]:
+    """(intervalo entre ediciones, bytes de salida mostrados) desde `live_output` en la configuración."""
+    from state import CONFIG
+    live_config = CONFIG.get("live_output", {})
+    return (
+        float(live_config.get("edit_interval_seconds", DEFAULT_EDIT_INTERVAL_SECONDS)),
+        int(live_config.get("window_bytes", DEFAULT_WINDOW_BYTES)),
+    )
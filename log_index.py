@@ -0,0 +1,286 @@
+# log_index.py
+# MODULO NUEVO: Índice disperso marca de tiempo -> offset para los logs permitidos.
+# Cada `stride_bytes` se guarda la marca de tiempo de la primera línea que empieza
+# a partir de ese punto. Una consulta por rango de horas busca en el índice con
+# bisect y solo lee el trozo de fichero que puede contener esas horas.
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from system_utils import BoundedCapture, atomic_write_text
+
+DEFAULT_STRIDE_BYTES = 1024 * 1024
+SAMPLE_WINDOW = 64 * 1024
+READ_BLOCK_SIZE = 1024 * 1024
+# Máximo que lee una consulta por rango; si el trozo es mayor se devuelve parcial.
+DEFAULT_MAX_WINDOW_BYTES = 64 * 1024 * 1024
+TIMESTAMP_PREFIX = 64
+
+_MONTHS = {m: i for i, m in enumerate(("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                                       "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), start=1)}
+
+# ISO 8601 / formato de Python logging: 2024-05-01 03:15:00 o 2024-05-01T03:15:00
+_ISO_RE = re.compile(rb"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})")
+# syslog clásico: May  1 03:15:00 (sin año)
+_SYSLOG_RE = re.compile(rb"^([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2})")
+# nginx/apache: [01/May/2024:03:15:00 +0200]
+_CLF_RE = re.compile(rb"\[(\d{2})/([A-Z][a-z]{2})/(\d{4}):(\d{2}):(\d{2}):(\d{2}) ([+-]\d{4})\]")
+
+
+class NoTimestamps(Exception):
+    """No se ha reconocido ninguna marca de tiempo en el log, así que no hay índice."""
+
+
+def parse_line_timestamp(line: bytes, now: datetime = None):
+    """Devuelve la marca de tiempo (epoch) de una línea de log, o None si no se reconoce."""
+    prefix = line[:TIMESTAMP_PREFIX]
+    try:
+        if (m := _ISO_RE.search(prefix)):
+            return datetime(*map(int, m.groups())).timestamp()
+        if (m := _SYSLOG_RE.match(prefix)):
+            month = _MONTHS.get(m.group(1).decode())
+            if month is None:
+                return None
+            now = now or datetime.now()
+            dt = datetime(now.year, month, int(m.group(2)), *map(int, m.groups()[2:]))
+            # syslog no guarda el año: una fecha "futura" es del año anterior.
+            if dt > now + timedelta(days=1):
+                dt = dt.replace(year=now.year - 1)
+            return dt.timestamp()
+        if (m := _CLF_RE.search(line[:TIMESTAMP_PREFIX * 2])):
+            day, month_name, year, hh, mm, ss, tz = m.groups()
+            month = _MONTHS.get(month_name.decode())
+            if month is None:
+                return None
+            dt = datetime.strptime(
+                f"{year.decode()}-{month:02d}-{day.decode()} {hh.decode()}:{mm.decode()}:{ss.decode()} {tz.decode()}",
+                "%Y-%m-%d %H:%M:%S %z")
+            return dt.timestamp()
+    except ValueError:
+        return None
+    return None
+
+
+def parse_time_arg(text: str, end: bool = False, now: datetime = None):
+    """
+    Interpreta un argumento de hora del usuario y devuelve un epoch (o None).
+    Acepta `HH:MM[:SS]` (hoy), `YYYY-MM-DD`, `YYYY-MM-DDTHH:MM[:SS]` y `now`.
+    Con `end=True` una fecha sin hora significa el final de ese día.
+    """
+    now = now or datetime.now()
+    text = text.strip()
+    if text.lower() in ("now", "ahora"):
+        return now.timestamp()
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            t = datetime.strptime(text, fmt).time()
+            return datetime.combine(now.date(), t).timestamp()
+        except ValueError:
+            pass
+    for fmt in ("%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    try:
+        day = datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        return None
+    return (day + timedelta(days=1, seconds=-1)).timestamp() if end else day.timestamp()
+
+
+class LogIndex:
+    """Índice disperso de un fichero: lista de (epoch, offset) con epochs no decrecientes."""
+
+    def __init__(self, path: str, stride: int = DEFAULT_STRIDE_BYTES, data: dict = None):
+        self.path = path
+        self.stride = stride
+        self.lock = threading.Lock()
+        data = data or {}
+        if data.get("path") == path and data.get("stride") == stride:
+            self.inode = data.get("inode", 0)
+            self.indexed_until = data.get("indexed_until", 0)
+            self.size = data.get("size", 0)
+            self.timestamps = [entry[0] for entry in data.get("entries", [])]
+            self.offsets = [entry[1] for entry in data.get("entries", [])]
+        else:
+            self._reset(0)
+
+    def _reset(self, inode: int) -> None:
+        self.inode = inode
+        self.indexed_until = 0
+        self.size = 0
+        self.timestamps = []
+        self.offsets = []
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "stride": self.stride,
+            "inode": self.inode,
+            "indexed_until": self.indexed_until,
+            "size": self.size,
+            "entries": [[ts, off] for ts, off in zip(self.timestamps, self.offsets)],
+        }
+
+    def update(self) -> bool:
+        """
+        Extiende el índice con lo que ha crecido el fichero desde la última vez.
+        Solo se lee una ventana pequeña en cada punto de muestreo, no el fichero
+        entero. Devuelve True si el índice ha cambiado.
+        """
+        with self.lock:
+            stat_info = os.stat(self.path)
+            changed = False
+            if stat_info.st_ino != self.inode or stat_info.st_size < self.size:
+                # Rotado o truncado: se empieza de cero.
+                self._reset(stat_info.st_ino)
+                changed = True
+
+            now = datetime.now()
+            with open(self.path, "rb") as f:
+                boundary = self.indexed_until
+                while boundary < stat_info.st_size:
+                    sample = self._sample_at(f, boundary, now)
+                    if sample and (not self.timestamps or sample[0] >= self.timestamps[-1]) \
+                            and (not self.offsets or sample[1] > self.offsets[-1]):
+                        self.timestamps.append(sample[0])
+                        self.offsets.append(sample[1])
+                    boundary += self.stride
+                    changed = True
+            self.indexed_until = boundary
+            self.size = stat_info.st_size
+            return changed
+
+    @staticmethod
+    def _sample_at(f, boundary: int, now: datetime):
+        """Devuelve (epoch, offset) de la primera línea con fecha que empieza en `boundary` o después."""
+        f.seek(boundary)
+        window = f.read(SAMPLE_WINDOW)
+        pos = 0
+        if boundary > 0:
+            # Se salta la línea que empieza antes del punto de muestreo.
+            pos = window.find(b"\n") + 1
+            if pos == 0:
+                return None
+        while pos < len(window):
+            line_end = window.find(b"\n", pos)
+            if line_end == -1:
+                return None
+            ts = parse_line_timestamp(window[pos:line_end], now)
+            if ts is not None:
+                return ts, boundary + pos
+            pos = line_end + 1
+        return None
+
+    def byte_range(self, start_ts: float, end_ts: float, size: int) -> tuple[int, int]:
+        """Trozo del fichero [inicio, fin) que contiene todas las líneas entre las dos marcas."""
+        i = bisect_left(self.timestamps, start_ts)
+        start = self.offsets[i - 1] if i > 0 else 0
+        j = bisect_right(self.timestamps, end_ts)
+        end = self.offsets[j] if j < len(self.offsets) else size
+        return start, max(start, end)
+
+    def read_window(self, start_ts: float, end_ts: float, pattern: re.Pattern = None, max_bytes: int = 4000,
+                    max_window_bytes: int = DEFAULT_MAX_WINDOW_BYTES) -> tuple[str, int, int, int, bool]:
+        """
+        Devuelve (texto, líneas_coincidentes, bytes_leídos, tamaño_fichero, parcial)
+        con las líneas entre `start_ts` y `end_ts` (opcionalmente filtradas por `pattern`).
+        Las líneas sin fecha (p. ej. trazas) heredan la de la línea anterior.
+        Si el trozo supera `max_window_bytes` solo se lee su principio y `parcial` es True.
+        Lanza NoTimestamps si el log no tiene fechas reconocibles: sin índice habría
+        que leer el fichero entero.
+        """
+        self.update()
+        with self.lock:
+            if not self.timestamps:
+                raise NoTimestamps(self.path)
+            with open(self.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                start, end = self.byte_range(start_ts, end_ts, size)
+                partial = end - start > max_window_bytes
+                if partial:
+                    end = start + max_window_bytes
+                capture = BoundedCapture(max_bytes)
+                matched = 0
+                current_ts = None
+                now = datetime.now()
+                f.seek(start)
+                remaining = end - start
+                pending = b""
+                while remaining > 0:
+                    block = f.read(min(READ_BLOCK_SIZE, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    data = pending + block
+                    lines = data.split(b"\n")
+                    # Al cortar por el límite, la última línea puede estar a medias: se descarta.
+                    pending = lines.pop() if remaining > 0 or partial else b""
+                    for line in lines:
+                        if not line:
+                            continue
+                        ts = parse_line_timestamp(line, now)
+                        if ts is not None:
+                            current_ts = ts
+                        if current_ts is None or not (start_ts <= current_ts <= end_ts):
+                            continue
+                        if pattern is not None and not pattern.search(line.decode("utf-8", errors="replace")):
+                            continue
+                        capture.feed(line + b"\n")
+                        matched += 1
+                return capture.render().strip(), matched, end - start, size, partial
+
+
+class LogIndexStore:
+    """Índices de todos los logs permitidos, guardados juntos en un fichero JSON."""
+
+    def __init__(self, state_file: str, stride: int = DEFAULT_STRIDE_BYTES):
+        self.state_file = state_file
+        self.stride = stride
+        self._indexes: dict[str, LogIndex] = {}
+        self._saved = {}
+        try:
+            with open(state_file, "r") as f:
+                self._saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._saved = {}
+
+    def get(self, alias: str, path: str) -> LogIndex:
+        index = self._indexes.get(alias)
+        if index is None or index.path != path:
+            index = LogIndex(path, self.stride, self._saved.get(alias))
+            self._indexes[alias] = index
+        return index
+
+    def update_all(self, allowed_logs: dict) -> None:
+        """Extiende los índices de todos los logs y guarda el estado si ha cambiado (en un hilo)."""
+        started = time.monotonic()
+        changed = False
+        for alias, path in allowed_logs.items():
+            try:
+                changed |= self.get(alias, path).update()
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logging.error(f"Error al indexar el log {alias} ({path}): {e}")
+        if changed:
+            self.save()
+            logging.info(f"Índices de logs actualizados en {time.monotonic() - started:.2f}s.")
+
+    def save(self) -> None:
+        data = {}
+        for alias, index in self._indexes.items():
+            with index.lock:
+                data[alias] = index.to_dict()
+        try:
+            atomic_write_text(self.state_file, json.dumps(data))
+            self._saved = data
+        except Exception as e:
+            logging.error(f"No se pudo guardar el índice de logs: {e}")
@@ -0,0 +1,160 @@
+# log_matcher.py
+# MODULO NUEVO: Búsqueda de varios patrones a la vez sobre bloques grandes de un log.
+# Los patrones de `watched_logs` se compilan una sola vez en una única expresión
+# combinada que indica qué patrón ha coincidido.
+
+import logging
+import re
+from functools import lru_cache
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+BLOCK_SIZE = 1024 * 1024
+MIN_LITERAL_LENGTH = 3
+_FLAGS = re.IGNORECASE | re.MULTILINE
+
+
+def _required_literal(pattern: str):
+    """
+    Devuelve la secuencia literal más larga que toda coincidencia del patrón
+    debe contener (en minúsculas), o None si no hay ninguna útil.
+    Solo se miran los elementos obligatorios del nivel superior y sus grupos.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, _FLAGS)
+    except re.error:
+        return None
+
+    best, run = "", []
+
+    def _walk(items):
+        nonlocal best, run
+        for op, av in items:
+            if op is sre_parse.LITERAL and chr(av) != "\n":
+                run.append(chr(av))
+                continue
+            if op is sre_parse.SUBPATTERN:
+                _walk(av[-1])
+                continue
+            if len(run) > len(best):
+                best = "".join(run)
+            run = []
+
+    _walk(parsed)
+    if len(run) > len(best):
+        best = "".join(run)
+    return best.lower() if len(best) >= MIN_LITERAL_LENGTH else None
+
+
+class PatternMatcher:
+    """Expresión combinada `(?P<p0>...)|(?P<p1>...)` con los patrones de un log vigilado."""
+
+    def __init__(self, patterns: tuple):
+        self.patterns = patterns
+        try:
+            combined = "|".join(f"(?P<p{i}>(?:{pattern}))" for i, pattern in enumerate(patterns))
+            self.combined = re.compile(combined, _FLAGS)
+            self.separate = None
+        except re.error as e:
+            # Por ejemplo, patrones con referencias numeradas (\1) que no se pueden combinar.
+            logging.warning(f"No se pudieron combinar los patrones {patterns}, se usarán por separado: {e}")
+            self.combined = None
+            self.separate = [(re.compile(pattern, _FLAGS), pattern) for pattern in patterns]
+
+        # El motor de re recorre una alternancia posición a posición, lo que es
+        # lento en bloques grandes. Si cada patrón exige un literal, se buscan
+        # esos literales con str.find y la expresión solo se evalúa en las
+        # líneas candidatas.
+        literals = [_required_literal(pattern) for pattern in patterns]
+        self.literals = None if None in literals else sorted(set(literals))
+
+    def match_line(self, line: str):
+        """Devuelve el patrón que coincide con la línea, o None."""
+        if self.combined is not None:
+            m = self.combined.search(line)
+            return self.patterns[int(m.lastgroup[1:])] if m else None
+        for regex, pattern in self.separate:
+            if regex.search(line):
+                return pattern
+        return None
+
+    def scan(self, text: str) -> list[tuple[str, str]]:
+        """
+        Busca en un bloque de líneas completas y devuelve [(línea, patrón)].
+        El bloque se recorre con una sola búsqueda por coincidencia; solo se
+        separa en líneas alrededor de cada coincidencia.
+        """
+        if self.literals is not None:
+            lowered = text.lower()
+            # Algunos caracteres cambian de longitud al pasar a minúsculas;
+            # en ese caso las posiciones no coinciden y se usa la expresión.
+            if len(lowered) == len(text):
+                return self._scan_candidates(text, lowered)
+
+        if self.combined is None:
+            return [(line, pattern) for line in text.splitlines() if (pattern := self.match_line(line))]
+
+        hits = []
+        pos = 0
+        while (m := self.combined.search(text, pos)):
+            line_start = text.rfind("\n", 0, m.start()) + 1
+            line_end = text.find("\n", m.start())
+            if line_end == -1:
+                line_end = len(text)
+            line = text[line_start:line_end]
+            # Se verifica sobre la línea aislada: un patrón con \s podría haber
+            # coincidido saltando de una línea a otra.
+            if (pattern := self.match_line(line)):
+                hits.append((line, pattern))
+            pos = line_end + 1
+        return hits
+
+    def _scan_candidates(self, text: str, lowered: str) -> list[tuple[str, str]]:
+        candidates = set()
+        for literal in self.literals:
+            i = lowered.find(literal)
+            while i != -1:
+                line_start = text.rfind("\n", 0, i) + 1
+                line_end = text.find("\n", i)
+                if line_end == -1:
+                    line_end = len(text)
+                candidates.add((line_start, line_end))
+                i = lowered.find(literal, line_end + 1)
+
+        hits = []
+        for line_start, line_end in sorted(candidates):
+            line = text[line_start:line_end]
+            if (pattern := self.match_line(line)):
+                hits.append((line, pattern))
+        return hits
+
+
+@lru_cache(maxsize=64)
+def get_matcher(patterns: tuple) -> PatternMatcher:
+    """Devuelve el matcher compilado para una generación de configuración (tupla de patrones)."""
+    return PatternMatcher(patterns)
+
+
+def scan_file(f, start_pos: int, matcher: PatternMatcher, block_size: int = BLOCK_SIZE) -> tuple[list, int]:
+    """
+    Lee un fichero abierto en binario desde `start_pos` por bloques grandes y
+    devuelve ([(línea, patrón)], nueva_posición). Una última línea incompleta
+    no se consume: se leerá entera en la siguiente pasada.
+    """
+    hits = []
+    f.seek(start_pos)
+    pos = start_pos
+    pending = b""
+    while (block := f.read(block_size)):
+        data = pending + block
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            pending = data
+            continue
+        complete, pending = data[:cut + 1], data[cut + 1:]
+        hits.extend(matcher.scan(complete.decode("utf-8", errors="replace")))
+        pos += len(complete)
+    return hits, pos
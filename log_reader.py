@@ -0,0 +1,158 @@
+# log_reader.py
+# MODULO NUEVO: Lectura de las últimas líneas de un log sin lanzar `tail`.
+# Se lee el fichero hacia atrás por bloques desde el final, así que el coste no
+# depende del tamaño del log. Si el log vivo tiene menos líneas de las pedidas
+# se completan con las generaciones rotadas (`.1`, `.2.gz`, ...).
+
+import gzip
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+
+BLOCK_SIZE = 64 * 1024
+MAX_OPEN_HANDLES = 16
+MAX_ROTATED_GENERATIONS = 30
+
+
+class _HandleCache:
+    """
+    Descriptores abiertos de los logs consultados con más frecuencia, indexados
+    por (dispositivo, inodo). Tras una rotación el inodo antiguo pasa a ser `.1`
+    y su descriptor se sigue aprovechando. Las lecturas usan os.pread, así que
+    varios hilos pueden compartir un mismo descriptor sin moverle el offset.
+    """
+
+    def __init__(self, max_handles: int = MAX_OPEN_HANDLES):
+        self.max_handles = max_handles
+        self._fds: OrderedDict[tuple[int, int], int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, path: str) -> tuple[int, int]:
+        """Devuelve (descriptor, tamaño) del fichero que hay ahora mismo en `path`."""
+        stat_info = os.stat(path)
+        key = (stat_info.st_dev, stat_info.st_ino)
+        with self._lock:
+            fd = self._fds.get(key)
+            if fd is not None:
+                fd_stat = os.fstat(fd)
+                # Un fichero borrado puede liberar su inodo para otro nuevo.
+                if fd_stat.st_nlink > 0:
+                    self._fds.move_to_end(key)
+                    return fd, fd_stat.st_size
+                del self._fds[key]
+                os.close(fd)
+
+            fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+            fd_stat = os.fstat(fd)
+            key = (fd_stat.st_dev, fd_stat.st_ino)
+            if key in self._fds:
+                # Otro hilo lo ha abierto a la vez.
+                os.close(fd)
+                fd = self._fds[key]
+            else:
+                self._fds[key] = fd
+            while len(self._fds) > self.max_handles:
+                _, old_fd = self._fds.popitem(last=False)
+                os.close(old_fd)
+            return fd, fd_stat.st_size
+
+    def close_all(self) -> None:
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+
+
+_handles = _HandleCache()
+
+
+def rotated_generations(path: str) -> list[str]:
+    """
+    Devuelve las generaciones rotadas que existen de un log, de la más reciente
+    a la más antigua: `log.1`, `log.2.gz`, ... (esquema numérico de logrotate).
+    """
+    generations = []
+    for i in range(1, MAX_ROTATED_GENERATIONS + 1):
+        for candidate in (f"{path}.{i}", f"{path}.{i}.gz"):
+            if os.path.exists(candidate):
+                generations.append(candidate)
+                break
+        else:
+            break
+    return generations
+
+
+def _tail_plain(path: str, num_lines: int, max_bytes: int) -> tuple[list[bytes], bool]:
+    """
+    Lee hacia atrás desde el final hasta tener `num_lines` líneas o `max_bytes`.
+    Devuelve (líneas de la más antigua a la más reciente, se_recortó_por_tamaño).
+    """
+    fd, size = _handles.open(path)
+    end = size
+    # Un salto de línea final no abre una línea nueva.
+    if end and os.pread(fd, 1, end - 1) == b"\n":
+        end -= 1
+
+    buffer = b""
+    pos = end
+    while pos > 0 and buffer.count(b"\n") < num_lines and len(buffer) < max_bytes:
+        read_size = min(BLOCK_SIZE, pos)
+        pos -= read_size
+        buffer = os.pread(fd, read_size, pos) + buffer
+
+    if not buffer:
+        return [], False
+    lines = buffer.split(b"\n")
+    if pos > 0:
+        # La primera línea del buffer está cortada (empieza antes de `pos`).
+        lines = lines[1:]
+    lines, truncated = _trim_to_budget(lines[-num_lines:], max_bytes)
+    # Si se paró por tamaño antes de llegar a `num_lines`, faltan líneas anteriores.
+    return lines, truncated or (pos > 0 and len(lines) < num_lines)
+
+
+def _tail_gzip(path: str, num_lines: int, max_bytes: int) -> tuple[list[bytes], bool]:
+    """Un .gz no se puede leer hacia atrás: se descomprime en streaming conservando solo la cola."""
+    with gzip.open(path, "rb") as f:
+        lines = deque((line.rstrip(b"\n") for line in f), maxlen=num_lines)
+    return _trim_to_budget(list(lines), max_bytes)
+
+
+def _trim_to_budget(lines: list[bytes], max_bytes: int) -> tuple[list[bytes], bool]:
+    total = 0
+    for i in range(len(lines) - 1, -1, -1):
+        total += len(lines[i]) + 1
+        if total > max_bytes:
+            return lines[i + 1:], True
+    return lines, False
+
+
+def tail_lines(path: str, num_lines: int, max_bytes: int, include_rotated: bool = True) -> str:
+    """
+    Devuelve las últimas `num_lines` líneas del log sin superar `max_bytes`.
+    Si el log vivo se queda corto (por ejemplo, justo después de rotar), se
+    completa con las generaciones rotadas. Lanza OSError si no se puede leer.
+    """
+    lines, truncated = _tail_plain(path, num_lines, max_bytes)
+    if include_rotated and not truncated and len(lines) < num_lines:
+        budget = max_bytes - sum(len(line) + 1 for line in lines)
+        for generation in rotated_generations(path):
+            missing = num_lines - len(lines)
+            try:
+                if generation.endswith(".gz"):
+                    older, truncated = _tail_gzip(generation, missing, budget)
+                else:
+                    older, truncated = _tail_plain(generation, missing, budget)
+            except (OSError, EOFError) as e:
+                logging.warning(f"No se pudo leer la generación rotada '{generation}': {e}")
+                break
+            lines = older + lines
+            budget -= sum(len(line) + 1 for line in older)
+            if truncated or len(lines) >= num_lines:
+                break
+
+    text = b"\n".join(lines).decode("utf-8", errors="replace")
+    if truncated:
+        text = f"... (líneas anteriores omitidas por tamaño) ...\n{text}"
+    return text
@@ -0,0 +1,147 @@
+# log_search.py
+# MODULO NUEVO: Búsqueda en paralelo en todas las generaciones de un log
+# (`auth.log`, `auth.log.1`, `auth.log.2.gz`, ...). Cada generación se recorre en
+# un proceso del pool, descomprimiendo los .gz en streaming, y los resultados se
+# unen en orden de rotación (de la más reciente a la más antigua).
+
+import asyncio
+import gzip
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from log_matcher import get_matcher
+from log_reader import rotated_generations
+
+READ_BLOCK_SIZE = 1024 * 1024
+# Búsquedas simultáneas con aviso de parada. Cada una usa una casilla de un array
+# compartido con los trabajadores del pool: cuando el presupuesto de salida se
+# llena (o se cancela la tarea) se marca la casilla y los trabajadores que aún
+# están leyendo se detienen en el siguiente bloque.
+MAX_STOPPABLE_SEARCHES = 64
+
+_pool = None
+_pool_size = 0
+_stop_flags = None
+# Las casillas se reutilizan en rotación para que un trabajador rezagado de una
+# búsqueda ya terminada no vea su casilla desmarcada por la siguiente.
+_free_slots = deque(range(MAX_STOPPABLE_SEARCHES))
+
+
+def _init_worker(stop_flags) -> None:
+    global _stop_flags
+    _stop_flags = stop_flags
+
+
+def _get_pool(size: int) -> ProcessPoolExecutor:
+    global _pool, _pool_size, _stop_flags
+    if _pool is None or _pool_size != size:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        # forkserver: los trabajadores no heredan los hilos ni el bucle del bot.
+        context = multiprocessing.get_context("forkserver")
+        if _stop_flags is None:
+            _stop_flags = context.Array("b", MAX_STOPPABLE_SEARCHES, lock=False)
+        _pool = ProcessPoolExecutor(max_workers=size, mp_context=context,
+                                    initializer=_init_worker, initargs=(_stop_flags,))
+        _pool_size = size
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _matching_lines(f, matcher, slot: int):
+    """Líneas que coinciden, en orden del fichero. Se detiene si se marca la casilla `slot`."""
+    pending = b""
+    while (block := f.read(READ_BLOCK_SIZE)):
+        if slot >= 0 and _stop_flags[slot]:
+            return
+        data = pending + block
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            pending = data
+            continue
+        complete, pending = data[:cut + 1], data[cut + 1:]
+        for line, _pattern in matcher.scan(complete.decode("utf-8", errors="replace")):
+            yield line
+    if pending:
+        for line, _pattern in matcher.scan(pending.decode("utf-8", errors="replace")):
+            yield line
+
+
+def _search_file(path: str, pattern: str, max_bytes: int, slot: int = -1) -> tuple[str, int, bool]:
+    """
+    Se ejecuta en un proceso del pool. Devuelve (coincidencias, número, recortado).
+    Se guardan las primeras coincidencias en orden y se deja de leer en cuanto
+    llenan `max_bytes` o se pide parar. Los .gz se leen en streaming, sin
+    descomprimirlos a disco ni a memoria.
+    """
+    matcher = get_matcher((pattern,))
+    lines, size, truncated = [], 0, False
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        for line in _matching_lines(f, matcher, slot):
+            if size + len(line) + 1 > max_bytes:
+                truncated = True
+                break
+            lines.append(line)
+            size += len(line) + 1
+        else:
+            truncated = slot >= 0 and bool(_stop_flags[slot])
+    return "\n".join(lines), len(lines), truncated
+
+
+async def search_generations(log_path: str, pattern: str, max_bytes: int, max_workers: int = None) -> tuple[str, int, int]:
+    """
+    Busca `pattern` en el log y en sus generaciones rotadas en paralelo.
+    Devuelve (texto, coincidencias, generaciones_revisadas) con las primeras
+    coincidencias en orden de rotación. Cuando el texto llena `max_bytes`, o si
+    la tarea se cancela, se avisa a los trabajadores para que dejen de leer.
+    """
+    paths = [log_path] + rotated_generations(log_path)
+    pool = _get_pool(max_workers or os.cpu_count() or 1)
+    slot = _free_slots.popleft() if _free_slots else -1
+    if slot >= 0:
+        _stop_flags[slot] = 0
+    loop = asyncio.get_running_loop()
+    futures = [loop.run_in_executor(pool, _search_file, path, pattern, max_bytes, slot) for path in paths]
+
+    sections, total_matched, searched = [], 0, 0
+    budget = max_bytes
+    try:
+        for path, future in zip(paths, futures):
+            try:
+                text, matched, truncated = await future
+            except FileNotFoundError:
+                # La generación ha desaparecido por una rotación en curso.
+                continue
+            except (OSError, EOFError) as e:
+                logging.warning(f"No se pudo buscar en '{path}': {e}")
+                continue
+            searched += 1
+            if not matched:
+                continue
+            total_matched += matched
+            section = f"==> {os.path.basename(path)} ({matched}) <==\n{text}\n"
+            if len(section) > budget or truncated:
+                cut = section.rfind("\n", 0, budget)
+                sections.append(section[:cut + 1] if cut > 0 else "")
+                sections.append("... (presupuesto de salida lleno, se omiten el resto de coincidencias y las generaciones más antiguas) ...\n")
+                break
+            sections.append(section)
+            budget -= len(section)
+    finally:
+        if slot >= 0:
+            _stop_flags[slot] = 1
+            _free_slots.append(slot)
+        for future in futures:
+            future.cancel()
+
+    return "".join(sections).strip(), total_matched, searched
@@ -0,0 +1,269 @@
+# log_tailer.py
+# MODULO NUEVO: Seguimiento de logs vigilados guiado por eventos inotify de Linux.
+# Solo se despierta cuando un log se modifica, rota o se trunca. Los offsets se
+# mantienen en memoria y se guardan en disco periódicamente.
+
+import asyncio
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import struct
+
+from log_matcher import get_matcher, scan_file
+from system_utils import atomic_write_text
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+DEBOUNCE_SECONDS = 0.2
+
+
+class InotifyUnavailable(Exception):
+    """inotify no está disponible en este sistema."""
+
+
+class _Inotify:
+    """Envoltorio mínimo de inotify mediante ctypes (sin dependencias externas)."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise InotifyUnavailable("No se encontró la libc.")
+        try:
+            self._libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._libc.inotify_init1.argtypes = [ctypes.c_int]
+            self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        except (OSError, AttributeError) as e:
+            raise InotifyUnavailable(str(e))
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise InotifyUnavailable(os.strerror(ctypes.get_errno()))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()), path)
+        return wd
+
+    def read_events(self) -> list[tuple[int, int, str]]:
+        """Devuelve [(wd, mask, nombre)] con los eventos pendientes."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _WatchedLog:
+    def __init__(self, alias: str, path: str, patterns: tuple, last_pos: int, inode: int):
+        self.alias = alias
+        self.path = path
+        self.patterns = patterns
+        self.last_pos = last_pos
+        self.inode = inode
+        self.handle = None
+
+
+class LogTailer:
+    """
+    Vigila los directorios de los logs con inotify y, cuando cambia uno, lee
+    solo los bytes nuevos. Al rotar un log se termina de leer el inodo antiguo
+    (que sigue abierto) antes de pasar al fichero nuevo.
+    `on_hits(alias, [(línea, patrón)])` es una corrutina que recibe las coincidencias.
+    """
+
+    def __init__(self, watched: dict, state_file: str, on_hits):
+        # watched: {alias: (ruta, (patrones...))}
+        self.state_file = state_file
+        self.on_hits = on_hits
+        self._inotify = None
+        self._logs: dict[str, _WatchedLog] = {}
+        self._by_dir: dict[int, dict[str, list[str]]] = {}
+        self._pending: set[str] = set()
+        self._process_handle = None
+        self._process_task = None
+        self._processing = False
+        self._stopping = False
+        self._checkpointed: dict = {}
+
+        state = self._load_state()
+        for alias, (path, patterns) in watched.items():
+            saved = state.get(alias, {})
+            self._logs[alias] = _WatchedLog(alias, path, patterns, saved.get('last_pos', 0), saved.get('inode', 0))
+        self._checkpointed = state
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    # --- Arranque y parada ---
+
+    def start(self) -> None:
+        """Registra los watches y el lector en el bucle. Lanza InotifyUnavailable si no se puede."""
+        self._inotify = _Inotify()
+        dirs = {}
+        for log in self._logs.values():
+            directory, name = os.path.split(os.path.abspath(log.path))
+            dirs.setdefault(directory, {}).setdefault(name, []).append(log.alias)
+        for directory, names in dirs.items():
+            try:
+                wd = self._inotify.add_watch(directory, _WATCH_MASK)
+            except OSError as e:
+                logging.error(f"No se pudo vigilar el directorio '{directory}' con inotify: {e}")
+                continue
+            self._by_dir[wd] = names
+        asyncio.get_running_loop().add_reader(self._inotify.fd, self._on_readable)
+        # Primera pasada para recoger lo escrito mientras el bot estaba parado.
+        self._pending.update(self._logs)
+        self._schedule_processing()
+        logging.info(f"Seguimiento inotify de {len(self._logs)} logs en {len(self._by_dir)} directorios.")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._inotify is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        if self._process_handle is not None:
+            self._process_handle.cancel()
+            self._process_handle = None
+        if self._process_task is not None:
+            # No se cancela: su lectura en el hilo seguiría usando los ficheros que
+            # se cierran a continuación. Con _stopping termina tras el log en curso.
+            try:
+                await self._process_task
+            except Exception as e:
+                logging.error(f"Error en la última pasada del seguimiento de logs: {e}")
+            self._process_task = None
+        for log in self._logs.values():
+            if log.handle is not None:
+                log.handle.close()
+                log.handle = None
+        await self.checkpoint()
+
+    # --- Eventos ---
+
+    def _on_readable(self) -> None:
+        for wd, mask, name in self._inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Se han perdido eventos: se revisan todos los logs.
+                self._pending.update(self._logs)
+                continue
+            aliases = self._by_dir.get(wd, {}).get(name)
+            if aliases:
+                self._pending.update(aliases)
+        self._schedule_processing()
+
+    def _schedule_processing(self) -> None:
+        # Pequeña espera para agrupar ráfagas de escrituras en una sola lectura.
+        if self._pending and self._process_handle is None and not self._processing and not self._stopping:
+            loop = asyncio.get_running_loop()
+            self._process_handle = loop.call_later(DEBOUNCE_SECONDS, self._start_processing)
+
+    def _start_processing(self) -> None:
+        self._process_handle = None
+        self._process_task = asyncio.ensure_future(self._process())
+
+    async def _process(self) -> None:
+        self._processing = True
+        try:
+            while self._pending and not self._stopping:
+                aliases, self._pending = self._pending, set()
+                for alias in aliases:
+                    if self._stopping:
+                        # Lo que falte se recoge en la primera pasada del próximo arranque.
+                        break
+                    try:
+                        hits = await asyncio.to_thread(self._read_new, self._logs[alias])
+                    except Exception as e:
+                        logging.error(f"Error al procesar el log {alias}: {e}")
+                        continue
+                    if hits:
+                        await self.on_hits(alias, hits)
+        finally:
+            self._processing = False
+        self._schedule_processing()
+
+    # --- Lectura (en un hilo) ---
+
+    def _read_new(self, log: _WatchedLog) -> list:
+        matcher = get_matcher(log.patterns)
+        hits = []
+        try:
+            stat_info = os.stat(log.path)
+        except FileNotFoundError:
+            stat_info = None
+
+        if log.handle is not None and (stat_info is None or stat_info.st_ino != log.inode):
+            # Rotación: se termina de leer el inodo antiguo antes de cambiar.
+            old_hits, log.last_pos = scan_file(log.handle, log.last_pos, matcher)
+            hits.extend(old_hits)
+            log.handle.close()
+            log.handle = None
+            log.last_pos = 0
+
+        if stat_info is None:
+            return hits
+
+        if log.handle is None:
+            log.handle = open(log.path, 'rb')
+            if os.fstat(log.handle.fileno()).st_ino != log.inode:
+                log.last_pos = 0
+            log.inode = os.fstat(log.handle.fileno()).st_ino
+
+        if os.fstat(log.handle.fileno()).st_size < log.last_pos or not self._ends_line_at(log.handle, log.last_pos):
+            # Truncado (copytruncate), aunque ya se haya vuelto a escribir más de
+            # lo que había: solo se consumen líneas completas, así que el byte
+            # anterior al offset siempre debería ser un salto de línea.
+            log.last_pos = 0
+
+        new_hits, log.last_pos = scan_file(log.handle, log.last_pos, matcher)
+        hits.extend(new_hits)
+        return hits
+
+    @staticmethod
+    def _ends_line_at(handle, pos: int) -> bool:
+        if pos == 0:
+            return True
+        handle.seek(pos - 1)
+        return handle.read(1) == b"\n"
+
+    # --- Checkpoint de offsets ---
+
+    async def checkpoint(self) -> None:
+        """Guarda los offsets en disco si han cambiado desde el último checkpoint."""
+        state = {alias: {'last_pos': log.last_pos, 'inode': log.inode} for alias, log in self._logs.items()}
+        if state == self._checkpointed:
+            return
+        try:
+            await asyncio.to_thread(atomic_write_text, self.state_file, json.dumps(state, indent=2))
+            self._checkpointed = state
+        except Exception as e:
+            logging.error(f"CRITICAL: No se pudo guardar el estado de monitorización de logs: {e}")
@@ -0,0 +1,92 @@
+# metrics.py
+# MODULO NUEVO: Muestreador de métricas del sistema en segundo plano.
+# Una sola tarea lee CPU (total y por núcleo), carga, RAM, swap y disco cada
+# pocos segundos y deja el resultado en una instantánea compartida. Los
+# comandos y las alertas leen esa instantánea al instante en vez de llamar a
+# psutil.cpu_percent(interval=1), que bloquea un segundo entero.
+
+import asyncio
+import logging
+import time
+
+import psutil
+
+DEFAULT_SAMPLE_INTERVAL = 5
+DEFAULT_DISK_PATH = '/'
+
+
+class MetricsSampler:
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL, disk_path: str = DEFAULT_DISK_PATH):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.latest = None
+        self.listeners = []
+        self._task = None
+        # La primera llamada con interval=None solo fija el punto de partida.
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+
+    def sample(self) -> dict:
+        """Toma una muestra sin bloquear: el % de CPU es la media desde la muestra anterior."""
+        snapshot = {
+            'timestamp': time.time(),
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'cpu_per_core': psutil.cpu_percent(interval=None, percpu=True),
+            'load_avg': psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None,
+            'ram': psutil.virtual_memory(),
+            'swap': psutil.swap_memory(),
+            'disk': psutil.disk_usage(self.disk_path),
+        }
+        # Se reemplaza la referencia entera: los lectores nunca ven una muestra a medias.
+        self.latest = snapshot
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logging.error(f"Error en un consumidor de métricas: {e}")
+        return snapshot
+
+    def get_snapshot(self) -> dict:
+        """Devuelve la última muestra, o toma una en el momento si aún no hay ninguna."""
+        return self.latest or self.sample()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception as e:
+                logging.error(f"Error al muestrear métricas del sistema: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logging.info(f"Muestreador de métricas activo cada {self.interval} segundos.")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_sampler = None
+
+
+def get_sampler() -> MetricsSampler:
+    global _sampler
+    if _sampler is None:
+        from state import CONFIG
+        metrics_config = CONFIG.get("metrics", {})
+        _sampler = MetricsSampler(
+            float(metrics_config.get("sample_interval_seconds", DEFAULT_SAMPLE_INTERVAL)),
+            metrics_config.get("disk_path", DEFAULT_DISK_PATH),
+        )
+    return _sampler
+
+
+def get_snapshot() -> dict:
+    return get_sampler().get_snapshot()
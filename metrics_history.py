@@ -0,0 +1,214 @@
+# metrics_history.py
+# MODULO NUEVO: Histórico compacto de las métricas del sistema en memoria.
+# Cada nivel de resolución es un anillo de tamaño fijo sobre arrays preasignados
+# (10 s durante 1 h, 1 min durante 24 h, 15 min durante 30 días). Cada muestra se
+# agrega (mín/media/máx) en la ranura que le toca de cada nivel, así que la
+# memoria usada es la misma lleve el bot una hora o un año en marcha.
+
+import base64
+import json
+import logging
+import re
+import time
+from array import array
+
+from system_utils import atomic_write_text
+
+# (resolución en segundos, número de ranuras)
+DEFAULT_TIERS = ((10, 360), (60, 1440), (900, 2880))
+
+# Métricas guardadas: nombre -> (extractor sobre la instantánea de metrics.py, unidad)
+METRICS = {
+    'cpu': (lambda s: s['cpu_percent'], '%'),
+    'load': (lambda s: s['load_avg'][0] if s['load_avg'] else 0.0, ''),
+    'ram': (lambda s: s['ram'].percent, '%'),
+    'swap': (lambda s: s['swap'].percent, '%'),
+    'disk': (lambda s: s['disk'].percent, '%'),
+}
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+SPARK_WIDTH = 48
+_WINDOW_RE = re.compile(r"^(\d+)([smhd])$")
+_WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class _Tier:
+    """Anillo de `slots` ranuras de `resolution` segundos con mín/máx/suma por métrica."""
+
+    def __init__(self, resolution: int, slots: int, metrics: list):
+        self.resolution = resolution
+        self.slots = slots
+        # Número de intervalo (epoch // resolución) que ocupa cada ranura; 0 = vacía.
+        self.buckets = array('I', bytes(4 * slots))
+        self.counts = array('H', bytes(2 * slots))
+        self.mins = {m: array('f', bytes(4 * slots)) for m in metrics}
+        self.maxs = {m: array('f', bytes(4 * slots)) for m in metrics}
+        self.sums = {m: array('f', bytes(4 * slots)) for m in metrics}
+
+    def record(self, ts: float, values: dict) -> None:
+        bucket = int(ts // self.resolution)
+        i = bucket % self.slots
+        if self.buckets[i] != bucket:
+            # La ranura contiene un intervalo antiguo: se reutiliza.
+            self.buckets[i] = bucket
+            self.counts[i] = 1
+            for m, v in values.items():
+                self.mins[m][i] = self.maxs[m][i] = self.sums[m][i] = v
+            return
+        if self.counts[i] < 0xFFFF:
+            self.counts[i] += 1
+        for m, v in values.items():
+            if v < self.mins[m][i]:
+                self.mins[m][i] = v
+            if v > self.maxs[m][i]:
+                self.maxs[m][i] = v
+            self.sums[m][i] += v
+
+    def series(self, metric: str, start_ts: float, end_ts: float) -> list:
+        """Lista de (mín, media, máx) o None por cada intervalo entre las dos marcas."""
+        points = []
+        for bucket in range(int(start_ts // self.resolution) + 1, int(end_ts // self.resolution) + 1):
+            i = bucket % self.slots
+            if self.buckets[i] == bucket and self.counts[i]:
+                points.append((self.mins[metric][i], self.sums[metric][i] / self.counts[i], self.maxs[metric][i]))
+            else:
+                points.append(None)
+        return points
+
+    def to_dict(self) -> dict:
+        encode = lambda a: base64.b64encode(a.tobytes()).decode()
+        return {
+            'resolution': self.resolution,
+            'slots': self.slots,
+            'buckets': encode(self.buckets),
+            'counts': encode(self.counts),
+            'mins': {m: encode(a) for m, a in self.mins.items()},
+            'maxs': {m: encode(a) for m, a in self.maxs.items()},
+            'sums': {m: encode(a) for m, a in self.sums.items()},
+        }
+
+    def load(self, data: dict) -> None:
+        if data.get('resolution') != self.resolution or data.get('slots') != self.slots:
+            return
+
+        def decode(target: array, encoded: str) -> None:
+            raw = base64.b64decode(encoded)
+            if len(raw) == len(target) * target.itemsize:
+                target[:] = array(target.typecode, raw)
+
+        decode(self.buckets, data['buckets'])
+        decode(self.counts, data['counts'])
+        for name in ('mins', 'maxs', 'sums'):
+            for m, encoded in data.get(name, {}).items():
+                if m in getattr(self, name):
+                    decode(getattr(self, name)[m], encoded)
+
+
+class MetricsHistory:
+    def __init__(self, tiers=DEFAULT_TIERS, state_file: str = None):
+        self.state_file = state_file
+        self.tiers = [_Tier(resolution, slots, list(METRICS)) for resolution, slots in tiers]
+        self._dirty = False
+        if state_file:
+            self._load()
+
+    def record(self, snapshot: dict) -> None:
+        """Añade una muestra de metrics.py a todos los niveles."""
+        try:
+            values = {m: float(extract(snapshot)) for m, (extract, _unit) in METRICS.items()}
+        except (KeyError, TypeError, AttributeError) as e:
+            logging.warning(f"Muestra de métricas incompleta, no se guarda en el histórico: {e}")
+            return
+        for tier in self.tiers:
+            tier.record(snapshot['timestamp'], values)
+        self._dirty = True
+
+    def series(self, metric: str, window: int, now: float = None) -> tuple[int, list]:
+        """Devuelve (resolución, puntos) del nivel más fino que cubre `window` segundos."""
+        now = now or time.time()
+        tier = next((t for t in self.tiers if t.resolution * t.slots >= window), self.tiers[-1])
+        window = min(window, tier.resolution * tier.slots)
+        return tier.resolution, tier.series(metric, now - window, now)
+
+    def memory_bytes(self) -> int:
+        total = 0
+        for tier in self.tiers:
+            arrays = [tier.buckets, tier.counts, *tier.mins.values(), *tier.maxs.values(), *tier.sums.values()]
+            total += sum(len(a) * a.itemsize for a in arrays)
+        return total
+
+    # --- Instantánea en disco ---
+
+    def _load(self) -> None:
+        try:
+            with open(self.state_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        except Exception as e:
+            logging.error(f"No se pudo cargar el histórico de métricas: {e}")
+            return
+        for tier, tier_data in zip(self.tiers, data.get('tiers', [])):
+            try:
+                tier.load(tier_data)
+            except (KeyError, ValueError) as e:
+                logging.warning(f"Nivel del histórico de métricas ignorado al cargar: {e}")
+
+    def save(self) -> None:
+        """Guarda los anillos en disco (en un hilo) si hay muestras nuevas."""
+        if not self.state_file or not self._dirty:
+            return
+        self._dirty = False
+        try:
+            atomic_write_text(self.state_file, json.dumps({'tiers': [t.to_dict() for t in self.tiers]}))
+        except Exception as e:
+            self._dirty = True
+            logging.error(f"No se pudo guardar el histórico de métricas: {e}")
+
+
+def parse_window(text: str):
+    """'30m', '6h', '7d'... -> segundos, o None si no es válido."""
+    m = _WINDOW_RE.match(text.strip().lower())
+    if not m:
+        return None
+    return int(m.group(1)) * _WINDOW_UNITS[m.group(2)]
+
+
+def sparkline(points: list, width: int = SPARK_WIDTH, low: float = None, high: float = None) -> str:
+    """
+    Dibuja las medias como una línea de bloques. Si hay más puntos que `width`
+    se agrupan; los huecos sin datos se dibujan con un espacio.
+    """
+    if len(points) > width:
+        group = -(-len(points) // width)
+        grouped = []
+        for i in range(0, len(points), group):
+            chunk = [p for p in points[i:i + group] if p is not None]
+            grouped.append((min(p[0] for p in chunk), sum(p[1] for p in chunk) / len(chunk), max(p[2] for p in chunk)) if chunk else None)
+        points = grouped
+
+    values = [p[1] for p in points if p is not None]
+    if not values:
+        return ""
+    low = min(values) if low is None else low
+    high = max(values) if high is None else high
+    span = (high - low) or 1.0
+    chars = []
+    for p in points:
+        if p is None:
+            chars.append(" ")
+            continue
+        level = int((p[1] - low) / span * (len(SPARK_CHARS) - 1) + 0.5)
+        chars.append(SPARK_CHARS[max(0, min(level, len(SPARK_CHARS) - 1))])
+    return "".join(chars)
+
+
+_history = None
+
+
+def get_history() -> MetricsHistory:
+    global _history
+    if _history is None:
+        from state import METRICS_HISTORY_FILE
+        _history = MetricsHistory(state_file=METRICS_HISTORY_FILE)
+    return _history
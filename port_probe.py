@@ -0,0 +1,99 @@
+# port_probe.py
+# MODULO NUEVO: Comprobación de puertos TCP con asyncio.
+# Todas las parejas (host, puerto) se prueban a la vez (con un límite de
+# conexiones simultáneas), así que comprobar 40 hosts × 5 puertos tarda lo
+# mismo que un solo timeout y no 200. Cada host se resuelve una sola vez y de
+# cada conexión correcta se guarda el RTT del connect.
+
+import asyncio
+import socket
+import time
+
+DEFAULT_TIMEOUT_SECONDS = 3
+DEFAULT_MAX_CONCURRENCY = 200
+DEFAULT_MAX_PORTS_PER_COMMAND = 100
+
+OPEN, CLOSED, TIMEOUT, ERROR = "open", "closed", "timeout", "error"
+
+
+async def _resolve(host: str, timeout: float):
+    """Primera dirección TCP del host, o la excepción si no se puede resolver."""
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), timeout)
+    except asyncio.TimeoutError:
+        return TimeoutError("DNS timeout")
+    except OSError as e:
+        return e
+    return infos[0][4][0]
+
+
+async def _probe(address: str, port: int, timeout: float) -> tuple[str, float, str]:
+    start = time.monotonic()
+    try:
+        _reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+    except asyncio.TimeoutError:
+        return TIMEOUT, None, ""
+    except ConnectionRefusedError:
+        return CLOSED, None, ""
+    except OSError as e:
+        return ERROR, None, e.strerror or str(e)
+    rtt_ms = (time.monotonic() - start) * 1000
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return OPEN, rtt_ms, ""
+
+
+async def probe_many(pairs: list[tuple[str, int]], timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                     max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> dict:
+    """
+    Prueba todas las parejas (host, puerto) a la vez y devuelve
+    {(host, puerto): (estado, rtt_ms, detalle)} con estado open/closed/timeout/error
+    y rtt_ms solo para los puertos abiertos.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    hosts = list(dict.fromkeys(host for host, _port in pairs))
+    addresses = dict(zip(hosts, await asyncio.gather(*(_resolve(h, timeout) for h in hosts))))
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def probe_one(host, port):
+        address = addresses[host]
+        if isinstance(address, Exception):
+            return ERROR, None, str(address)
+        async with semaphore:
+            return await _probe(address, port, timeout)
+
+    results = await asyncio.gather(*(probe_one(h, p) for h, p in pairs))
+    return dict(zip(pairs, results))
+
+
+def parse_ports(args: list[str], limit: int = DEFAULT_MAX_PORTS_PER_COMMAND):
+    """
+    Convierte ['22', '80', '8000-8010'] en una lista de puertos. Devuelve None si
+    algún valor no es válido o si se pasan más de `limit` puertos.
+    """
+    ports = []
+    for arg in args:
+        for part in arg.split(","):
+            low, sep, high = part.partition("-")
+            if not low.isdigit() or (sep and not high.isdigit()):
+                return None
+            low, high = int(low), int(high or low)
+            if not 1 <= low <= high <= 65535 or len(ports) + high - low + 1 > limit:
+                return None
+            ports.extend(range(low, high + 1))
+    return list(dict.fromkeys(ports)) or None
+
+
+def get_probe_settings() -> tuple[float, int, int]:
+    """(timeout, conexiones simultáneas, puertos máximos por /portcheck) desde `port_probe`."""
+    from state import CONFIG
+    probe_config = CONFIG.get("port_probe", {})
+    return (
+        float(probe_config.get("timeout_seconds", DEFAULT_TIMEOUT_SECONDS)),
+        int(probe_config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)),
+        int(probe_config.get("max_ports_per_command", DEFAULT_MAX_PORTS_PER_COMMAND)),
+    )
@@ -0,0 +1,172 @@
+# result_store.py
+# MODULO NUEVO: Resultados largos paginados.
+# En lugar de cortar la salida de un comando a 4000 caracteres, se parte en páginas
+# del tamaño de un mensaje de Telegram (por líneas y cerrando/reabriendo los
+# bloques ``` que queden partidos) y se guarda una sola vez. Los botones ◀️/▶️
+# pasan de página leyendo de aquí, sin volver a ejecutar el comando. Las entradas
+# viven en memoria (LRU con un límite de bytes) y, al salir de ella, en disco.
+# Las escrituras y lecturas en disco se hacen en un hilo, fuera del bucle de eventos.
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+from collections import OrderedDict
+
+from system_utils import atomic_write_text
+
+# Margen sobre los 4096 caracteres de Telegram para la cabecera y los emojis.
+PAGE_SIZE = 3500
+FENCE = "```"
+DEFAULT_MAX_MEMORY_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_SPILLED = 200
+
+
+def split_pages(text: str, limit: int = PAGE_SIZE) -> list[str]:
+    """
+    Parte `text` en páginas de como mucho `limit` caracteres, siempre entre líneas.
+    Si un corte cae dentro de un bloque de código, se cierra al final de la página
+    y se vuelve a abrir (con el mismo lenguaje) al principio de la siguiente, así
+    cada página es Markdown válido por sí misma.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    # Reserva para el cierre y la reapertura del bloque en los cortes.
+    piece_size = limit - 2 * (len(FENCE) + 1) - 32
+    pages, current, size = [], [], 0
+    fence = None  # Línea de apertura del bloque abierto (p. ej. "```bash"), o None.
+    for line in text.split("\n"):
+        pieces = [line[i:i + piece_size] for i in range(0, len(line), piece_size)] or [""]
+        for piece in pieces:
+            closing = len(FENCE) + 1 if fence else 0
+            if current and size + len(piece) + 1 + closing > limit:
+                if fence:
+                    current.append(FENCE)
+                pages.append("\n".join(current))
+                current = [fence] if fence else []
+                size = len(fence) + 1 if fence else 0
+            current.append(piece)
+            size += len(piece) + 1
+        if line.strip().startswith(FENCE):
+            fence = None if fence else line.strip()
+    if current:
+        pages.append("\n".join(current))
+    return pages
+
+
+class ResultStore:
+    def __init__(self, spill_dir: str, max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+                 max_spilled: int = DEFAULT_MAX_SPILLED):
+        self.spill_dir = spill_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_spilled = max_spilled
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+        self._memory_bytes = 0
+        # Entradas que han salido de memoria pero aún se están escribiendo en disco.
+        self._spilling: dict[str, dict] = {}
+        os.makedirs(spill_dir, exist_ok=True)
+
+    async def put(self, pages: list[str], parse_mode: str = None, markup: dict = None) -> str:
+        """
+        Guarda un resultado ya paginado y devuelve su clave (corta, para que quepa
+        en el callback_data). `markup` es el teclado original en forma de dict, que
+        se añade debajo de los botones de página.
+        """
+        key = secrets.token_urlsafe(6)
+        await self._remember(key, {"pages": pages, "parse_mode": parse_mode, "markup": markup})
+        return key
+
+    async def get(self, key: str):
+        """Devuelve la entrada {'pages', 'parse_mode', 'markup'} o None si ya no existe."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        entry = self._spilling.get(key)
+        if entry is not None:
+            # Se está escribiendo en disco: se sirve tal cual y se deja salir.
+            return entry
+        entry = await asyncio.to_thread(self._load_spilled, key)
+        if entry is not None and key not in self._memory:
+            await self._remember(key, entry)
+        return entry
+
+    @staticmethod
+    def _entry_size(entry: dict) -> int:
+        return sum(len(page) for page in entry["pages"])
+
+    async def _remember(self, key: str, entry: dict) -> None:
+        self._memory[key] = entry
+        self._memory_bytes += self._entry_size(entry)
+        # Siempre se queda al menos la entrada recién usada.
+        evicted = []
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            old_key, old_entry = self._memory.popitem(last=False)
+            self._memory_bytes -= self._entry_size(old_entry)
+            self._spilling[old_key] = old_entry
+            evicted.append((old_key, old_entry))
+        if evicted:
+            try:
+                await asyncio.to_thread(self._spill_many, evicted)
+            finally:
+                for old_key, old_entry in evicted:
+                    if self._spilling.get(old_key) is old_entry:
+                        del self._spilling[old_key]
+
+    # --- Disco ---
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.json")
+
+    def _spill_many(self, entries: list[tuple[str, dict]]) -> None:
+        for key, entry in entries:
+            try:
+                atomic_write_text(self._spill_path(key), json.dumps(entry))
+            except OSError as e:
+                logging.error(f"No se pudo guardar en disco el resultado '{key}': {e}")
+        self._prune_spilled()
+
+    def _load_spilled(self, key: str):
+        # La clave viene de un callback: solo se aceptan claves generadas aquí.
+        if not key.replace("-", "").replace("_", "").isalnum():
+            return None
+        try:
+            with open(self._spill_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"No se pudo leer el resultado guardado '{key}': {e}")
+            return None
+
+    def _prune_spilled(self) -> None:
+        try:
+            entries = [e for e in os.scandir(self.spill_dir) if e.name.endswith(".json")]
+        except OSError:
+            return
+        if len(entries) <= self.max_spilled:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_spilled]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+_store = None
+
+
+def get_result_store() -> ResultStore:
+    global _store
+    if _store is None:
+        from state import CONFIG, RESULT_SPILL_DIR
+        store_config = CONFIG.get("result_store", {})
+        _store = ResultStore(
+            os.path.expanduser(store_config.get("spill_dir", RESULT_SPILL_DIR)),
+            int(store_config.get("max_memory_bytes", DEFAULT_MAX_MEMORY_BYTES)),
+            int(store_config.get("max_spilled", DEFAULT_MAX_SPILLED)),
+        )
+    return _store
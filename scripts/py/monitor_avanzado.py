@@ -1,5 +1,7 @@
+import asyncio
 import json
 import socket
+import time
 import subprocess
 import platform
 import requests
@@ -24,6 +26,10 @@ logging.getLogger('').addHandler(console)
 # --- RUTAS DE ARCHIVOS ---
 CONFIG_FILE = 'config.json'
 STATUS_FILE = 'status.json'
+# Caché de certificados del bot: la misma ruta por defecto que SSL_CACHE_FILE en
+# state.py (raíz del bot, dos niveles por encima de scripts/py/).
+BOT_SSL_CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                  'ssl_cert_cache.json')
 
 # --- FUNCIONES DE UTILIDAD ---
 def cargar_configuracion():
@@ -85,8 +91,8 @@ def formatear_y_enviar_reporte(reporte_data, config_telegram):
 
 # --- MÓDULOS DE VERIFICACIÓN (SIN CAMBIOS) ---
 def check_ping(host):
-    param = '-n 1' if platform.system().lower() == 'windows' else '-c 1'
-    command = ['ping', param, host]
+    param = ['-n', '1'] if platform.system().lower() == 'windows' else ['-c', '1']
+    command = ['ping', *param, host]
     try:
         result = subprocess.run(command, capture_output=True, text=True, timeout=5)
         if result.returncode == 0:
@@ -95,12 +101,51 @@ def check_ping(host):
     except subprocess.TimeoutExpired:
         return "FALLO", f"❌ Ping: **Timeout**"
 
-def check_port(host, port_name, port_num):
+async def _probar_puerto(host, port_num, timeout):
+    inicio = time.monotonic()
     try:
-        with socket.create_connection((host, port_num), timeout=3):
-            return "OK", f"✅ Puerto {port_name} ({port_num}): **Abierto**"
-    except (socket.timeout, ConnectionRefusedError, OSError):
-        return "FALLO", f"❌ Puerto {port_name} ({port_num}): **Cerrado**"
+        _reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port_num), timeout)
+    except (asyncio.TimeoutError, OSError):
+        return None
+    writer.close()
+    return (time.monotonic() - inicio) * 1000
+
+async def _probar_todos(pares, timeout, max_concurrencia):
+    semaforo = asyncio.Semaphore(max_concurrencia)
+
+    async def probar(host, port_num):
+        async with semaforo:
+            return await _probar_puerto(host, port_num, timeout)
+
+    resultados = await asyncio.gather(*(probar(h, p) for h, p in pares))
+    return dict(zip(pares, resultados))
+
+def probar_puertos(config):
+    """
+    Prueba a la vez todos los puertos de todos los servidores y devuelve
+    {(host, puerto): rtt_ms o None si está cerrado}. Antes se probaban uno detrás
+    de otro, sumando un timeout por cada puerto caído.
+    """
+    pares = []
+    for servidor in config.get("servidores", []):
+        host = servidor.get("host")
+        for num_puerto in (servidor.get("chequeos", {}).get("puertos") or {}).values():
+            if host and (host, num_puerto) not in pares:
+                pares.append((host, num_puerto))
+    if not pares:
+        return {}
+    config_sondeo = config.get("port_probe", {})
+    return asyncio.run(_probar_todos(
+        pares,
+        float(config_sondeo.get("timeout_seconds", 3)),
+        int(config_sondeo.get("max_concurrency", 200)),
+    ))
+
+def check_port(host, port_name, port_num, resultados_puertos):
+    rtt_ms = resultados_puertos.get((host, port_num))
+    if rtt_ms is not None:
+        return "OK", f"✅ Puerto {port_name} ({port_num}): **Abierto** ({rtt_ms:.0f} ms)"
+    return "FALLO", f"❌ Puerto {port_name} ({port_num}): **Cerrado**"
 
 def check_disk_usage(path, threshold):
     try:
@@ -111,7 +156,32 @@ def check_disk_usage(path, threshold):
     except (FileNotFoundError, psutil.Error):
         return "FALLO", f"❌ Disco '{path}': **Error al verificar**"
 
-def check_ssl_expiry(host, port, days_warning):
+def leer_cache_ssl(host, port, config_cache):
+    """
+    Fecha de caducidad (epoch) desde la caché de certificados del bot (`ssl_cache.file`,
+    o la ruta por defecto del bot) si el dato es reciente. Evita repetir el handshake.
+    """
+    config_cache = config_cache or {}
+    try:
+        with open(config_cache.get("file", BOT_SSL_CACHE_FILE), 'r') as f:
+            entrada = json.load(f).get(f"{host}:{port}")
+    except (IOError, json.JSONDecodeError):
+        return None
+    if not entrada or entrada.get("error") or entrada.get("not_after") is None:
+        return None
+    max_age = config_cache.get("max_age_hours", 24) * 3600
+    if datetime.datetime.now().timestamp() - entrada.get("checked", 0) > max_age:
+        return None
+    return entrada["not_after"]
+
+def check_ssl_expiry(host, port, days_warning, config_cache=None):
+    not_after = leer_cache_ssl(host, port, config_cache)
+    if not_after is not None:
+        days_left = int((not_after - datetime.datetime.now().timestamp()) // 86400)
+        if days_left > days_warning:
+            return "OK", f"✅ Cert. SSL: Expira en **{days_left} días**"
+        return "FALLO", f"🔥 Cert. SSL: Expira en **{days_left} días** (Aviso a los {days_warning})"
+
     context = ssl.create_default_context()
     try:
         with socket.create_connection((host, port), timeout=5) as sock:
@@ -133,6 +203,7 @@ def main():
     estado_anterior = cargar_estado_anterior()
     estado_actual = {}
     reporte_data_completo = {}
+    resultados_puertos = probar_puertos(config)
 
     for servidor in config.get("servidores", []):
         nombre_servidor = servidor.get("nombre", "Servidor sin nombre")
@@ -153,7 +224,7 @@ def main():
             elif tipo_chequeo == "puertos":
                 for nombre_puerto, num_puerto in params.items():
                     check_id = f"{nombre_servidor}_port_{num_puerto}"
-                    status, message = check_port(host, nombre_puerto, num_puerto)
+                    status, message = check_port(host, nombre_puerto, num_puerto, resultados_puertos)
                     estado_actual[check_id] = status
                     reporte_data_completo[nombre_servidor].append(message)
             
@@ -166,7 +237,7 @@ def main():
 
             elif tipo_chequeo == "certificado_ssl":
                 check_id = f"{nombre_servidor}_ssl_{host}"
-                status, message = check_ssl_expiry(host, params.get("puerto", 443), params.get("dias_aviso", 30))
+                status, message = check_ssl_expiry(host, params.get("puerto", 443), params.get("dias_aviso", 30), config.get("ssl_cache"))
                 estado_actual[check_id] = status
                 reporte_data_completo[nombre_servidor].append(message)
 
@@ -0,0 +1,139 @@
+# ssl_cache.py
+# MODULO NUEVO: Caché persistente de certificados SSL por host:puerto.
+# La fecha de caducidad de un certificado cambia pocas veces al año, así que el
+# reporte de estado ya no hace un handshake TLS por servidor: lee notAfter, emisor
+# y SAN de esta caché, que se refresca en segundo plano cada pocas horas (o al
+# momento si se fuerza el reporte). El fichero es JSON plano para que otros
+# scripts (monitor_avanzado.py) puedan leerlo también.
+
+import asyncio
+import json
+import logging
+import socket
+import ssl
+import threading
+import time
+
+from system_utils import atomic_write_text
+
+DEFAULT_MAX_AGE_HOURS = 24
+DEFAULT_RETRY_MINUTES = 15
+DEFAULT_HANDSHAKE_TIMEOUT = 5
+DEFAULT_MAX_CONCURRENCY = 20
+
+
+def fetch_cert_info(host: str, port: int, timeout: float = DEFAULT_HANDSHAKE_TIMEOUT) -> dict:
+    """Handshake TLS (validando la cadena) y extracción de caducidad, emisor y SAN."""
+    context = ssl.create_default_context()
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        with context.wrap_socket(sock, server_hostname=host) as ssock:
+            cert = ssock.getpeercert()
+    issuer = dict(item for rdn in cert.get("issuer", ()) for item in rdn)
+    return {
+        "not_after": ssl.cert_time_to_seconds(cert["notAfter"]),
+        "issuer": issuer.get("organizationName") or issuer.get("commonName", ""),
+        "san": [value for kind, value in cert.get("subjectAltName", ()) if kind == "DNS"],
+        "checked": time.time(),
+        "error": None,
+    }
+
+
+class SSLCertCache:
+    def __init__(self, state_file: str, max_age_hours: float = DEFAULT_MAX_AGE_HOURS,
+                 retry_minutes: float = DEFAULT_RETRY_MINUTES, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.state_file = state_file
+        self.max_age = max_age_hours * 3600
+        self.retry = retry_minutes * 60
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = self._load()
+
+    @staticmethod
+    def key(host: str, port: int) -> str:
+        return f"{host}:{port}"
+
+    def _load(self) -> dict:
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"No se pudo leer la caché de certificados '{self.state_file}': {e}")
+            return {}
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self._entries, indent=2)
+        atomic_write_text(self.state_file, data)
+
+    def get(self, host: str, port: int):
+        """Última información conocida del certificado, o None si nunca se ha consultado."""
+        return self._entries.get(self.key(host, port))
+
+    def is_stale(self, host: str, port: int, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        entry = self.get(host, port)
+        if entry is None:
+            return True
+        # Los fallos se reintentan antes que los certificados correctos.
+        max_age = self.retry if entry.get("error") else self.max_age
+        return now - entry.get("checked", 0) >= max_age
+
+    def _fetch(self, host: str, port: int) -> None:
+        try:
+            entry = fetch_cert_info(host, port)
+        except Exception as e:
+            logging.warning(f"Error SSL para {host}:{port}: {e}")
+            previous = self.get(host, port) or {}
+            # Se conserva la última fecha buena para poder seguir avisando de la caducidad.
+            entry = dict(previous, checked=time.time(), error=str(e)[:200])
+        with self._lock:
+            self._entries[self.key(host, port)] = entry
+
+    async def refresh(self, endpoints: list[tuple[str, int]], force: bool = False) -> int:
+        """
+        Vuelve a consultar los certificados caducados en la caché (todos si `force`),
+        varios a la vez, y guarda el fichero. Devuelve cuántos se han consultado.
+        """
+        pending = sorted({(h, p) for h, p in endpoints if force or self.is_stale(h, p)})
+        if not pending:
+            return 0
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch_one(host, port):
+            async with semaphore:
+                await asyncio.to_thread(self._fetch, host, port)
+
+        await asyncio.gather(*(fetch_one(h, p) for h, p in pending))
+        await asyncio.to_thread(self.save)
+        logging.info(f"Caché de certificados SSL: {len(pending)} certificados consultados.")
+        return len(pending)
+
+
+def configured_endpoints() -> list[tuple[str, int]]:
+    """(host, puerto) de todos los servidores con chequeo `certificado_ssl`."""
+    from state import CONFIG
+    endpoints = []
+    for servidor in CONFIG.get("servidores", []):
+        params = servidor.get("chequeos", {}).get("certificado_ssl")
+        if servidor.get("host") and params is not None:
+            endpoints.append((servidor["host"], (params or {}).get("puerto", 443)))
+    return endpoints
+
+
+_cache = None
+
+
+def get_ssl_cache() -> SSLCertCache:
+    global _cache
+    if _cache is None:
+        from state import CONFIG, SSL_CACHE_FILE
+        cache_config = CONFIG.get("ssl_cache", {})
+        _cache = SSLCertCache(
+            cache_config.get("file", SSL_CACHE_FILE),
+            float(cache_config.get("max_age_hours", DEFAULT_MAX_AGE_HOURS)),
+            float(cache_config.get("retry_minutes", DEFAULT_RETRY_MINUTES)),
+            int(CONFIG.get("status_report", {}).get("max_concurrent_checks", DEFAULT_MAX_CONCURRENCY)),
+        )
+    return _cache
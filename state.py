@@ -6,6 +6,9 @@ import json
 import logging
 import os
 import sys
+import threading
+
+from system_utils import atomic_write_text
 
 # --- RUTAS DE FICHEROS ---
 BASE_DIR = os.path.dirname(__file__)
@@ -14,6 +17,12 @@ USERS_FILE = os.path.join(BASE_DIR, 'users.json')
 LOG_STATE_FILE = os.path.join(BASE_DIR, 'log_monitoring_state.json')
 SECRETS_FILE = '/etc/telegram-bot/bot.env'
 PERSISTENCE_FILE = os.path.join(BASE_DIR, "bot_persistence.json")
+PERSISTENCE_DB_FILE = os.path.join(BASE_DIR, "bot_persistence.db")
+LOG_INDEX_FILE = os.path.join(BASE_DIR, "log_index.json")
+METRICS_HISTORY_FILE = os.path.join(BASE_DIR, "metrics_history.json")
+JOB_SPOOL_DIR = os.path.join(BASE_DIR, "job_spool")
+RESULT_SPILL_DIR = os.path.join(BASE_DIR, "result_cache")
+SSL_CACHE_FILE = os.path.join(BASE_DIR, "ssl_cert_cache.json")
 
 # --- FUNCIONES DE CARGA ---
 
@@ -66,11 +75,17 @@ SECRETS = _cargar_secretos(SECRETS_FILE)
 
 # --- FUNCIONES PARA MANIPULAR DATOS EN MEMORIA ---
 
+USERS_LOCK = threading.Lock()
+
 def guardar_usuarios():
-    """Guarda el estado actual de USERS_DATA en el fichero."""
+    """
+    Guarda el estado actual de USERS_DATA en el fichero.
+    Con updates concurrentes puede llamarse desde varios manejadores a la vez:
+    el lock serializa las escrituras y la escritura atómica evita ficheros a medias.
+    """
     try:
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(USERS_DATA, f, indent=2)
+        with USERS_LOCK:
+            atomic_write_text(USERS_FILE, json.dumps(USERS_DATA, indent=2))
         return True
     except Exception as e:
         logging.error(f"Error al guardar usuarios en '{USERS_FILE}': {e}")
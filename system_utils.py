@@ -1,112 +1,272 @@
 # system_utils.py
 # MODULO NUEVO: Contiene funciones de bajo nivel para ejecutar comandos del sistema.
 
-import subprocess
+import asyncio
 import logging
 import re
 import hashlib
 import os
+import signal
+import sys
+import tempfile
 
-def _run_command(command: list, timeout: int) -> tuple[bool, str]:
+def install_child_watcher() -> None:
     """
-    Ejecuta un comando de sistema y devuelve un tuple (éxito, salida).
+    En Python < 3.12 el vigilante de procesos hijos por defecto crea un hilo por
+    cada proceso. Si el kernel soporta pidfd se usa PidfdChildWatcher, que
+    vigila a los hijos desde el propio bucle de eventos sin hilos adicionales.
     """
+    if sys.version_info >= (3, 12) or not hasattr(os, "pidfd_open"):
+        return
     try:
-        proc = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            check=False  # No lanzar excepción en códigos de retorno distintos de 0
-        )
-        output = proc.stdout or proc.stderr
-        
-        # Truncar salida si es muy larga
-        if len(output) > 4000:
-            output = output[:4000] + "\n\n... (salida truncada)"
-            
-        return proc.returncode == 0, output.strip()
+        asyncio.get_event_loop_policy().set_child_watcher(asyncio.PidfdChildWatcher())
+    except Exception as e:
+        logging.warning(f"No se pudo instalar PidfdChildWatcher, se usará el vigilante por defecto: {e}")
+
+def atomic_write_text(filepath: str, text: str) -> None:
+    """
+    Escribe un fichero de forma atómica: fichero temporal en el mismo directorio,
+    fsync y os.replace. Un corte a mitad de escritura nunca deja el fichero a medias.
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(filepath)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
 
+def _kill_process_group(proc) -> None:
+    """Mata el grupo de procesos completo (el comando y todos sus hijos)."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+# Tope de memoria por comando. Lo que no cabe en un mensaje se pagina (result_store.py).
+DEFAULT_OUTPUT_MAX_BYTES = 256 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# Espera máxima para recoger un proceso recién matado al cancelar.
+REAP_TIMEOUT_SECONDS = 5
+
+class BoundedCapture:
+    """
+    Captura en streaming la salida de un comando conservando solo una ventana
+    de cabecera y otra de cola dentro de un presupuesto fijo de bytes.
+    Lo que queda en medio se descarta al vuelo, contando bytes y líneas.
+    """
+    def __init__(self, max_bytes: int):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+        self.dropped_lines = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if not chunk:
+            return
+        self.tail += chunk
+        overflow = len(self.tail) - self.tail_limit
+        if overflow > 0:
+            self.dropped_bytes += overflow
+            self.dropped_lines += self.tail.count(b"\n", 0, overflow)
+            del self.tail[:overflow]
+
+    def render(self) -> str:
+        """Devuelve la salida capturada, indicando cuánto se ha omitido."""
+        if not self.dropped_bytes:
+            return (bytes(self.head) + bytes(self.tail)).decode(errors='replace')
+
+        # Se recortan las líneas partidas en los bordes de la ventana.
+        head, tail = bytes(self.head), bytes(self.tail)
+        dropped_bytes, dropped_lines = self.dropped_bytes, self.dropped_lines
+        if (cut := head.rfind(b"\n")) != -1:
+            dropped_bytes += len(head) - cut - 1
+            head = head[:cut + 1]
+        if (cut := tail.find(b"\n")) != -1:
+            dropped_bytes += cut + 1
+            dropped_lines += 1
+            tail = tail[cut + 1:]
+        marker = f"\n... (salida truncada: {dropped_bytes} bytes y {dropped_lines} líneas omitidas) ...\n"
+        return head.decode(errors='replace') + marker + tail.decode(errors='replace')
+
+def _get_output_budget() -> int:
+    from state import CONFIG
+    return int(CONFIG.get("command_output", {}).get("max_bytes", DEFAULT_OUTPUT_MAX_BYTES))
+
+async def _pump_stream(stream, capture: BoundedCapture, on_output=None) -> None:
+    while chunk := await stream.read(READ_CHUNK_SIZE):
+        capture.feed(chunk)
+        if on_output is not None:
+            on_output(chunk)
+
+async def _run_command_async(command: list, timeout: int, max_bytes: int = None, on_output=None) -> tuple[bool, str]:
+    """
+    Ejecuta un comando de sistema de forma asíncrona y devuelve un tuple (éxito, salida).
+    El comando se lanza en su propia sesión para poder matar todo el grupo de
+    procesos si vence el timeout o si la tarea que lo espera es cancelada.
+    La salida se lee por bloques y solo se conserva una ventana de `max_bytes`
+    (por defecto `command_output.max_bytes`), así que la memoria usada no
+    depende de lo que imprima el comando. Si se pasa `on_output`, se le llama
+    con cada bloque de stdout y stderr según llega (salida en directo).
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
     except FileNotFoundError:
         return False, f"Error: El comando '{command[0]}' no se encuentra. ¿Está instalado?"
-    except subprocess.TimeoutExpired:
-        return False, f"Error: Timeout ({timeout}s) durante la ejecución de '{' '.join(command)}'."
     except Exception as e:
-        logging.error(f"Excepción en _run_command con '{' '.join(command)}': {e}")
+        logging.error(f"Excepción en _run_command_async con '{' '.join(command)}': {e}")
         return False, f"Error inesperado: {e}"
 
-def do_ping(host: str, _) -> str:
-    # El _ es un placeholder para la función de traducción, no se usa aquí.
-    success, output = _run_command(['ping', '-c', '4', host], 20)
-    if success:
+    budget = max_bytes or _get_output_budget()
+    stdout, stderr = BoundedCapture(budget), BoundedCapture(budget)
+    gathered = asyncio.gather(_pump_stream(proc.stdout, stdout, on_output), _pump_stream(proc.stderr, stderr, on_output), proc.wait())
+    # Al cancelar (timeout o /cancel) el gather acaba con CancelledError: se marca como recuperado.
+    gathered.add_done_callback(lambda f: f.cancelled() or f.exception())
+    try:
+        await asyncio.wait_for(gathered, timeout)
+    except asyncio.TimeoutError:
+        _kill_process_group(proc)
+        await proc.wait()
+        return False, f"Error: Timeout ({timeout}s) durante la ejecución de '{' '.join(command)}'."
+    except asyncio.CancelledError:
+        # Cancelado desde el manejador: no dejamos procesos huérfanos ni zombis.
+        # shield: la recogida del hijo sigue aunque llegue otra cancelación.
+        _kill_process_group(proc)
+        try:
+            await asyncio.wait_for(asyncio.shield(proc.wait()), REAP_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            logging.warning(f"No se pudo recoger a tiempo el proceso {proc.pid} ('{command[0]}') tras cancelarlo.")
+        raise
+
+    if stdout.dropped_bytes:
+        logging.info(f"Salida de '{command[0]}' truncada: {stdout.total_bytes} bytes leídos, {stdout.dropped_bytes} descartados.")
+    output = (stdout if stdout.total_bytes else stderr).render()
+    return proc.returncode == 0, output.strip()
+
+async def run_cached(name: str, command: list, timeout: int) -> tuple[bool, str]:
+    """
+    Como _run_command_async, pero para comandos de solo lectura: la salida se
+    reutiliza durante el TTL de `name` (command_cache.py) y las peticiones
+    simultáneas del mismo comando comparten una sola ejecución.
+    """
+    from command_cache import get_cache
+    # Solo se guardan las ejecuciones correctas: un timeout o un fallo puntual
+    # no debe servirse durante todo el TTL (o para siempre en `system_info`).
+    return await get_cache().get_or_run(name, tuple(command), lambda: _run_command_async(command, timeout),
+                                        cacheable=lambda result: result[0])
+
+async def do_ping(host: str, _) -> str:
+    # Import diferido: icmp_ping usa _run_command_async de este módulo.
+    from icmp_ping import ping_many, get_ping_settings
+    timeout, _count = get_ping_settings()
+    result = (await ping_many([host], count=4, timeout=timeout))[host]
+    lines = [f"seq={seq} time={rtt:.2f} ms" for seq, rtt in enumerate(result["rtts"], 1)]
+    lines.append(f"{result['sent']} enviados, {result['received']} recibidos, {result['loss']:.0f}% pérdida")
+    if result["avg"] is not None:
+        lines.append(f"rtt min/avg/max = {result['min']:.2f}/{result['avg']:.2f}/{result['max']:.2f} ms")
+    if result["error"]:
+        lines.append(result["error"])
+    output = "\n".join(lines)
+    if result["received"]:
         return _("📡 **Resultado de Ping a `{host}`:**\n```\n{output}\n```").format(host=host, output=output)
     return _("❌ **Error de Ping a `{host}`:**\n```\n{output}\n```").format(host=host, output=output)
 
-def do_traceroute(host: str, _) -> str:
-    success, output = _run_command(['traceroute', '-w', '2', host], 60)
+async def do_traceroute(host: str, _, on_output=None) -> str:
+    success, output = await _run_command_async(['traceroute', '-w', '2', host], 60, on_output=on_output)
     if success:
         return _("🗺️ **Resultado de Traceroute a `{host}`:**\n```\n{output}\n```").format(host=host, output=output)
     return _("❌ **Error de Traceroute a `{host}`:**\n```\n{output}\n```").format(host=host, output=output)
 
-def do_nmap(host: str, _) -> str:
-    success, output = _run_command(['nmap', '-A', host], 180)
+async def do_nmap(host: str, _, on_output=None) -> str:
+    success, output = await _run_command_async(['nmap', '-A', host], 180, on_output=on_output)
     if success:
         return _("🔬 **Resultado de Nmap -A a `{host}`:**\n```\n{output}\n```").format(host=host, output=output)
     return _("❌ **Error de Nmap a `{host}`:**\n```\n{output}\n```").format(host=host, output=output)
 
-def do_dig(domain: str, _) -> str:
-    success, output = _run_command(['dig', domain], 30)
+async def do_dig(domain: str, _) -> str:
+    success, output = await _run_command_async(['dig', domain], 30)
     if success:
         return _("🌐 **Resultado de DIG para `{domain}`:**\n```\n{output}\n```").format(domain=domain, output=output)
     return _("❌ **Error de DIG para `{domain}`:**\n```\n{output}\n```").format(domain=domain, output=output)
 
-def do_whois(domain: str, _) -> str:
-    success, output = _run_command(['whois', domain], 30)
+async def do_whois(domain: str, _) -> str:
+    success, output = await _run_command_async(['whois', domain], 30)
     if success:
         return _("👤 **Resultado de WHOIS para `{domain}`:**\n```\n{output}\n```").format(domain=domain, output=output)
     return _("❌ **Error de WHOIS para `{domain}`:**\n```\n{output}\n```").format(domain=domain, output=output)
 
-def get_disk_usage_text(_) -> str:
-    success, output = _run_command(['df', '-h'], 10)
+async def get_disk_usage_text(_) -> str:
+    success, output = await run_cached("disk", ['df', '-h'], 10)
     if success:
         return _("💾 **Uso de Disco (`df -h`)**\n```\n{output}\n```").format(output=output)
     return _("❌ **Error al ejecutar `df -h`:**\n```\n{output}\n```").format(output=output)
 
-def get_processes_text(_) -> str:
-    success, output = _run_command(['ps', 'aux'], 30)
+async def get_processes_text(_) -> str:
+    success, output = await _run_command_async(['ps', 'aux'], 30)
     if success:
         return _("⚙️ **Procesos (`ps aux`)**\n```\n{output}\n```").format(output=output)
     return _("❌ **Error al ejecutar `ps aux`:**\n```\n{output}\n```").format(output=output)
 
-def get_log_lines(log_path: str, num_lines: int) -> tuple[bool, str]:
-    return _run_command(['tail', '-n', str(num_lines), log_path], 30)
+async def get_log_lines(log_path: str, num_lines: int) -> tuple[bool, str]:
+    """Últimas líneas del log leídas en el propio proceso (sin lanzar `tail`)."""
+    from log_reader import tail_lines
+    try:
+        output = await asyncio.to_thread(tail_lines, log_path, num_lines, _get_output_budget())
+    except FileNotFoundError:
+        return False, f"Error: El fichero '{log_path}' no existe."
+    except PermissionError:
+        return False, f"Error: Sin permisos para leer '{log_path}'."
+    except OSError as e:
+        logging.error(f"Error al leer las últimas líneas de '{log_path}': {e}")
+        return False, f"Error inesperado: {e}"
+    return True, output.strip()
 
-def search_log_in_file(log_path: str, pattern: str) -> tuple[bool, str]:
+async def search_log_in_file(log_path: str, pattern: str) -> tuple[bool, str]:
     command = ['grep', '-i', '--', pattern, log_path]
-    success, output = _run_command(command, 60)
+    success, output = await _run_command_async(command, 60)
     # Grep devuelve 1 si no hay coincidencias, no es un error.
     if not success and "timeout" not in output.lower() and "no se encuentra" not in output.lower():
         return True, "" # No encontrado
     return success, output
 
-def fail2ban_status_cmd(jail=None) -> tuple[bool, str]:
+async def fail2ban_status_cmd(jail=None) -> tuple[bool, str]:
     command = ['sudo', 'fail2ban-client', 'status']
     if jail:
         command.append(jail)
-    return _run_command(command, 20)
+    return await run_cached("fail2ban_status", command, 20)
 
-def fail2ban_unban_cmd(jail: str, ip: str) -> tuple[bool, str]:
+async def fail2ban_unban_cmd(jail: str, ip: str) -> tuple[bool, str]:
     command = ['sudo', 'fail2ban-client', 'set', jail, 'unbanip', ip]
-    return _run_command(command, 15)
+    return await _run_command_async(command, 15)
 
-def get_fortune_text_cmd(_) -> str:
-    success, output = _run_command(['/usr/games/fortune'], 5)
+async def get_fortune_text_cmd(_) -> str:
+    success, output = await _run_command_async(['/usr/games/fortune'], 5)
     if success:
         return _("🍀 **Tu fortuna dice:**\n\n```\n{fortune}\n```").format(fortune=output)
     return _("❌ Error: El comando `fortune` no se encuentra o ha fallado.")
 
-def get_weather_text_cmd(location: str, _) -> str:
-    success, output = _run_command(['ansiweather', '-l', location], 15)
+async def get_weather_text_cmd(location: str, _) -> str:
+    success, output = await _run_command_async(['ansiweather', '-l', location], 15)
     
     # Primero, comprueba si el comando tuvo éxito.
     if success:
@@ -128,36 +288,46 @@ def _calculate_sha256(filepath):
         return sha256_hash.hexdigest()
     except FileNotFoundError:
         return None
-def run_script(script_type: str, script_name: str, _):
+
+def prepare_script(script_type: str, script_name: str, _) -> tuple[list, str]:
     """
-    Ejecuta un script de forma segura y devuelve la salida como texto plano.
+    Comprueba que el script está permitido y que su hash coincide.
+    Devuelve (comando, None) si se puede ejecutar o (None, mensaje de error).
     """
     from state import CONFIG
 
     script_info = CONFIG.get("scripts", {}).get(script_name)
     if not script_info or not script_info.get("path"):
-        return _("❌ Script no encontrado o no permitido.")
+        return None, _("❌ Script no encontrado o no permitido.")
 
     script_path = os.path.expanduser(script_info["path"])
     stored_hash = script_info.get("sha256_hash")
 
     if not stored_hash:
-        return _("🛡️ ERROR DE SEGURIDAD: El script '{name}' no tiene hash. Ejecución abortada.").format(name=script_name)
+        return None, _("🛡️ ERROR DE SEGURIDAD: El script '{name}' no tiene hash. Ejecución abortada.").format(name=script_name)
 
     current_hash = _calculate_sha256(script_path)
     if not current_hash:
-        return _("❌ Error: No se pudo encontrar o leer el fichero del script en: {path}").format(path=script_path)
+        return None, _("❌ Error: No se pudo encontrar o leer el fichero del script en: {path}").format(path=script_path)
 
     if current_hash != stored_hash:
         logging.critical(f"ALERTA DE SEGURIDAD: Hash de '{script_name}' no coincide. Esperado: {stored_hash}, Actual: {current_hash}")
-        return _("🛡️ ALERTA DE SEGURIDAD: La firma del script '{name}' ha cambiado. Ejecución bloqueada.").format(name=script_name)
+        return None, _("🛡️ ALERTA DE SEGURIDAD: La firma del script '{name}' ha cambiado. Ejecución bloqueada.").format(name=script_name)
     
     command = [script_path]
     if script_type == "python":
-        import sys
         command.insert(0, sys.executable)
-    
-    success, output = _run_command(command, 300)
+    return command, None
+
+async def run_script(script_type: str, script_name: str, _):
+    """
+    Ejecuta un script de forma segura y devuelve la salida como texto plano.
+    """
+    command, error = prepare_script(script_type, script_name, _)
+    if error:
+        return error
+
+    success, output = await _run_command_async(command, 300)
     
     # --- FORMATO DE TEXTO PLANO mejorar en prox version ---
     if success:
@@ -166,26 +336,26 @@ def run_script(script_type: str, script_name: str, _):
         return f"❌ Error al ejecutar '{script_name}':\n\n--- INICIO DEL ERROR ---\n{output}\n--- FIN DEL ERROR ---"
 
 # --- NUEVAS FUNCIONES PARA LOS SCRIPTS EXTERNOS ---
-def run_analizador_logs(args: list, _):
+async def run_analizador_logs(args: list, _):
     """Ejecuta el script analizador_logs."""
     command = ['/usr/local/bin/analizador_logs'] + args
-    success, output = _run_command(command, 120)
+    success, output = await _run_command_async(command, 120)
     return output
 
-def run_muestra(args: list, _):
+async def run_muestra(args: list, _):
     """Ejecuta el script muestra."""
     command = ['/usr/local/bin/muestra'] + args
-    success, output = _run_command(command, 20)
+    success, output = await _run_command_async(command, 20)
     return output
 
-def run_muestrared(args: list, _):
+async def run_muestrared(args: list, _):
     """Ejecuta el script muestrared."""
     command = ['/usr/local/bin/muestrared'] + args
-    success, output = _run_command(command, 30)
+    success, output = await _run_command_async(command, 30)
     return output
 
-def run_redes(args: list, _):
+async def run_redes(args: list, _):
     """Ejecuta el script redes."""
     command = ['/usr/local/bin/redes'] + args
-    success, output = _run_command(command, 180)
+    success, output = await _run_command_async(command, 180)
     return output
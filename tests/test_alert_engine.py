@@ -0,0 +1,70 @@
+import unittest
+
+from alert_engine import AlertEngine
+
+THRESHOLDS = {"hysteresis_percent": 5, "min_duration_seconds": 60, "renotify_minutes": 10}
+
+
+def cpu(value):
+    return [("cpu", "CPU", value, 90)]
+
+
+class AlertEngineTransitionTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = AlertEngine()
+
+    def kinds(self, conditions, now, thresholds=THRESHOLDS):
+        return [event[0] for event in self.engine.evaluate(conditions, thresholds, now=now)]
+
+    def test_fires_only_after_min_duration(self):
+        self.assertEqual(self.kinds(cpu(95), 0), [])
+        self.assertEqual(self.kinds(cpu(95), 30), [])
+        self.assertEqual(self.kinds(cpu(95), 60), ["firing"])
+        self.assertEqual(self.kinds(cpu(95), 90), [])
+
+    def test_pending_resets_when_value_drops(self):
+        self.kinds(cpu(95), 0)
+        # Dentro de la banda de histéresis, pero por debajo del umbral: vuelve a ok
+        self.assertEqual(self.kinds(cpu(88), 30), [])
+        self.assertEqual(self.kinds(cpu(95), 70), [])
+        self.assertEqual(self.kinds(cpu(95), 130), ["firing"])
+
+    def test_fires_immediately_without_min_duration(self):
+        self.assertEqual(self.kinds(cpu(95), 0, {"min_duration_seconds": 0}), ["firing"])
+
+    def test_reminder_while_firing(self):
+        self.kinds(cpu(95), 0, {"min_duration_seconds": 0, "renotify_minutes": 10})
+        self.assertEqual(self.kinds(cpu(95), 599, {"min_duration_seconds": 0, "renotify_minutes": 10}), [])
+        self.assertEqual(self.kinds(cpu(95), 600, {"min_duration_seconds": 0, "renotify_minutes": 10}), ["reminder"])
+
+    def test_no_reminder_when_renotify_disabled(self):
+        thresholds = {"min_duration_seconds": 0, "renotify_minutes": 0}
+        self.kinds(cpu(95), 0, thresholds)
+        self.assertEqual(self.kinds(cpu(95), 10 ** 6, thresholds), [])
+
+    def test_resolves_only_below_hysteresis_band(self):
+        thresholds = {"min_duration_seconds": 0, "hysteresis_percent": 5}
+        self.kinds(cpu(95), 0, thresholds)
+        self.assertEqual(self.kinds(cpu(87), 10, thresholds), [])
+        self.assertEqual(self.kinds(cpu(91), 20, thresholds), [])
+        self.assertEqual(self.kinds(cpu(84), 30, thresholds), ["resolved"])
+        self.assertEqual(self.kinds(cpu(84), 40, thresholds), [])
+
+    def test_conditions_are_tracked_independently(self):
+        thresholds = {"min_duration_seconds": 0}
+        conditions = [("cpu", "CPU", 95, 90), ("disk:/", "Disco (/)", 50, 95)]
+        events = self.engine.evaluate(conditions, thresholds, now=0)
+        self.assertEqual(events, [("firing", "CPU", 95, 90)])
+
+    def test_removed_condition_is_forgotten(self):
+        thresholds = {"min_duration_seconds": 0, "renotify_minutes": 1}
+        disk = [("disk:/data", "Disco (/data)", 99, 95)]
+        self.assertEqual(self.kinds(cpu(10) + disk, 0, thresholds), ["firing"])
+        self.assertEqual(self.kinds(cpu(10), 120, thresholds), [])
+        self.assertNotIn("disk:/data", self.engine._states)
+        # Si vuelve a configurarse, empieza desde ok
+        self.assertEqual(self.kinds(cpu(10) + disk, 240, thresholds), ["firing"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+
+from check_scheduler import CheckScheduler, ScheduledCheck
+
+
+def render(result, _):
+    return str(result)
+
+
+class CheckSchedulerBatchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = []
+
+        async def ping_batch(checks):
+            self.calls.append(sorted(check.id for check in checks))
+            return {check.id: "ok" for check in checks}
+
+        self.ping_batch = ping_batch
+
+    def ping(self, n, interval=60):
+        async def run():
+            return "ok"
+        return ScheduledCheck(f"{n}:host{n}:ping:", "ping", f"host{n}", run, render, interval, 5,
+                              target=f"host{n}", batch=self.ping_batch)
+
+    def test_large_batches_are_split(self):
+        scheduler = CheckScheduler(batch_size=4)
+        scheduler.configure([self.ping(n) for n in range(10)] + [self.ping(10, interval=30)])
+        sizes = sorted(len(unit) for unit in scheduler._units.values())
+        self.assertEqual(sizes, [1, 2, 4, 4])
+        # Cada trozo tiene su propio turno
+        self.assertEqual(len(scheduler._due), 4)
+
+    async def test_ensure_runs_each_sub_batch_once(self):
+        scheduler = CheckScheduler(batch_size=3)
+        scheduler._semaphore = asyncio.Semaphore(10)
+        checks = [self.ping(n) for n in range(5)]
+        scheduler.configure(checks)
+        await scheduler.ensure([check.id for check in checks])
+        self.assertEqual(sorted(map(len, self.calls)), [2, 3])
+        self.assertEqual({check.id for check in checks}, set(scheduler.latest))
+        self.assertTrue(all(entry["result"] == "ok" for entry in scheduler.latest.values()))
+
+    async def test_removed_check_is_dropped(self):
+        scheduler = CheckScheduler()
+        scheduler._semaphore = asyncio.Semaphore(10)
+        checks = [self.ping(n) for n in range(3)]
+        scheduler.configure(checks)
+        await scheduler.ensure([check.id for check in checks])
+        scheduler.configure(checks[:2])
+        self.assertNotIn(checks[2].id, scheduler.latest)
+        self.assertEqual(len(scheduler._units), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
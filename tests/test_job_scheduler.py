@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+
+from job_scheduler import CANCELLED, DONE, PRIORITY_HIGH, QUEUED, RUNNING, JobCancelled, JobScheduler
+
+
+class JobSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.scheduler = JobScheduler({"network": 1})
+        self.release = asyncio.Event()
+
+    def submit(self, description, priority=1):
+        async def work():
+            await self.release.wait()
+            return description
+        return self.scheduler.submit("network", description, work, priority=priority)
+
+    async def test_position_follows_priority_and_order(self):
+        running = self.submit("a")
+        second = self.submit("b")
+        third = self.submit("c")
+        urgent = self.submit("admin", priority=PRIORITY_HIGH)
+        self.assertEqual(running.status, RUNNING)
+        self.assertEqual(self.scheduler.position(running), 0)
+        self.assertEqual(self.scheduler.position(urgent), 1)
+        self.assertEqual(self.scheduler.position(second), 2)
+        self.assertEqual(self.scheduler.position(third), 3)
+
+        self.release.set()
+        self.assertEqual(await running.wait(), "a")
+        self.assertEqual(await urgent.wait(), "admin")
+        self.assertEqual(running.status, DONE)
+
+    async def test_cancel_queued_job(self):
+        running = self.submit("a")
+        queued = self.submit("b")
+        last = self.submit("c")
+        self.assertTrue(self.scheduler.cancel(queued.id))
+        self.assertEqual(queued.status, CANCELLED)
+        self.assertEqual(self.scheduler.position(queued), 0)
+        self.assertEqual(self.scheduler.position(last), 1)
+        with self.assertRaises(JobCancelled):
+            await queued.wait_started()
+
+        # La tarea cancelada se descarta al llegar su turno y no llega a ejecutarse
+        self.release.set()
+        await running.wait()
+        self.assertEqual(await last.wait(), "c")
+        self.assertNotIn(queued, self.scheduler.active_jobs())
+
+    async def test_cancel_running_job_starts_next(self):
+        running = self.submit("a")
+        queued = self.submit("b")
+        await running.wait_started()
+        self.assertTrue(self.scheduler.cancel(running.id))
+        with self.assertRaises(JobCancelled):
+            await running.wait()
+        self.assertEqual(running.status, CANCELLED)
+        await queued.wait_started()
+        self.assertEqual(queued.status, RUNNING)
+        self.release.set()
+        self.assertEqual(await queued.wait(), "b")
+
+    async def test_cancel_unknown_or_finished_job(self):
+        self.assertFalse(self.scheduler.cancel(12345))
+        self.release.set()
+        job = self.submit("a")
+        await job.wait()
+        self.assertFalse(self.scheduler.cancel(job.id))
+        self.assertIn(job, self.scheduler.recent_jobs())
+
+    async def test_limit_per_resource(self):
+        first = self.submit("a")
+        second = self.submit("b")
+        other = self.scheduler.submit("backup", "copia", self.release.wait)
+        self.assertEqual(first.status, RUNNING)
+        self.assertEqual(second.status, QUEUED)
+        self.assertEqual(other.status, RUNNING)
+        self.release.set()
+        await second.wait()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from log_index import LogIndex, NoTimestamps
+
+START = datetime(2024, 5, 1, 3, 0).timestamp()
+END = datetime(2024, 5, 1, 3, 59).timestamp()
+
+
+class LogIndexWindowTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "app.log")
+        with open(self.path, "w") as f:
+            for i in range(5000):
+                f.write(f"2024-05-01 03:{i // 100:02d}:{i % 60:02d} line {i}\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reads_only_the_indexed_slice(self):
+        index = LogIndex(self.path, stride=4096)
+        start = datetime(2024, 5, 1, 3, 10).timestamp()
+        end = datetime(2024, 5, 1, 3, 10, 59).timestamp()
+        _output, matched, bytes_read, size, partial = index.read_window(start, end, max_bytes=100000)
+        self.assertEqual(matched, 100)
+        self.assertLess(bytes_read, size // 10)
+        self.assertFalse(partial)
+
+    def test_window_is_capped_and_reported_partial(self):
+        index = LogIndex(self.path, stride=4096)
+        output, matched, bytes_read, _size, partial = index.read_window(START, END, max_bytes=100000, max_window_bytes=2000)
+        self.assertTrue(partial)
+        self.assertEqual(bytes_read, 2000)
+        self.assertGreater(matched, 0)
+        # Solo líneas completas
+        self.assertTrue(output.splitlines()[-1].startswith("2024-05-01"))
+        self.assertEqual(len(output.splitlines()), matched)
+
+    def test_log_without_timestamps(self):
+        with open(self.path, "w") as f:
+            f.write("sin fecha\n" * 100)
+        with self.assertRaises(NoTimestamps):
+            LogIndex(self.path).read_window(START, END)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import system_utils
+from custom_persistence import JsonPersistence, SqlitePersistence
+
+
+class JsonPersistenceFlushTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "persistence.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_file(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    async def test_changes_are_grouped_in_one_delayed_write(self):
+        persistence = JsonPersistence(self.path, flush_delay=0.05)
+        with mock.patch("custom_persistence.atomic_write_text", wraps=system_utils.atomic_write_text) as write:
+            await persistence.update_user_data(1, {"a": 1})
+            await persistence.update_chat_data(-5, {"b": 2})
+            await persistence.update_bot_data({"c": 3})
+            await asyncio.sleep(0.2)
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(self.read_file()["user_data"], {"1": {"a": 1}})
+        self.assertEqual(self.read_file()["chat_data"], {"-5": {"b": 2}})
+        self.assertEqual(self.read_file()["bot_data"], {"c": 3})
+
+    async def test_update_during_write_is_flushed_after_it(self):
+        persistence = JsonPersistence(self.path, flush_delay=60)
+        original = persistence._encode_and_write
+        writing, release = asyncio.Event(), asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def slow_write(*args):
+            loop.call_soon_threadsafe(writing.set)
+            asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+            original(*args)
+
+        await persistence.update_user_data(1, {"v": 1})
+        with mock.patch.object(persistence, "_encode_and_write", slow_write):
+            first = asyncio.create_task(persistence.flush())
+            await writing.wait()
+            # Cambio que llega mientras el volcado anterior está escribiendo
+            await persistence.update_user_data(1, {"v": 2})
+            await persistence.update_user_data(2, {"v": 1})
+            release.set()
+            await first
+        self.assertEqual(self.read_file()["user_data"], {"1": {"v": 1}})
+
+        await persistence.flush()
+        self.assertEqual(self.read_file()["user_data"], {"1": {"v": 2}, "2": {"v": 1}})
+
+    async def test_failed_write_keeps_keys_dirty(self):
+        persistence = JsonPersistence(self.path, flush_delay=60)
+        await persistence.update_user_data(1, {"v": 1})
+        with mock.patch("custom_persistence.atomic_write_text", side_effect=OSError("disco lleno")):
+            await persistence.flush()
+        self.assertFalse(os.path.exists(self.path))
+
+        await persistence.flush()
+        self.assertEqual(self.read_file()["user_data"], {"1": {"v": 1}})
+
+    async def test_dropped_user_disappears_from_file(self):
+        persistence = JsonPersistence(self.path, flush_delay=60)
+        await persistence.update_user_data(1, {"v": 1})
+        await persistence.update_user_data(2, {"v": 2})
+        await persistence.flush()
+        await persistence.drop_user_data(1)
+        await persistence.flush()
+        self.assertEqual(self.read_file()["user_data"], {"2": {"v": 2}})
+
+
+class SqliteMigrationTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.json_path = os.path.join(self.tmp.name, "persistence.json")
+        self.db_path = os.path.join(self.tmp.name, "persistence.sqlite3")
+        legacy = {
+            "user_data": {"1": {"lang": "es"}, "2": {"lang": "en"}},
+            "chat_data": {"-100": {"muted": True}},
+            "bot_data": {"version": 3, "conversations": {"setup": {"1,1": 2}}},
+            "callback_data": None,
+            "conversations": {"login": {"7,7": 1}},
+        }
+        with open(self.json_path, "w") as f:
+            json.dump(legacy, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_json_is_imported_into_empty_database(self):
+        persistence = SqlitePersistence(self.db_path, migrate_from=self.json_path)
+        self.assertEqual(await persistence.get_user_data(), {1: {"lang": "es"}, 2: {"lang": "en"}})
+        self.assertEqual(await persistence.get_chat_data(), {-100: {"muted": True}})
+        self.assertEqual(await persistence.get_bot_data(), {"version": 3})
+        self.assertEqual(await persistence.get_conversations("login"), {(7, 7): 1})
+        # Las conversaciones del formato antiguo (dentro de bot_data) también se migran
+        self.assertEqual(await persistence.get_conversations("setup"), {(1, 1): 2})
+        await persistence.flush()
+
+    async def test_migration_runs_only_once(self):
+        persistence = SqlitePersistence(self.db_path, migrate_from=self.json_path)
+        await persistence.get_user_data()
+        await persistence.update_user_data(1, {"lang": "fr"})
+        await persistence.flush()
+
+        # Aunque el JSON siga ahí, la base de datos ya no está vacía
+        reopened = SqlitePersistence(self.db_path, migrate_from=self.json_path)
+        self.assertEqual((await reopened.get_user_data())[1], {"lang": "fr"})
+        await reopened.flush()
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM user_data").fetchone()[0], 2)
+            migrated = conn.execute("SELECT data FROM store WHERE name = 'migrated_from'").fetchone()
+        finally:
+            conn.close()
+        self.assertEqual(json.loads(migrated[0]), self.json_path)
+
+    async def test_missing_json_leaves_database_empty(self):
+        persistence = SqlitePersistence(self.db_path, migrate_from=os.path.join(self.tmp.name, "nope.json"))
+        self.assertEqual(await persistence.get_user_data(), {})
+        self.assertEqual(await persistence.get_bot_data(), {})
+        await persistence.flush()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,21 @@
+import unittest
+
+from port_probe import parse_ports
+
+
+class ParsePortsTest(unittest.TestCase):
+    def test_lists_and_ranges(self):
+        self.assertEqual(parse_ports(["22", "80,443", "8000-8002"]), [22, 80, 443, 8000, 8001, 8002])
+        self.assertEqual(parse_ports(["80", "80"]), [80])
+
+    def test_invalid_values(self):
+        for args in (["80-"], ["-80"], ["a"], ["0"], ["65536"], ["90-80"], ["80,"], [""]):
+            self.assertIsNone(parse_ports(args), args)
+
+    def test_limit(self):
+        self.assertIsNone(parse_ports(["1-101"], limit=100))
+        self.assertEqual(len(parse_ports(["1-100"], limit=100)), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from result_store import ResultStore, split_pages
+
+
+class ResultStoreTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_evicted_entries_are_read_back_from_disk(self):
+        store = ResultStore(self.tmp.name, max_memory_bytes=100)
+        first = await store.put(["a" * 80], "Markdown")
+        second = await store.put(["b" * 80])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, f"{first}.json")))
+        self.assertEqual((await store.get(first))["pages"], ["a" * 80])
+        self.assertEqual((await store.get(second))["pages"], ["b" * 80])
+        self.assertIsNone(await store.get("no-existe"))
+
+    async def test_disk_io_runs_outside_the_event_loop(self):
+        store = ResultStore(self.tmp.name, max_memory_bytes=100)
+        loop_thread = threading.get_ident()
+        threads = []
+        original = store._spill_many
+
+        def spill(entries):
+            threads.append(threading.get_ident())
+            original(entries)
+
+        with mock.patch.object(store, "_spill_many", spill):
+            first = await store.put(["a" * 80])
+            await store.put(["b" * 80])
+            await store.get(first)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_entry_being_spilled_is_still_available(self):
+        store = ResultStore(self.tmp.name, max_memory_bytes=100)
+        release = threading.Event()
+        original = store._spill_many
+
+        def slow_spill(entries):
+            release.wait()
+            original(entries)
+
+        first = await store.put(["a" * 80])
+        with mock.patch.object(store, "_spill_many", slow_spill):
+            put = asyncio.create_task(store.put(["b" * 80]))
+            try:
+                await asyncio.sleep(0.05)
+                self.assertEqual((await store.get(first))["pages"], ["a" * 80])
+            finally:
+                release.set()
+                await put
+
+
+class SplitPagesTest(unittest.TestCase):
+    def test_code_blocks_are_closed_and_reopened(self):
+        text = "```bash\n" + "línea\n" * 1000 + "```"
+        pages = split_pages(text, 500)
+        self.assertGreater(len(pages), 1)
+        for page in pages:
+            self.assertLessEqual(len(page), 500)
+            self.assertEqual(page.count("```") % 2, 0)
+        self.assertTrue(pages[1].startswith("```bash"))
+
+
+if __name__ == "__main__":
+    unittest.main()
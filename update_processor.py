@@ -0,0 +1,57 @@
+# update_processor.py
+# MODULO NUEVO: Procesado concurrente de updates manteniendo el orden dentro de cada chat.
+# Los updates de chats distintos se atienden en paralelo (un /nmap de un admin ya
+# no retrasa los botones de otro), mientras que los de un mismo chat se procesan
+# uno detrás de otro, en el orden en que llegaron.
+
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+DEFAULT_CONCURRENT_UPDATES = 8
+# Updates que pueden estar esperando su turno a la vez (todos los chats juntos).
+DEFAULT_MAX_PENDING_UPDATES = 256
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    El semáforo de la clase base limita los updates pendientes; aquí se añade un
+    lock por chat y, solo después de obtenerlo, el semáforo de concurrencia real.
+    Así los updates que esperan turno en un chat ocupado no quitan plazas a otros chats.
+    """
+
+    __slots__ = ("_concurrency", "_chat_locks", "_chat_waiters")
+
+    def __init__(self, concurrent_updates: int = DEFAULT_CONCURRENT_UPDATES,
+                 max_pending_updates: int = DEFAULT_MAX_PENDING_UPDATES):
+        super().__init__(max(max_pending_updates, concurrent_updates, 2))
+        self._concurrency = asyncio.Semaphore(concurrent_updates)
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._chat_waiters: dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        chat_id = update.effective_chat.id if isinstance(update, Update) and update.effective_chat else None
+        if chat_id is None:
+            async with self._concurrency:
+                await coroutine
+            return
+
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._chat_waiters[chat_id] = self._chat_waiters.get(chat_id, 0) + 1
+        try:
+            # asyncio.Lock despierta a los que esperan en orden de llegada.
+            async with lock:
+                async with self._concurrency:
+                    await coroutine
+        finally:
+            self._chat_waiters[chat_id] -= 1
+            if not self._chat_waiters[chat_id]:
+                del self._chat_waiters[chat_id]
+                del self._chat_locks[chat_id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass